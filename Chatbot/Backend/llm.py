@@ -0,0 +1,215 @@
+import asyncio
+import inspect
+import os
+
+
+SYSTEM_INSTRUCTION = "You are a health assistant: ask about symptoms, suggest safe short-term OTC/home remedies and self-care, flag urgent symptoms, and tell users to see a clinician. Answer kindly , with short answers, avoid using points and type in short paragraphs Use normal text that can be represented correctly in html format."
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+# "gemini" talks to the real model, "fake" answers locally (offline load testing)
+CHAT_PROVIDER = os.getenv("CHAT_PROVIDER", "gemini")
+
+# Upstream calls allowed in flight at once, and how many more may wait for a slot
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+CHAT_MAX_WAITING = int(os.getenv("CHAT_MAX_WAITING", "64"))
+
+# Seconds a request may wait for a slot, and seconds the upstream call may take
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+CHAT_REQUEST_TIMEOUT = float(os.getenv("CHAT_REQUEST_TIMEOUT", "30"))
+
+
+class GeminiProvider:
+    # One client per process; its HTTP connections are reused across requests
+    def __init__(self, api_key, model=GEMINI_MODEL):
+        from google import genai
+        from google.genai import types
+
+        self.client = genai.Client(api_key=api_key)
+        self.model = model
+        self.config = types.GenerateContentConfig(system_instruction=SYSTEM_INSTRUCTION)
+
+    # `contents` is either the message text or a list of {"role", "parts"} turns
+    async def generate(self, contents):
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            config=self.config,
+            contents=contents
+        )
+        return response.text
+
+    async def stream(self, contents):
+        chunks = self.client.aio.models.generate_content_stream(
+            model=self.model,
+            config=self.config,
+            contents=contents
+        )
+        # Older SDKs return the async iterator directly, newer ones a coroutine resolving to it
+        if inspect.isawaitable(chunks):
+            chunks = await chunks
+        async for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeProvider:
+    # Stands in for the model without network access; `delay` simulates time to first token
+    # and `chunk_delay` the gap between streamed words
+    def __init__(self, delay=0.5, chunk_delay=0.05, reply="Rest, drink plenty of water, and see a clinician if it gets worse."):
+        self.delay = delay
+        self.chunk_delay = chunk_delay
+        self.reply = reply
+        self.calls = 0
+
+    async def generate(self, contents):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.reply
+
+    async def stream(self, contents):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.chunk_delay)
+            yield word if i == len(words) - 1 else word + " "
+
+
+def create_provider(name=CHAT_PROVIDER, api_key=None):
+    if name == "fake":
+        return FakeProvider()
+    if name == "gemini":
+        return GeminiProvider(api_key)
+    raise ValueError(f"Unknown chat provider: {name}")
+
+
+class LimiterFull(Exception):
+    pass
+
+
+class LimiterTimeout(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    # Caps upstream calls in flight; extra requests wait in a bounded queue
+    def __init__(self, max_concurrent=CHAT_MAX_CONCURRENCY, max_waiting=CHAT_MAX_WAITING, queue_timeout=CHAT_QUEUE_TIMEOUT):
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+
+    async def acquire(self):
+        if self.semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                raise LimiterFull()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise LimiterTimeout()
+            finally:
+                self.waiting -= 1
+        else:
+            await self.semaphore.acquire()
+
+    def release(self):
+        self.semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class ReplyStream:
+    # A streamed upstream reply that runs as its own task. Whatever happens to
+    # the client that asked for it (even disconnecting before the first chunk
+    # is read) the task runs to the end and then calls on_done, e.g. to free
+    # its limiter slot. Chunks are kept as they arrive, so a reader that joins
+    # late starts from the first one.
+    def __init__(self):
+        self.chunks = []
+        self.error = None
+        self.finished = False
+        self.task = None
+        self.on_done = None
+        self._changed = asyncio.Event()
+        self._callbacks = []
+
+    def start(self, chunks, on_done=None):
+        self.on_done = on_done
+        self.task = asyncio.ensure_future(self._pump(chunks))
+        # Done callbacks run however the task ends, even if it is cancelled before it starts
+        self.task.add_done_callback(self._task_done)
+
+    async def _pump(self, chunks):
+        try:
+            async for chunk in chunks:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.fail(e)
+        else:
+            self._finish()
+
+    def _task_done(self, task):
+        self.fail(RuntimeError("Reply stream was cancelled"))   # no-op unless it was
+        if self.on_done is not None:
+            self.on_done()
+
+    # End the stream with an error (raised to every reader) instead of a reply
+    def fail(self, error):
+        if not self.finished:
+            self.error = error
+            self._finish()
+
+    def add_done_callback(self, callback):
+        if self.finished:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def text(self):
+        return "".join(self.chunks)
+
+    # Every chunk from the first, then live ones until the end
+    async def read(self):
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self._notify()
+        for callback in self._callbacks:
+            callback(self)
+        self._callbacks.clear()
+
+
+# Chunks of provider.stream(contents), each within CHAT_REQUEST_TIMEOUT
+async def timed_chunks(provider, contents):
+    chunks = provider.stream(contents).__aiter__()
+    while True:
+        try:
+            chunk = await asyncio.wait_for(chunks.__anext__(), CHAT_REQUEST_TIMEOUT)
+        except StopAsyncIteration:
+            return
+        yield chunk
@@ -1,15 +1,28 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from google import genai
-from google.genai import types
 from dotenv import load_dotenv
 load_dotenv()
 import os
+import asyncio
+import json
+from llm import create_provider, ConcurrencyLimiter, LimiterFull, LimiterTimeout, ReplyStream, timed_chunks, CHAT_REQUEST_TIMEOUT
+from reply_cache import ReplyCache
+from sessions import SessionStore
+from typing import Optional
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 class chatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None   # returned by the first reply; send it back to keep context
+
+# Sessions live in this process's memory (see sessions.py). With several
+# workers, or after a restart, a session_id may be unknown here: the reply
+# then comes with a new session_id and session_reset=true, so the client can
+# tell the user the earlier conversation was not used.
+def session_reset(request, session):
+    return request.session_id is not None and session.id != request.session_id
 
 app = FastAPI()
 
@@ -21,29 +34,123 @@ app.add_middleware(
     allow_credentials=True
 )
 
+# Created on first use and kept for the life of the process
+provider = None
+limiter = ConcurrencyLimiter()
+reply_cache = ReplyCache()
+sessions = SessionStore()
+
+
+# Who is asking: nobody in particular when the bot runs on its own.
+# gateway.py overrides this with the Pulse API's JWT check.
+async def current_user():
+    return None
+
+
+def get_provider():
+    global provider
+    if provider is None:
+        provider = create_provider(api_key=GEMINI_API_KEY)
+    return provider
+
 
-def get_bot_response(user_message):
+async def get_bot_response(user_message, provider, session=None):
     message=user_message.lower()
 
-    client = genai.Client(api_key=GEMINI_API_KEY)
+    # Follow-up questions depend on the conversation, so only opening questions are cacheable
+    with_context = session is not None and session.has_context()
+    contents = session.contents(message) if with_context else message
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        config=types.GenerateContentConfig(
-            system_instruction="You are a health assistant: ask about symptoms, suggest safe short-term OTC/home remedies and self-care, flag urgent symptoms, and tell users to see a clinician. Answer kindly , with short answers, avoid using points and type in short paragraphs Use normal text that can be represented correctly in html format."),
-        contents=message
-    )
+    async def ask_model():
+        try:
+            async with limiter:
+                return await asyncio.wait_for(provider.generate(contents), CHAT_REQUEST_TIMEOUT)
+        except (LimiterFull, LimiterTimeout):
+            raise HTTPException(status_code=503, detail="Chatbot is busy, please try again shortly")
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Chatbot took too long to respond")
+
+    if with_context:
+        return await ask_model()
 
-    return response.text
+    # Repeated questions are answered from the cache; identical ones in flight share one call
+    return await reply_cache.get_or_compute(message, ask_model)
 
 
 @app.post("/chat")
-async def chat(request:chatRequest):
-    reply=get_bot_response(request.message)
-    print(reply)
-    return {"reply":reply}
+async def chat(request:chatRequest, user=Depends(current_user), provider=Depends(get_provider)):
+    session=sessions.get_or_create(request.session_id)
+    reply=await get_bot_response(request.message, provider, session)
+    session.add("user", request.message.lower())
+    session.add("model", reply)
+    return {"reply":reply, "session_id":session.id, "session_reset":session_reset(request, session)}
+
+
+@app.get("/chat/cache")
+async def chat_cache_stats():
+    return reply_cache.stats()
+
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+# Streams the reply as Server-Sent Events while the model is still generating:
+#   data: {"delta": "..."}            one per chunk
+#   event: done / event: error        once at the end ("done" carries session_id and session_reset)
+@app.post("/chat/stream")
+async def chat_stream(request:chatRequest, user=Depends(current_user), provider=Depends(get_provider)):
+    message=request.message.lower()
+    session=sessions.get_or_create(request.session_id)
+    reset = session_reset(request, session)
+    with_context = session.has_context()
+
+    contents = session.contents(message) if with_context else message
+
+    # Take the slot before responding so a saturated bot still answers with a
+    # plain 503. The upstream call then runs as its own task and frees the slot
+    # when it ends, even if this client disconnects before the body is sent.
+    async def start(stream):
+        try:
+            await limiter.acquire()
+        except (LimiterFull, LimiterTimeout):
+            raise HTTPException(status_code=503, detail="Chatbot is busy, please try again shortly")
+        stream.start(timed_chunks(provider, contents), on_done=limiter.release)
+
+    if with_context:
+        stream = ReplyStream()
+        await start(stream)
+        chunks = stream.read()
+    else:
+        # Opening questions come from the cache, or follow an identical one in flight
+        chunks = await reply_cache.stream(message, start)
+
+    async def events():
+        try:
+            parts = []
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event({"delta": chunk})
+            reply = "".join(parts)
+            session.add("user", message)
+            session.add("model", reply)
+            yield sse_event({"session_id": session.id, "session_reset": reset}, "done")
+        except asyncio.TimeoutError:
+            yield sse_event({"detail": "Chatbot took too long to respond"}, "error")
+        except HTTPException as e:
+            # e.g. the 503 of the identical question this one joined
+            yield sse_event({"detail": e.detail}, "error")
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield sse_event({"detail": "Chatbot could not finish the reply"}, "error")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8002)
-
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from llm import ReplyStream
+
+
+# Replies kept, and seconds each one stays fresh
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "1024"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "3600"))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    # "What helps a headache?" and "what helps  a headache" share one entry
+    prompt = _PUNCTUATION.sub(" ", prompt.casefold())
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+# The whole reply of a stream, read without stopping it if the reader is cancelled
+async def collect(stream):
+    return "".join([chunk async for chunk in stream.read()])
+
+
+# A reply that is already complete, as a one-chunk stream
+async def replay(reply):
+    yield reply
+
+
+# The reply of a get_or_compute() call in flight, as a one-chunk stream
+async def replay_task(task):
+    yield await asyncio.shield(task)
+
+
+class ReplyCache:
+    # LRU + TTL cache of model replies, with single-flight coalescing of identical
+    # questions: /chat and /chat/stream callers asking the same thing at the same
+    # time share one upstream call, whichever of the two started it
+    def __init__(self, max_entries=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()   # key -> (expires_at, reply)
+        self.in_flight = {}            # key -> task computing the reply, or ReplyStream streaming it
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, reply = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return reply
+
+    def set(self, key, reply):
+        self.entries[key] = (self.clock() + self.ttl, reply)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def get_or_compute(self, prompt, compute):
+        key = normalize_prompt(prompt)
+
+        reply = self.get(key)
+        if reply is not None:
+            self.hits += 1
+            return reply
+
+        task = self.in_flight.get(key)
+        if isinstance(task, ReplyStream):
+            self.coalesced += 1
+            return await collect(task)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The upstream call runs as its own task so one caller disconnecting
+            # does not cancel it for everyone else waiting on the same question
+            task = asyncio.ensure_future(compute())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self.in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.set(key, task.result())
+
+    # Chunks of the reply for a streaming caller: the cached reply, the one
+    # already in flight for the same question (every chunk from the first), or
+    # a new ReplyStream that `await start(stream)` sets going. Callers who join
+    # while start() is still waiting for a limiter slot share its outcome.
+    async def stream(self, prompt, start):
+        key = normalize_prompt(prompt)
+
+        reply = self.get(key)
+        if reply is not None:
+            self.hits += 1
+            return replay(reply)
+
+        in_flight = self.in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return in_flight.read() if isinstance(in_flight, ReplyStream) else replay_task(in_flight)
+
+        self.misses += 1
+        stream = ReplyStream()
+        self.in_flight[key] = stream
+        stream.add_done_callback(lambda done: self._finish_stream(key, done))
+        try:
+            await start(stream)
+        except Exception as e:
+            stream.fail(e)
+            raise
+        return stream.read()
+
+    def _finish_stream(self, key, stream):
+        if self.in_flight.get(key) is stream:
+            del self.in_flight[key]
+        if stream.error is None and stream.chunks:
+            self.set(key, stream.text())
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self.entries),
+            "in_flight": len(self.in_flight),
+        }
@@ -0,0 +1,98 @@
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+
+
+# Sessions kept in memory, and seconds an idle session survives
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+
+# Approximate tokens of verbatim history sent upstream, and of the rolling summary
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English; cheap enough to run on every turn
+    return len(text) // 4 + 1
+
+
+def first_sentence(text, limit=160):
+    sentence = _SENTENCE_END.split(text.strip(), 1)[0]
+    return sentence if len(sentence) <= limit else sentence[:limit].rstrip() + "..."
+
+
+class ChatSession:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.turns = []          # [(role, text)], role is "user" or "model"
+        self.summary = []        # one short line per compacted turn, oldest first
+        self.tokens = 0
+
+    def add(self, role, text, budget=CHAT_HISTORY_TOKEN_BUDGET, summary_budget=CHAT_SUMMARY_TOKEN_BUDGET):
+        self.turns.append((role, text))
+        self.tokens += estimate_tokens(text)
+
+        # Fold the oldest turns into the rolling summary once history is over budget,
+        # always keeping the newest turn verbatim
+        while self.tokens > budget and len(self.turns) > 1:
+            old_role, old_text = self.turns.pop(0)
+            self.tokens -= estimate_tokens(old_text)
+            speaker = "User" if old_role == "user" else "Assistant"
+            self.summary.append(f"{speaker}: {first_sentence(old_text)}")
+
+        while len(self.summary) > 1 and sum(estimate_tokens(line) for line in self.summary) > summary_budget:
+            self.summary.pop(0)
+
+    def has_context(self):
+        return bool(self.turns or self.summary)
+
+    def contents(self, message):
+        # Conversation in the shape the model expects, ending with the new user message
+        contents = []
+        if self.summary:
+            contents.append({"role": "user", "parts": [{"text": "Summary of our earlier conversation:\n" + "\n".join(self.summary)}]})
+            contents.append({"role": "model", "parts": [{"text": "Understood."}]})
+        for role, text in self.turns:
+            contents.append({"role": role, "parts": [{"text": text}]})
+        contents.append({"role": "user", "parts": [{"text": message}]})
+        return contents
+
+
+class SessionStore:
+    # LRU + idle-TTL store so memory stays bounded however many users chat
+    def __init__(self, max_sessions=CHAT_MAX_SESSIONS, ttl=CHAT_SESSION_TTL, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.clock = clock
+        self.sessions = OrderedDict()   # id -> (last_used, ChatSession)
+
+    def get_or_create(self, session_id=None):
+        now = self.clock()
+        self._evict_idle(now)
+
+        entry = self.sessions.get(session_id) if session_id else None
+        if entry is not None:
+            session = entry[1]
+        else:
+            # Unknown ids (expired, evicted, from before a restart or from
+            # another worker) get a new id, so callers can tell the context is gone
+            session = ChatSession(uuid.uuid4().hex)
+
+        self.sessions[session.id] = (now, session)
+        self.sessions.move_to_end(session.id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return session
+
+    def _evict_idle(self, now):
+        # Least recently used sessions sit at the front, so stop at the first fresh one
+        while self.sessions:
+            last_used, _ = next(iter(self.sessions.values()))
+            if now - last_used < self.ttl:
+                break
+            self.sessions.popitem(last=False)
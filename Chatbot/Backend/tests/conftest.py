@@ -0,0 +1,26 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# The bot's modules use flat imports (from llm import ...), as when run from
+# Chatbot/Backend/. Appended, so `import main` in the API's tests still finds backend/main.py
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CHATBOT_DIR not in sys.path:
+    sys.path.append(CHATBOT_DIR)
+
+os.environ["CHAT_PROVIDER"] = "fake"
+
+
+@pytest.fixture
+def chatbot():
+    """A fresh copy of Chatbot/Backend/main.py (loaded under its own name, since
+    the API also has a main.py) with a fake model that answers at once"""
+    from llm import FakeProvider
+
+    spec = importlib.util.spec_from_file_location("chatbot_main", os.path.join(CHATBOT_DIR, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.provider = FakeProvider(delay=0.05, chunk_delay=0)
+    return module
@@ -0,0 +1,83 @@
+"""POST /chat/stream frees its limiter slot however the client goes away, and
+identical questions asked at the same time share one upstream stream."""
+
+import asyncio
+import json
+
+
+# Send one POST /chat/stream straight to the app, as a client that hangs up
+# right after sending the request (before any of the body is read)
+async def post_and_disconnect(app, message):
+    body = json.dumps({"message": message}).encode()
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(event):
+        await asyncio.sleep(0)   # a real server yields while writing
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/chat/stream", "raw_path": b"/chat/stream", "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json")], "client": ("test", 1), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+
+
+def test_early_disconnects_give_their_slots_back(chatbot):
+    slots = chatbot.limiter.semaphore._value
+
+    async def scenario():
+        for n in range(slots):
+            await post_and_disconnect(chatbot.app, f"question {n}")
+        # The upstream calls finish on their own and free their slots
+        for _ in range(100):
+            if chatbot.limiter.semaphore._value == slots:
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert chatbot.limiter.semaphore._value == slots
+
+
+def test_streamed_reply_arrives_in_chunks(chatbot):
+    import httpx
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=chatbot.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/chat/stream", json={"message": "I have a headache"})
+        return response.text
+
+    events = [block for block in asyncio.run(scenario()).split("\n\n") if block]
+    deltas = [json.loads(block[len("data: "):])["delta"] for block in events[:-1]]
+    assert "".join(deltas) == chatbot.provider.reply
+    assert events[-1].startswith("event: done")
+
+
+def test_identical_streamed_questions_share_one_upstream_call(chatbot):
+    import httpx
+    from llm import FakeProvider
+
+    chatbot.provider = FakeProvider(delay=0.2, chunk_delay=0.01)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=chatbot.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*[
+                client.post("/chat/stream", json={"message": "I have a headache"}) for _ in range(10)
+            ])
+        return [response.text for response in responses]
+
+    for text in asyncio.run(scenario()):
+        events = [block for block in text.split("\n\n") if block]
+        assert "".join(json.loads(block[len("data: "):])["delta"] for block in events[:-1]) == chatbot.provider.reply
+        assert events[-1].startswith("event: done")
+    assert chatbot.provider.calls == 1
+    stats = chatbot.reply_cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["in_flight"]) == (1, 9, 0)
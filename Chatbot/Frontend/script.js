@@ -1,6 +1,8 @@
 const inputMessage = document.getElementById("inputMessage");
 const sendBtn = document.getElementById("sendBtn");
 const chatbox = document.getElementById("chatbox");
+// Server-side conversation the bot remembers; issued with the first reply
+let chatSessionId = null;
 
 
 function appendMessage(text,sender){
@@ -22,6 +24,45 @@ function appendMessage(text,sender){
     msgDiv.appendChild(textBubble);
     chatbox.appendChild(msgDiv);
     chatbox.scrollTop=chatbox.scrollHeight;
+    return textBubble;
+}
+
+// Reads the Server-Sent Events from /chat/stream and adds each chunk to the bubble as it arrives
+async function streamReply(response,textBubble){
+    const reader=response.body.getReader();
+    const decoder=new TextDecoder();
+    let buffer='';
+
+    while(true){
+        const {value,done}=await reader.read();
+        if(done) break;
+        buffer+=decoder.decode(value,{stream:true});
+
+        let boundary;
+        while((boundary=buffer.indexOf("\n\n"))!==-1){
+            const rawEvent=buffer.slice(0,boundary);
+            buffer=buffer.slice(boundary+2);
+
+            let event="message";
+            let data="";
+            rawEvent.split("\n").forEach(line=>{
+                if(line.startsWith("event:")) event=line.slice(6).trim();
+                else if(line.startsWith("data:")) data+=line.slice(5).trim();
+            });
+
+            if(event==="error") throw new Error(JSON.parse(data).detail);
+            if(event==="done"){
+                const result=JSON.parse(data);
+                // The server no longer had our conversation (restart, expiry or another worker)
+                if(result.session_reset) appendMessage("(Our earlier conversation was lost, so this answer doesn't take it into account.)","bot");
+                chatSessionId=result.session_id;
+            }
+            if(event==="message"){
+                textBubble.textContent+=JSON.parse(data).delta;
+                chatbox.scrollTop=chatbox.scrollHeight;
+            }
+        }
+    }
 }
 
 
@@ -35,21 +76,28 @@ async function sendMessage(){
     sendBtn.disabled=true;
 
 
+    let textBubble=null;
     try {
-        const response = await fetch('http://127.0.0.1:8000/chat', {
+        const response = await fetch('http://127.0.0.1:8002/chat/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ message }),
+            body: JSON.stringify({ message, session_id: chatSessionId }),
         });
 
         if (!response.ok) throw new Error("Network response was not ok");
 
-        const data = await response.json();
-        // data.reply
-        appendMessage(data.reply,"bot")
+        // Start with an empty bubble and fill it in as chunks arrive
+        textBubble=appendMessage("","bot");
+        await streamReply(response,textBubble);
 
     } catch (error) {
-        appendMessage('Error: Could not reach the server.','bot');
+        if (textBubble && textBubble.textContent) {
+            textBubble.textContent+=' (reply interrupted)';
+        } else if (textBubble) {
+            textBubble.textContent='Error: Could not reach the server.';
+        } else {
+            appendMessage('Error: Could not reach the server.','bot');
+        }
     } finally{
         sendBtn.disabled=false;
         inputMessage.focus();
@@ -0,0 +1,100 @@
+"""
+fanout.py
+---------
+Outbound fan-out for the MessageBoard websocket.
+
+Every connection gets an Outbox: a bounded queue drained by its own writer
+task. A broadcast only has to push an already-serialized frame onto each
+queue, so one slow or half-dead socket backs up its own queue instead of
+stalling every client after it.
+
+Slow-consumer policies (what happens when a queue is full):
+- "drop_oldest": discard the oldest queued frame to make room for the new one.
+- "disconnect": close the socket once it falls a full queue behind.
+"""
+
+import asyncio
+from fastapi import WebSocket
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+# Frames buffered per connection before the slow-consumer policy kicks in
+OUTBOX_MAX_QUEUE = 256
+
+# Policy applied when a connection's queue is full
+SLOW_CONSUMER_POLICY = DROP_OLDEST
+
+# Close code sent to consumers dropped by the "disconnect" policy (1013 = try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class Outbox:
+  def __init__(self, websocket: WebSocket, max_queue: int = OUTBOX_MAX_QUEUE,
+               policy: str = SLOW_CONSUMER_POLICY, on_close=None) -> None:
+    if policy not in (DROP_OLDEST, DISCONNECT):
+      raise ValueError(f"Unknown slow-consumer policy: {policy}")
+    self.websocket = websocket
+    self.policy = policy
+    self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+    self.dropped = 0
+    self.closed = False
+    self._on_close = on_close
+    self._writer = asyncio.create_task(self._drain())
+
+  def push(self, message: str) -> bool:
+    """Queue a serialized frame without waiting; returns False if the frame was not queued"""
+    if self.closed:
+      return False
+    try:
+      self.queue.put_nowait(message)
+      return True
+    except asyncio.QueueFull:
+      pass
+
+    if self.policy == DISCONNECT:
+      asyncio.create_task(self._evict())
+      return False
+
+    self.queue.get_nowait()  # drop the oldest frame to make room
+    self.dropped += 1
+    self.queue.put_nowait(message)
+    return True
+
+  async def _drain(self):
+    try:
+      while True:
+        message = await self.queue.get()
+        await self.websocket.send_text(message)
+    except asyncio.CancelledError:
+      raise
+    except Exception:
+      # Socket is gone; stop writing and let the manager forget it
+      self._mark_closed()
+
+  async def _evict(self):
+    """Disconnect a consumer that fell a full queue behind"""
+    if self.closed:
+      return
+    self._mark_closed()
+    self._writer.cancel()
+    try:
+      await self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+    except Exception:
+      pass
+
+  def _mark_closed(self):
+    if self.closed:
+      return
+    self.closed = True
+    if self._on_close is not None:
+      self._on_close(self)
+
+  async def close(self):
+    """Stop the writer task; frames still queued are discarded"""
+    self._mark_closed()
+    self._writer.cancel()
+    try:
+      await self._writer
+    except (asyncio.CancelledError, Exception):
+      pass
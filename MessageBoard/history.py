@@ -0,0 +1,193 @@
+"""
+history.py
+----------
+Recent-message history for the MessageBoard websocket.
+
+Every delivered message gets a sequence number (one counter shared by all
+rooms) and its serialized frame is kept in a per-room ring buffer, so it can
+be replayed to joining clients without encoding it again. A client that
+reconnects with the last sequence number it saw only gets the gap.
+
+since() / recent() answer from memory. When a gap reaches further back than
+a room's ring buffer (gap_on_disk()), read_since() gets it from the log; it
+blocks on file reads, so callers run it in a thread.
+
+Frames are also appended to a segment-rotated log on disk, so a restart
+rebuilds the ring buffers instead of wiping them:
+- history/segment-000001.log, segment-000002.log, ... (one JSON line per message)
+- a new segment is started once the current one reaches SEGMENT_MAX_BYTES
+- only the newest MAX_SEGMENTS segments are kept
+
+When several workers share the directory, every worker keeps its own ring
+buffers (the pub-sub layer delivers the same messages in the same order to
+all of them) but only the one holding history/.lock writes the log.
+"""
+
+import json
+import os
+from collections import deque
+
+try:
+  import fcntl
+except ImportError:  # Windows: no advisory locks, single worker assumed
+  fcntl = None
+
+# Directory for the on-disk log ("" keeps history in memory only)
+HISTORY_DIR = os.getenv("MESSAGEBOARD_HISTORY_DIR", "history")
+
+# Messages kept in memory per room
+HISTORY_SIZE = 200
+
+# Messages replayed to a client joining without a last-seen sequence number
+REPLAY_ON_JOIN = 50
+
+# Segment rotation limits
+SEGMENT_MAX_BYTES = 1024 * 1024
+MAX_SEGMENTS = 8
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+
+
+class MessageHistory:
+  def __init__(self, directory: str = HISTORY_DIR, size: int = HISTORY_SIZE,
+               segment_max_bytes: int = SEGMENT_MAX_BYTES, max_segments: int = MAX_SEGMENTS) -> None:
+    self.directory = directory
+    self.size = size
+    self.segment_max_bytes = segment_max_bytes
+    self.max_segments = max_segments
+    self.rooms: dict = {}   # room -> deque of (seq, frame)
+    self.last_seq = 0
+    self._segment = None
+    self._segment_number = 0
+    self._lock = None
+    self.writer = False
+
+    if self.directory:
+      os.makedirs(self.directory, exist_ok=True)
+      self.writer = self._acquire_writer_lock()
+      self._load()
+
+  def next_seq(self) -> int:
+    self.last_seq += 1
+    return self.last_seq
+
+  def append(self, rooms, seq: int, frame: str) -> None:
+    """Record an already-serialized frame for every room it was sent to"""
+    for room in rooms:
+      buffer = self.rooms.get(room)
+      if buffer is None:
+        buffer = self.rooms[room] = deque(maxlen=self.size)
+      buffer.append((seq, frame))
+
+    if self.writer:
+      self._write(json.dumps({"seq": seq, "rooms": list(rooms), "frame": frame}))
+
+  def since(self, room, seq: int) -> list:
+    """(seq, frame) pairs in a room newer than `seq` that are still in memory, oldest first"""
+    buffer = self.rooms.get(room)
+    if not buffer or buffer[-1][0] <= seq:
+      return []
+    return [(frame_seq, frame) for frame_seq, frame in buffer if frame_seq > seq]
+
+  def gap_on_disk(self, room, seq: int) -> bool:
+    """True if frames newer than `seq` have already been pushed out of the room's ring buffer"""
+    buffer = self.rooms.get(room)
+    if not buffer or not self.directory or len(buffer) < buffer.maxlen:
+      return False
+    return buffer[0][0] > seq + 1
+
+  def read_since(self, room, seq: int) -> list:
+    """Like since(), but from the on-disk log (blocking: call it off the event loop)"""
+    return [(frame_seq, frame) for frame_seq, frame in self._read_room(room) if frame_seq > seq]
+
+  def recent(self, room, count: int = REPLAY_ON_JOIN) -> list:
+    """The last `count` (seq, frame) pairs of a room"""
+    buffer = self.rooms.get(room)
+    if not buffer:
+      return []
+    return list(buffer)[-count:]
+
+  def close(self) -> None:
+    if self._segment is not None:
+      self._segment.close()
+      self._segment = None
+    if self._lock is not None:
+      self._lock.close()
+      self._lock = None
+
+  # On-disk log
+
+  def _acquire_writer_lock(self) -> bool:
+    if fcntl is None:
+      return True
+    self._lock = open(os.path.join(self.directory, ".lock"), "w")
+    try:
+      fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      return True
+    except OSError:
+      self._lock.close()
+      self._lock = None
+      return False
+
+  def _segment_numbers(self) -> list:
+    numbers = []
+    for name in os.listdir(self.directory):
+      if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+        numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+    return sorted(numbers)
+
+  def _segment_path(self, number: int) -> str:
+    return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}")
+
+  def _entries(self):
+    for number in self._segment_numbers():
+      try:
+        segment = open(self._segment_path(number), encoding="utf-8")
+      except FileNotFoundError:
+        continue   # rotated away while a replay was reading
+      with segment:
+        for line in segment:
+          try:
+            yield json.loads(line)
+          except ValueError:
+            # Torn final line from a crash mid-write (or one being written)
+            continue
+
+  def _load(self) -> None:
+    for entry in self._entries():
+      for room in entry["rooms"]:
+        buffer = self.rooms.get(room)
+        if buffer is None:
+          buffer = self.rooms[room] = deque(maxlen=self.size)
+        buffer.append((entry["seq"], entry["frame"]))
+      self.last_seq = max(self.last_seq, entry["seq"])
+
+    numbers = self._segment_numbers()
+    self._segment_number = numbers[-1] if numbers else 0
+
+  def _read_room(self, room) -> list:
+    return [(entry["seq"], entry["frame"]) for entry in self._entries() if room in entry["rooms"]]
+
+  def _write(self, line: str) -> None:
+    if self._segment is None or self._segment.tell() >= self.segment_max_bytes:
+      self._rotate()
+    self._segment.write(line + "\n")
+    self._segment.flush()
+
+  def _rotate(self) -> None:
+    if self._segment is not None:
+      self._segment.close()
+      self._segment_number += 1
+    elif self._segment_number == 0:
+      self._segment_number = 1
+
+    self._segment = open(self._segment_path(self._segment_number), "a", encoding="utf-8")
+    if self._segment.tell() >= self.segment_max_bytes:
+      # Reopened a segment that was already full before a restart
+      self._segment.close()
+      self._segment_number += 1
+      self._segment = open(self._segment_path(self._segment_number), "a", encoding="utf-8")
+
+    for number in self._segment_numbers()[:-self.max_segments]:
+      os.remove(self._segment_path(number))
@@ -1,79 +1,184 @@
-from fastapi import FastAPI, WebSocket, Request, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, Request, WebSocketDisconnect, Depends
 from fastapi.responses import HTMLResponse
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional
+import asyncio
 import uuid
 import json
+import os
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from fanout import Outbox, OUTBOX_MAX_QUEUE, SLOW_CONSUMER_POLICY
+from rooms import RoomIndex, LOBBY
+from pubsub import InProcessPubSub, create_pubsub
+from history import MessageHistory
+from contextlib import asynccontextmanager
 
-template = Jinja2Templates(directory="templates")
+# Resolved from this file so the board also works when mounted by gateway.py
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+template = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 
 @dataclass
 class ConnectionManager:
-  def __init__(self)->None:
-    self.active_connections: dict = {}
-
-  async def connect(self, websocket: WebSocket):
+  def __init__(self, max_queue: int = OUTBOX_MAX_QUEUE, policy: str = SLOW_CONSUMER_POLICY, pubsub=None, history=None)->None:
+    self.active_connections: dict = {}   # connection id -> Outbox
+    self.connection_ids: dict = {}       # id(websocket) -> connection id
+    self.rooms = RoomIndex()
+    self.max_queue = max_queue
+    self.policy = policy
+    self.pubsub = pubsub if pubsub is not None else InProcessPubSub()
+    self.history = history if history is not None else MessageHistory(directory="")
+
+  async def start(self):
+    """Subscribe to the pub-sub backend; call once per worker before serving"""
+    await self.pubsub.start(self.deliver)
+
+  async def stop(self):
+    await self.pubsub.close()
+    self.history.close()
+
+  async def connect(self, websocket: WebSocket, room=LOBBY, since: Optional[int] = None):
     await websocket.accept()
-    id = str(uuid.uuid4())
-    self.active_connections[id] = websocket
-    
     data = json.dumps({"isMe": True, "data": "Have joined!!", "username": "You"})
-    await self.send_message(websocket, data)
-    return id
+    await websocket.send_text(data)
+
+    # Replay straight to the socket before the outbox exists, so a long gap
+    # waits on the client instead of overflowing (or evicting) its outbox
+    await self._replay(websocket, room, since)
+
+    # Caught up: register with no await in between, so every later message
+    # reaches this connection through its outbox
+    connection_id = str(uuid.uuid4())
+    self.active_connections[connection_id] = Outbox(
+      websocket, max_queue=self.max_queue, policy=self.policy,
+      on_close=lambda outbox: self._forget(connection_id, outbox),
+    )
+    self.connection_ids[id(websocket)] = connection_id
+    self.rooms.join(connection_id, room)
+    return connection_id
+
+  async def _missed(self, room, since: int) -> list:
+    if self.history.gap_on_disk(room, since):
+      # Parsing the log can take a while; keep the event loop serving other sockets
+      return await asyncio.to_thread(self.history.read_since, room, since)
+    return self.history.since(room, since)
+
+  async def _replay(self, websocket: WebSocket, room, since: Optional[int]):
+    """Send stored frames as-is: the missed gap on reconnect, recent messages
+    otherwise, then whatever arrived meanwhile, until nothing is left"""
+    frames = self.history.recent(room) if since is None else await self._missed(room, since)
+    while frames:
+      for seq, frame in frames:
+        await websocket.send_text(frame)
+        since = seq
+      frames = await self._missed(room, since)
+
+  async def join(self, websocket: WebSocket, room):
+    connection_id = self.connection_ids.get(id(websocket))
+    if connection_id is not None:
+      self.rooms.join(connection_id, room)
+
+  async def leave(self, websocket: WebSocket, room):
+    connection_id = self.connection_ids.get(id(websocket))
+    if connection_id is not None:
+      self.rooms.leave(connection_id, room)
 
   async def send_message(self, ws: WebSocket, message: str):
-    try:
-      await ws.send_text(message)
-    except Exception:
-      # Connection is closed, remove it from active connections
-      await self.remove_connection(ws)
+    outbox = self.active_connections.get(self.connection_ids.get(id(ws)))
+    if outbox is not None:
+      outbox.push(message)
 
   async def broadcast(self, websocket: WebSocket, data: str):
     decoded_data = json.loads(data)
-    closed_connections = []
-
-    for connection_id, connection in self.active_connections.items():
-      try:
-        is_me = False
-        if connection == websocket:
-          is_me = True
-
-        await connection.send_text(json.dumps({"isMe": is_me, "data": decoded_data["message"], "username": decoded_data["username"]}))
-      except Exception:
-        # Connection is closed, mark for removal
-        closed_connections.append(connection_id)
-    
-    # Remove closed connections
-    for connection_id in closed_connections:
+    sender_id = self.connection_ids.get(id(websocket))
+    if sender_id is None:
+      return
+
+    # Relay through pub-sub so members connected to other workers see it too
+    await self.pubsub.publish({
+      "rooms": list(self.rooms.rooms_of(sender_id)),
+      "sender": sender_id,
+      "message": decoded_data["message"],
+      "username": decoded_data["username"],
+    })
+
+  def deliver(self, envelope: dict):
+    """Fan a published message out to this worker's members of its rooms"""
+    sender_id = envelope["sender"]
+    rooms = envelope["rooms"]
+    seq = self.history.next_seq()
+
+    # Serialize once per variant instead of once per connection
+    others = json.dumps({"isMe": False, "data": envelope["message"], "username": envelope["username"], "seq": seq})
+    mine = json.dumps({"isMe": True, "data": envelope["message"], "username": envelope["username"], "seq": seq})
+    self.history.append(rooms, seq, others)
+
+    # Only the sender's rooms are touched; a connection in several of them gets the frame once
+    if len(rooms) == 1:
+      recipients = self.rooms.members(rooms[0])
+    else:
+      recipients = set().union(*(self.rooms.members(room) for room in rooms))
+
+    # Pushing never waits on a socket; each writer task drains its own queue
+    for connection_id in list(recipients):
+      outbox = self.active_connections.get(connection_id)
+      if outbox is not None:
+        outbox.push(mine if connection_id == sender_id else others)
+
+  def _forget(self, connection_id: str, outbox: Outbox):
+    """Drop a connection whose writer has stopped (socket closed or evicted)"""
+    if self.active_connections.get(connection_id) is outbox:
       del self.active_connections[connection_id]
+      self.connection_ids.pop(id(outbox.websocket), None)
+      self.rooms.discard(connection_id)
 
   async def remove_connection(self, websocket: WebSocket):
     """Remove a specific websocket connection from active connections"""
-    for connection_id, connection in list(self.active_connections.items()):
-      if connection == websocket:
-        del self.active_connections[connection_id]
-        break
+    connection_id = self.connection_ids.pop(id(websocket), None)
+    if connection_id is None:
+      return
+    self.rooms.discard(connection_id)
+    outbox = self.active_connections.pop(connection_id, None)
+    if outbox is not None:
+      await outbox.close()
 
   async def disconnect(self, websocket: WebSocket):
     """Properly disconnect and remove a websocket connection"""
     await self.remove_connection(websocket)
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+connection_manager = ConnectionManager(pubsub=create_pubsub(), history=MessageHistory())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  await connection_manager.start()
+  yield
+  await connection_manager.stop()
+
+app = FastAPI(lifespan=lifespan)
+app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static")
+
+async def current_user():
+  """Who is connecting: nobody in particular when run on its own. gateway.py
+  overrides this with the Pulse API's token check (?access_token=...)."""
+  return None
 
 @app.get("/", response_class=HTMLResponse)
 async def get_app(request: Request):
     return template.TemplateResponse("index.html", {"request": request, "title": "Chat app 1"})
 
-connection_manager = ConnectionManager()
-
 
 @app.websocket("/message")
-async def websocket_endpoint(websocket: WebSocket):
-  connection_id = await connection_manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, dorm: Optional[int] = None, since: Optional[int] = None, user=Depends(current_user)):
+  # Each dorm (Dorm.id in the backend) is its own room. Signed-in users always
+  # get their own dorm's room (?dorm= can't put them in another one); without
+  # sign-in (standalone board) ?dorm= picks the room, or everyone shares the lobby
+  if user is not None:
+    dorm = user.dorm_id
+  room = dorm if dorm is not None else LOBBY
+  # `since` is the last sequence number a reconnecting client saw
+  connection_id = await connection_manager.connect(websocket, room, since)
 
   try:
     while True:
@@ -0,0 +1,185 @@
+"""
+pubsub.py
+---------
+Pub-sub relay that lets several MessageBoard workers share one chat.
+
+ConnectionManager publishes every chat message as an envelope here instead of
+writing to its own sockets. Each worker subscribes and fans the envelope out
+to the local members of the envelope's rooms, so a client connected to
+worker A sees messages sent through worker B, and every subscriber gets each
+message exactly once.
+
+Backends (chosen with MESSAGEBOARD_PUBSUB):
+- "memory" (default): in-process, for a single worker.
+- "unix:/path/to/broker.sock": a small broker on a Unix socket that relays
+  newline-delimited JSON envelopes to every connected worker. Start it once
+  with `python pubsub.py /path/to/broker.sock` before the workers; if nothing
+  is listening, the first worker to start hosts it in-process instead.
+  A worker counts as connected once the broker has sent it READY_LINE.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import sys
+
+PUBSUB_URL = os.getenv("MESSAGEBOARD_PUBSUB", "memory")
+
+# Seconds to wait before reconnecting to a broker that went away
+RECONNECT_DELAY = 1.0
+
+# First line the broker sends a worker, once it relays envelopes to it
+READY_LINE = b"ready\n"
+
+
+class InProcessPubSub:
+  """Delivers envelopes straight back to this process's subscriber"""
+
+  def __init__(self) -> None:
+    self._handler = None
+
+  async def start(self, handler) -> None:
+    self._handler = handler
+
+  async def publish(self, envelope: dict) -> None:
+    if self._handler is None:
+      raise RuntimeError("Pub-sub backend has not been started")
+    self._handler(envelope)
+
+  async def close(self) -> None:
+    self._handler = None
+
+
+class UnixSocketPubSub:
+  """Relays envelopes through a broker listening on a Unix socket"""
+
+  def __init__(self, path: str, autostart: bool = True) -> None:
+    self.path = path
+    self.autostart = autostart
+    self._handler = None
+    self._writer = None
+    self._reader_task = None
+    self._broker = None
+    self._connected = asyncio.Event()
+
+  async def start(self, handler) -> None:
+    self._handler = handler
+    await self._connect()
+    self._reader_task = asyncio.create_task(self._read_loop())
+
+  async def _connect(self) -> None:
+    try:
+      reader, writer = await asyncio.open_unix_connection(self.path)
+    except (FileNotFoundError, ConnectionRefusedError):
+      if not self.autostart:
+        raise
+      await self._host_broker()
+      reader, writer = await asyncio.open_unix_connection(self.path)
+    # The connection is accepted before the broker has registered it, and
+    # anything published in between would never reach this worker
+    if await reader.readline() != READY_LINE:
+      writer.close()
+      raise ConnectionResetError("broker closed the connection")
+    self._reader, self._writer = reader, writer
+    self._connected.set()
+
+  async def _host_broker(self) -> None:
+    """Host the broker in this worker when no standalone broker is running"""
+    # Binding replaces whatever socket file is at the path (asyncio unlinks
+    # it first), so workers starting together take turns: check, then bind,
+    # under one lock. Otherwise two of them could each host a broker and
+    # split the workers between them.
+    lock = open(self.path + ".lock", "w")
+    try:
+      await asyncio.get_running_loop().run_in_executor(None, fcntl.flock, lock, fcntl.LOCK_EX)
+      if os.path.exists(self.path):
+        try:
+          # Another worker already hosts it
+          _, writer = await asyncio.open_unix_connection(self.path)
+          writer.close()
+          return
+        except ConnectionRefusedError:
+          os.unlink(self.path)   # left behind by a broker that died
+      self._broker = await start_broker(self.path)
+    finally:
+      lock.close()   # releases the lock
+
+  async def _read_loop(self) -> None:
+    while True:
+      try:
+        line = await self._reader.readline()
+        if not line:
+          raise ConnectionResetError("broker closed the connection")
+        self._handler(json.loads(line))
+      except asyncio.CancelledError:
+        raise
+      except Exception as e:
+        print(f"Pub-sub broker connection lost: {e}")
+        self._connected.clear()
+        while not self._connected.is_set():
+          await asyncio.sleep(RECONNECT_DELAY)
+          try:
+            await self._connect()
+          except OSError:
+            pass
+
+  async def publish(self, envelope: dict) -> None:
+    await self._connected.wait()
+    self._writer.write(json.dumps(envelope).encode() + b"\n")
+    await self._writer.drain()
+
+  async def close(self) -> None:
+    if self._reader_task is not None:
+      self._reader_task.cancel()
+    if self._writer is not None:
+      self._writer.close()
+    if self._broker is not None:
+      self._broker.close()
+      await self._broker.wait_closed()
+
+
+async def start_broker(path: str):
+  """Start a broker that relays every line it receives to every connected worker"""
+  workers = set()
+
+  async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    workers.add(writer)
+    try:
+      writer.write(READY_LINE)
+      await writer.drain()
+      while True:
+        line = await reader.readline()
+        if not line:
+          break
+        for worker in list(workers):
+          worker.write(line)
+        await asyncio.gather(*(worker.drain() for worker in list(workers)), return_exceptions=True)
+    except (ConnectionError, asyncio.IncompleteReadError):
+      pass
+    finally:
+      workers.discard(writer)
+      writer.close()
+
+  return await asyncio.start_unix_server(handle, path=path)
+
+
+def create_pubsub(url: str = PUBSUB_URL):
+  """Build the pub-sub backend named by a MESSAGEBOARD_PUBSUB url"""
+  if url == "memory":
+    return InProcessPubSub()
+  if url.startswith("unix:"):
+    return UnixSocketPubSub(url[len("unix:"):])
+  raise ValueError(f"Unknown pub-sub backend: {url}")
+
+
+if __name__ == "__main__":
+  async def serve(path: str):
+    if os.path.exists(path):
+      os.unlink(path)
+    server = await start_broker(path)
+    print(f"MessageBoard broker listening on {path}")
+    async with server:
+      await server.serve_forever()
+
+  asyncio.run(serve(sys.argv[1] if len(sys.argv) > 1 else "/tmp/messageboard.sock"))
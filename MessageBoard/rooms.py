@@ -0,0 +1,56 @@
+"""
+rooms.py
+--------
+Room membership for the MessageBoard websocket.
+
+Rooms are keyed by dorm (the same ids as Dorm.id in backend/models.py), so a
+message only fans out to the sender's dorm instead of the whole campus.
+
+The index is kept in both directions:
+- rooms:       room -> set of connection ids
+- memberships: connection id -> set of rooms
+so join, leave and disconnect are all O(1) per room touched.
+"""
+
+# Room for clients that did not say which dorm they are in
+LOBBY = "lobby"
+
+
+class RoomIndex:
+  def __init__(self) -> None:
+    self.rooms: dict = {}
+    self.memberships: dict = {}
+
+  def join(self, connection_id: str, room) -> None:
+    self.rooms.setdefault(room, set()).add(connection_id)
+    self.memberships.setdefault(connection_id, set()).add(room)
+
+  def leave(self, connection_id: str, room) -> None:
+    members = self.rooms.get(room)
+    if members is not None:
+      members.discard(connection_id)
+      if not members:
+        del self.rooms[room]
+
+    joined = self.memberships.get(connection_id)
+    if joined is not None:
+      joined.discard(room)
+      if not joined:
+        del self.memberships[connection_id]
+
+  def discard(self, connection_id: str) -> set:
+    """Remove a connection from every room it joined; returns those rooms"""
+    joined = self.memberships.pop(connection_id, set())
+    for room in joined:
+      members = self.rooms.get(room)
+      if members is not None:
+        members.discard(connection_id)
+        if not members:
+          del self.rooms[room]
+    return joined
+
+  def members(self, room) -> set:
+    return self.rooms.get(room, set())
+
+  def rooms_of(self, connection_id: str) -> set:
+    return self.memberships.get(connection_id, set())
@@ -1,8 +1,23 @@
 let $ = jQuery;
 let socket;
+// Last message sequence number seen, so a rejoin only replays what was missed
+let lastSeq = null;
 
 function initializeWebSocket() {
-  socket = new WebSocket('ws://localhost:8000/message');
+  // Join the dorm room passed in the page URL (e.g. /?dorm=3), or the lobby without one
+  const page = new URLSearchParams(window.location.search);
+  const dorm = page.get('dorm');
+  // Sign-in token, required when the board is served by the gateway
+  const accessToken = page.get('access_token');
+  const params = new URLSearchParams();
+  if (dorm) params.set('dorm', dorm);
+  if (accessToken) params.set('access_token', accessToken);
+  if (lastSeq !== null) params.set('since', lastSeq);
+  const query = params.toString();
+  // Relative to the page, so it also works under a path prefix (e.g. /board/)
+  const scheme = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+  const base = window.location.pathname.replace(/\/[^\/]*$/, '');
+  socket = new WebSocket(scheme + window.location.host + base + '/message' + (query ? '?' + query : ''));
 
   socket.onopen = function (event) {
     console.log('WebSocket connection established.');
@@ -10,6 +25,7 @@ function initializeWebSocket() {
 
   socket.onmessage = function (event) {
     const data = JSON.parse(event.data);
+    if (data.seq !== undefined) lastSeq = data.seq;
     const msgClass = data.isMe ? 'user-message' : 'other-message';
     const sender = data.isMe ? 'You' : data.username;
     const message = data.data;
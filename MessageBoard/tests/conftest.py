@@ -0,0 +1,31 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The board's modules use flat imports (from rooms import ...), as when run from
+# MessageBoard/. Appended, so `import main` in the API's tests still finds backend/main.py
+MESSAGEBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if MESSAGEBOARD_DIR not in sys.path:
+  sys.path.append(MESSAGEBOARD_DIR)
+
+# Keep the default history out of the working tree
+os.environ["MESSAGEBOARD_HISTORY_DIR"] = tempfile.mkdtemp(prefix="messageboard-tests-")
+os.environ.setdefault("MESSAGEBOARD_PUBSUB", "memory")
+
+
+@pytest.fixture
+def board(tmp_path):
+  """A fresh copy of MessageBoard/main.py (loaded under its own name, since the
+  API also has a main.py) whose history lives in tmp_path"""
+  from history import MessageHistory
+
+  spec = importlib.util.spec_from_file_location("messageboard_main", os.path.join(MESSAGEBOARD_DIR, "main.py"))
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  module.connection_manager.history.close()
+  module.connection_manager.history = MessageHistory(directory=str(tmp_path))
+  yield module
+  module.connection_manager.history.close()
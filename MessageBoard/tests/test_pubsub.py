@@ -0,0 +1,114 @@
+"""Several worker processes share one chat through UnixSocketPubSub: every
+worker must receive every published envelope exactly once."""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+MESSAGEBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKERS = 8
+MESSAGES_PER_WORKER = 50
+
+# One worker process: connect, report "ready", publish on "go", then print
+# everything it received once it has seen all WORKERS * MESSAGES_PER_WORKER
+# envelopes (or timed out), and stay connected until "exit" so a broker it
+# hosts outlives the other workers' reads.
+WORKER = r"""
+import asyncio, json, sys
+from pubsub import UnixSocketPubSub
+
+path, name, workers, count, autostart = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), sys.argv[5] == "1"
+
+async def main():
+  received = []
+  done = asyncio.Event()
+  def deliver(envelope):
+    received.append(envelope)
+    if len(received) >= workers * count:
+      done.set()
+
+  pubsub = UnixSocketPubSub(path, autostart=autostart)
+  await pubsub.start(deliver)
+  loop = asyncio.get_running_loop()
+  print("ready", flush=True)
+  await loop.run_in_executor(None, sys.stdin.readline)   # go
+
+  for n in range(count):
+    await pubsub.publish({"rooms": [1], "sender": name, "message": str(n), "username": name})
+  try:
+    await asyncio.wait_for(done.wait(), 10)
+  except asyncio.TimeoutError:
+    pass
+  await asyncio.sleep(0.2)   # anything extra (duplicates) arrives now
+  print(json.dumps(received), flush=True)
+
+  await loop.run_in_executor(None, sys.stdin.readline)   # exit
+  await pubsub.close()
+
+asyncio.run(main())
+"""
+
+
+def run_workers(path, autostart):
+  procs = [
+    subprocess.Popen(
+      [sys.executable, "-c", WORKER, path, f"w{i}", str(WORKERS), str(MESSAGES_PER_WORKER), "1" if autostart else "0"],
+      cwd=MESSAGEBOARD_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+    for i in range(WORKERS)
+  ]
+  try:
+    for proc in procs:
+      assert proc.stdout.readline().strip() == "ready"
+    for proc in procs:
+      proc.stdin.write("go\n")
+      proc.stdin.flush()
+    results = [json.loads(proc.stdout.readline()) for proc in procs]
+    for proc in procs:
+      proc.stdin.write("exit\n")
+      proc.stdin.flush()
+    for proc in procs:
+      proc.wait(timeout=10)
+    return results
+  finally:
+    for proc in procs:
+      if proc.poll() is None:
+        proc.kill()
+
+
+def assert_exactly_once(results):
+  expected = {(f"w{i}", str(n)) for i in range(WORKERS) for n in range(MESSAGES_PER_WORKER)}
+  for received in results:
+    keys = [(envelope["sender"], envelope["message"]) for envelope in received]
+    assert len(keys) == len(set(keys)), "an envelope was delivered twice"
+    assert set(keys) == expected
+
+
+@pytest.fixture
+def socket_path():
+  with tempfile.TemporaryDirectory() as directory:
+    yield os.path.join(directory, "broker.sock")
+
+
+def test_standalone_broker_delivers_exactly_once(socket_path):
+  broker = subprocess.Popen([sys.executable, "pubsub.py", socket_path], cwd=MESSAGEBOARD_DIR, stdout=subprocess.PIPE)
+  try:
+    deadline = time.time() + 10
+    while not os.path.exists(socket_path):
+      assert time.time() < deadline, "broker did not start"
+      time.sleep(0.05)
+    assert_exactly_once(run_workers(socket_path, autostart=False))
+  finally:
+    broker.terminate()
+    broker.wait(timeout=10)
+
+
+def test_worker_hosted_broker_delivers_exactly_once(socket_path):
+  # No broker running: the workers race to host one in-process
+  assert_exactly_once(run_workers(socket_path, autostart=True))
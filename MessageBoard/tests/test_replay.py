@@ -0,0 +1,48 @@
+"""Reconnecting clients get their whole missed gap, even when it is longer
+than the outbox and has to be read back from the on-disk log."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fanout import DISCONNECT, DROP_OLDEST
+
+MESSAGES = 400   # more than HISTORY_SIZE (ring buffer) and OUTBOX_MAX_QUEUE
+
+
+def send_messages(client, count):
+  with client.websocket_connect("/message?dorm=1") as ws:
+    ws.receive_json()   # "Have joined!!"
+    for n in range(count):
+      ws.send_text(json.dumps({"message": f"m{n}", "username": "a"}))
+    # Wait until the server has stored the last one (earlier echoes may be dropped)
+    while ws.receive_json().get("seq") != count:
+      pass
+
+
+@pytest.mark.parametrize("policy", [DROP_OLDEST, DISCONNECT])
+def test_reconnect_replays_whole_gap(board, policy):
+  with TestClient(board.app) as client:
+    send_messages(client, MESSAGES)
+    # The policy that used to drop (or evict on) a replay longer than the outbox
+    board.connection_manager.policy = policy
+
+    with client.websocket_connect("/message?dorm=1&since=0") as ws:
+      assert ws.receive_json()["data"] == "Have joined!!"
+      seqs = [ws.receive_json()["seq"] for _ in range(MESSAGES)]
+      assert seqs == list(range(1, MESSAGES + 1))
+
+      # Then live messages arrive through the outbox as usual
+      ws.send_text(json.dumps({"message": "live", "username": "b"}))
+      assert ws.receive_json() == {"isMe": True, "data": "live", "username": "b", "seq": MESSAGES + 1}
+
+
+def test_reconnect_gets_only_the_gap(board):
+  with TestClient(board.app) as client:
+    send_messages(client, 10)
+    with client.websocket_connect("/message?dorm=1&since=7") as ws:
+      ws.receive_json()
+      assert [ws.receive_json()["seq"] for _ in range(3)] == [8, 9, 10]
+      ws.send_text(json.dumps({"message": "live", "username": "b"}))
+      assert ws.receive_json()["seq"] == 11
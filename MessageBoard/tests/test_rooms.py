@@ -0,0 +1,35 @@
+"""Signed-in members always land in their own dorm's room; ?dorm= only picks
+the room when nobody is signed in (the board running on its own)."""
+
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+
+def post(client, query, text):
+  with client.websocket_connect(f"/message{query}") as ws:
+    ws.receive_json()   # "Have joined!!"
+    ws.send_text(json.dumps({"message": text, "username": "a"}))
+    ws.receive_json()   # our own echo: the message is stored
+
+
+def frames(board, room):
+  return [json.loads(frame)["data"] for _, frame in board.connection_manager.history.since(room, 0)]
+
+
+def test_signed_in_user_cannot_pick_another_dorm(board):
+  board.app.dependency_overrides[board.current_user] = lambda: SimpleNamespace(dorm_id=2)
+  with TestClient(board.app) as client:
+    post(client, "?dorm=1", "hello")
+    post(client, "", "again")
+  assert frames(board, 2) == ["hello", "again"]
+  assert frames(board, 1) == []
+
+
+def test_dorm_query_picks_the_room_without_sign_in(board):
+  with TestClient(board.app) as client:
+    post(client, "?dorm=1", "hello")
+    post(client, "", "lobby")
+  assert frames(board, 1) == ["hello"]
+  assert frames(board, board.LOBBY) == ["lobby"]
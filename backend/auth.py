@@ -5,11 +5,17 @@ Handles authentication and security:
 - Password hashing and verification using bcrypt.
 - JWT (JSON Web Token) for creating and decoding.
 - Utility functions for validating access tokens.
+- A bounded worker pool so bcrypt never runs on the event loop.
 
 How it works:
 - When a user logs in, we hash their password and compare with the stored hash.
 - If valid, we create a JWT token with an expiration time.
 - Protected endpoints can call verify_token() to check validity of the token.
+- bcrypt is deliberately slow (hundreds of ms of CPU), so the async endpoints
+  hash through hash_password_async()/verify_password_async(), which run it on
+  a dedicated thread pool (bcrypt releases the GIL, so threads use every core).
+  When too many hashes are queued we answer 503 right away instead of letting
+  logins starve every other endpoint.
 """
 
 from datetime import datetime, timedelta   # for token expiration times
@@ -17,6 +23,8 @@ from typing import Optional                # allows optional arguments
 from jose import JWTError, jwt             # to create and decode JWT tokens
 from passlib.context import CryptContext   # for password hashing
 from fastapi import HTTPException, status  # to raise errors in FastAPI
+from concurrent.futures import ThreadPoolExecutor  # dedicated pool for bcrypt work
+import asyncio                             # to await the pool from async endpoints
 import os                                  # (optional) for environment variables
 
 # Configuration
@@ -30,11 +38,25 @@ ALGORITHM = "HS256"
 # Default token expiration time (in minutes).
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# bcrypt cost factor. Changing it is safe: older hashes are upgraded on next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Threads that run bcrypt, and how many hashes may wait for one before we return 503.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+
 # Password Hashing
 
 # Passlib provides a context to handle hashing/verification.
-# We use bcrypt algorithm here.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# We use bcrypt algorithm here. Pinning min/max rounds makes passlib flag
+# any hash made with a different cost as needing an update.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 # Verify a plain password against a hashed one.
 def verify_password(plain_password, hashed_password):
@@ -44,6 +66,39 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# Bounded bcrypt pool
+
+class HashingPool:
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.max_pending = max_pending
+        self.pending = 0   # hashes queued or running (only touched from the event loop)
+
+    async def run(self, func, *args):
+        # Fail fast when saturated so clients retry instead of piling up
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-ins right now, please try again",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+hashing_pool = HashingPool()
+
+# Async version of get_password_hash() for use in async endpoints.
+async def hash_password_async(password):
+    return await hashing_pool.run(pwd_context.hash, password)
+
+# Async password check. Returns (is_valid, new_hash); new_hash is set when the
+# stored hash used a different BCRYPT_ROUNDS and should be saved in its place.
+async def verify_password_async(plain_password, hashed_password):
+    return await hashing_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
 # JWT token creation
 
 # Create a new access token (JWT).
@@ -63,6 +118,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 # Decode and validate a token. If invalid/expired, raise HTTP 401 Unauthorized.
 def verify_token(token: str):
+    email, _ = verify_token_claims(token)
+    return email   # return the subject (email) for later use
+
+# Same as verify_token(), but also returns the token's expiry ("exp", seconds
+# since epoch) so callers can cache the result for exactly as long as it is valid.
+def verify_token_claims(token: str):
     try:
         # Decode token with our secret key and algorithm
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -76,7 +137,7 @@ def verify_token(token: str):
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return email   # return the subject (email) for later use
+        return email, payload.get("exp")
     except JWTError:
         # If token is expired, invalid, or tampered with → reject
         raise HTTPException(
@@ -0,0 +1,81 @@
+"""
+auth_cache.py
+-------------
+In-process caches that let get_current_user() skip repeated work on every
+protected request.
+
+- token_cache: verified JWT -> user id. An entry lives until the token's own
+  "exp", so a cached token is never accepted after it would have expired.
+- user_cache: user id -> the user's column values, kept for a short TTL so
+  profile edits made elsewhere show up quickly. update_profile() drops the
+  entry right away.
+
+With both warm, a request for GET /requests or GET /medicines does no JWT
+decode and no SELECT on users at all.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# How many verified tokens / users to keep (least recently used go first)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+# Seconds a cached user is trusted before it is read from the database again
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+
+# LRU cache where every entry carries its own expiry time (seconds since epoch).
+# Sync endpoints run in a threadpool, so access is guarded by a lock.
+class ExpiringCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = ExpiringCache(TOKEN_CACHE_SIZE)
+user_cache = ExpiringCache(USER_CACHE_SIZE)
+
+
+# Column values of a user, safe to share between requests (no session attached)
+def snapshot_user(user):
+    return {column.name: getattr(user, column.name) for column in user.__table__.columns}
+
+
+def cache_user(user):
+    user_cache.set(user.id, snapshot_user(user), time.time() + USER_CACHE_TTL)
+
+
+# Call after any write to a user row so the next request reads it fresh
+def invalidate_user(user_id):
+    user_cache.pop(user_id)
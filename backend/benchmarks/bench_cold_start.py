@@ -0,0 +1,90 @@
+"""
+bench_cold_start.py
+-------------------
+How long a worker takes to come up, in fresh processes (as uvicorn spawns them).
+
+- import:  `import main` (no database access at import time)
+- startup: the lifespan: migration check, dorm seeding, matching names and
+           /dorms cache warm-up
+
+Measured three ways:
+
+- migrated: the database was set up beforehand with `python migrations.py`
+            (the normal deployment), best and median of --runs workers
+- fresh:    the first worker on an empty database also runs the migrations
+- together: --workers workers started at once on an empty database, as
+            `uvicorn --workers N` does; all must agree on one schema
+
+    python benchmarks/bench_cold_start.py [--runs 7] [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+
+from bench_common import BACKEND_DIR, use_temp_database
+
+WORKER = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import database
+
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+    await database.async_engine.dispose()
+
+asyncio.run(boot())
+print(json.dumps({"import_ms": (imported - started) * 1000, "startup_ms": (time.perf_counter() - imported) * 1000}))
+"""
+
+
+def start_worker():
+    return subprocess.Popen([sys.executable, "-c", WORKER], cwd=BACKEND_DIR, env=dict(os.environ),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+
+def finish(worker) -> dict:
+    out, err = worker.communicate()
+    if worker.returncode != 0:
+        raise RuntimeError(err)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def report(label, results):
+    imports = [result["import_ms"] for result in results]
+    startups = [result["startup_ms"] for result in results]
+    print(f"{label:<10} import best {min(imports):6.0f} ms, median {statistics.median(imports):6.0f} ms   "
+          f"startup best {min(startups):6.0f} ms, median {statistics.median(startups):6.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="sequential workers on the migrated database")
+    parser.add_argument("--workers", type=int, default=4, help="workers started together on an empty database")
+    args = parser.parse_args()
+
+    use_temp_database()
+    subprocess.run([sys.executable, "migrations.py"], cwd=BACKEND_DIR, env=dict(os.environ), check=True, capture_output=True)
+    report("migrated", [finish(start_worker()) for _ in range(args.runs)])
+
+    use_temp_database()
+    report("fresh", [finish(start_worker())])
+
+    path = use_temp_database()
+    report("together", [finish(worker) for worker in [start_worker() for _ in range(args.workers)]])
+    connection = sqlite3.connect(path)
+    versions = connection.execute("SELECT COUNT(*), MAX(version) FROM schema_version").fetchone()
+    dorms = connection.execute("SELECT COUNT(*) FROM dorms").fetchone()[0]
+    connection.close()
+    print(f"           {args.workers} workers -> {versions[0]} schema_version rows (latest {versions[1]}), {dorms} dorms")
+
+
+if __name__ == "__main__":
+    main()
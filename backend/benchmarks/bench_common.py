@@ -0,0 +1,69 @@
+"""
+bench_common.py
+---------------
+Shared setup for the scripts in benchmarks/. Run them from backend/:
+
+    python benchmarks/bench_login.py
+
+Each script works on a throwaway SQLite database (never medshare.db):
+use_temp_database() must run before anything imports database.py.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+# Point DATABASE_URL at a new SQLite file and return its path
+def use_temp_database(prefix="pulse-bench-") -> str:
+    path = os.path.join(tempfile.mkdtemp(prefix=prefix), "medshare.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+
+# An httpx client for the app with its lifespan running (migrations, seeding, sweeper)
+@asynccontextmanager
+async def app_client(app):
+    import httpx
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            yield client
+
+
+async def register(client, email, dorm_id=1, password="password", **fields) -> dict:
+    body = {"email": email, "password": password, "first_name": "Bench", "last_name": "User", "dorm_id": dorm_id, **fields}
+    response = await client.post("/auth/register", json=body)
+    response.raise_for_status()
+    login = await client.post("/auth/login", params={"email": email, "password": password})
+    login.raise_for_status()
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
+def percentile(values, pct) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# Milliseconds per call of fn() (best of `repeat` runs of `number` calls)
+def time_ms(fn, number=20, repeat=5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best * 1000
+
+
+def summary_ms(samples) -> str:
+    return (f"p50 {statistics.median(samples) * 1000:.1f} ms, "
+            f"p99 {percentile(samples, 99) * 1000:.1f} ms")
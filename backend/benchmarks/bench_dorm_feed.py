@@ -0,0 +1,99 @@
+"""
+bench_dorm_feed.py
+------------------
+The dorm feed (first page of a dorm's pending requests, newest first) read
+through the users join versus the denormalized requests.dorm_id column.
+
+- join:         requests JOIN users ON requester_id WHERE users.dorm_id = ?
+                (users.dorm_id index + ix_requests_requester_id_status_created_at)
+- denormalized: WHERE requests.dorm_id = ? (one range scan of
+                ix_requests_dorm_id_status_created_at_id)
+
+Both run on the real schema (migrations.py) seeded with USERS users spread
+over 13 dorms and REQUESTS requests, a quarter of them no longer pending.
+The query plans are printed alongside the timings.
+
+    python benchmarks/bench_dorm_feed.py [--users 20000] [--requests 300000] [--page 20]
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from bench_common import time_ms, use_temp_database
+
+DORMS = 13
+
+JOIN = """
+SELECT r.id, r.medicine_name, r.quantity_requested, r.status, r.created_at
+FROM requests r JOIN users u ON u.id = r.requester_id
+WHERE u.dorm_id = :dorm_id AND r.status = 'pending'
+ORDER BY r.created_at DESC, r.id DESC
+LIMIT :limit
+"""
+
+DENORMALIZED = """
+SELECT r.id, r.medicine_name, r.quantity_requested, r.status, r.created_at
+FROM requests r
+WHERE r.dorm_id = :dorm_id AND r.status = 'pending'
+ORDER BY r.created_at DESC, r.id DESC
+LIMIT :limit
+"""
+
+
+def seed(engine, users, requests):
+    from sqlalchemy import insert
+    from models import Dorm, Request, User
+
+    now = datetime.utcnow()
+    rng = random.Random(13)
+    with engine.begin() as connection:
+        connection.execute(insert(Dorm), [{"id": d, "name": f"Dorm {d}", "location": "Campus"} for d in range(1, DORMS + 1)])
+        connection.execute(insert(User), [
+            {"id": u, "email": f"u{u}@asu.edu", "hashed_password": "x", "first_name": "U", "last_name": "U",
+             "dorm_id": u % DORMS + 1, "is_active": True, "created_at": now}
+            for u in range(1, users + 1)
+        ])
+        for start in range(0, requests, 50000):
+            rows = []
+            for n in range(start, min(start + 50000, requests)):
+                requester = rng.randint(1, users)
+                rows.append({
+                    "requester_id": requester, "dorm_id": requester % DORMS + 1, "medicine_name": "ibuprofen",
+                    "quantity_requested": 1, "message": "", "status": "pending" if n % 4 else "completed",
+                    "is_anonymous": True, "created_at": now - timedelta(seconds=n), "expires_at": now + timedelta(days=1),
+                })
+            connection.execute(insert(Request), rows)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=300000)
+    parser.add_argument("--page", type=int, default=20)
+    args = parser.parse_args()
+
+    use_temp_database()
+    from sqlalchemy import text
+    from database import engine
+    from migrations import run_migrations
+
+    run_migrations(engine)
+    seed(engine, args.users, args.requests)
+    print(f"{args.requests} requests, {args.users} users, {DORMS} dorms, page of {args.page}")
+
+    with engine.connect() as connection:
+        params = {"dorm_id": 5, "limit": args.page}
+        for name, sql in (("join", JOIN), ("denormalized", DENORMALIZED)):
+            plan = connection.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+            rows = connection.execute(text(sql), params).all()
+            ms = time_ms(lambda: connection.execute(text(sql), params).all())
+            print(f"\n{name:<13} {ms:8.3f} ms/query ({len(rows)} rows)")
+            for row in plan:
+                print(f"    {row[-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+bench_login.py
+--------------
+Login throughput against the size of the bcrypt pool (auth.HASH_WORKERS).
+
+For each pool size a fresh process fires LOGINS concurrent POST /auth/login
+requests at the app, while another task keeps calling GET /dorms and records
+how long it waits. bcrypt releases the GIL, so logins/s should grow with the
+pool up to the number of cores, and /dorms should stay fast throughout
+because hashing never runs on the event loop.
+
+    python benchmarks/bench_login.py [--logins 48] [--rounds 10] [--workers 1,2,4,8]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bench_common import app_client, register, summary_ms, use_temp_database
+
+
+async def storm(logins):
+    import main
+
+    async with app_client(main.app) as client:
+        await register(client, "bench@asu.edu")
+
+        dorm_waits = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/dorms")
+                dorm_waits.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        async def login():
+            response = await client.post("/auth/login", params={"email": "bench@asu.edu", "password": "password"})
+            return response.status_code
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "ok": statuses.count(200),
+        "rejected": statuses.count(503),
+        "logins_per_s": statuses.count(200) / elapsed,
+        "dorms": summary_ms(dorm_waits),
+    }
+
+
+def child(logins):
+    use_temp_database()
+    print(json.dumps(asyncio.run(storm(logins))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=48)
+    parser.add_argument("--rounds", type=int, default=10, help="BCRYPT_ROUNDS (the app default is 12)")
+    parser.add_argument("--workers", default=None, help="comma-separated pool sizes (default 1,2,4,<cores>)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.logins)
+        return
+
+    cores = os.cpu_count() or 1
+    sizes = [int(n) for n in args.workers.split(",")] if args.workers else sorted({1, 2, 4, cores})
+    print(f"{args.logins} concurrent logins, BCRYPT_ROUNDS={args.rounds}, {cores} cores")
+    for size in sizes:
+        env = dict(os.environ, HASH_WORKERS=str(size), HASH_MAX_PENDING=str(args.logins), BCRYPT_ROUNDS=str(args.rounds))
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", "--logins", str(args.logins)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"HASH_WORKERS={size:<3} {result['logins_per_s']:7.1f} logins/s  "
+              f"({result['ok']} ok, {result['rejected']} rejected)  GET /dorms meanwhile: {result['dorms']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+bench_search.py
+---------------
+Search latency (search.py) as the medicines and requests tables grow.
+
+The tables are filled in steps up to each size in --rows (the same number of
+medicines and requests, spread over USERS users in 13 dorms). At each step
+every query in QUERIES is run through search_medicine_ids /
+search_request_ids for one dorm, first page (51 hits, as the endpoints ask
+for). For comparison the same medicine lookup is also run as the LIKE scan
+it replaces.
+
+    python benchmarks/bench_search.py [--rows 10000,100000,300000] [--samples 50]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from bench_common import percentile, use_temp_database
+
+DORMS = 13
+USERS = 5000
+PAGE = 51
+
+EXTRA_NAMES = ["vitamin c", "melatonin", "zinc", "cough drops", "band aids", "hydrocortisone"]
+STRENGTHS = ["200mg", "tabs", "extra strength", ""]
+REASONS = ["headache", "allergies", "cold", "fever", "cramps"]
+
+# (function name in search.py, what the user typed)
+QUERIES = [
+    ("search_medicine_ids", "cetirizine"),
+    ("search_medicine_ids", "zyrtec"),       # brand name, also searches its generic
+    ("search_medicine_ids", "mel"),          # prefix while typing
+    ("search_medicine_ids", "vitamin c"),
+    ("search_request_ids", "headache"),      # only in the message
+    ("search_request_ids", "advil"),
+]
+
+LIKE_MEDICINES = """
+SELECT m.id FROM medicines m JOIN users u ON u.id = m.owner_id
+WHERE u.dorm_id = :dorm_id AND m.status = 'active' AND lower(m.name) LIKE :pattern
+ORDER BY m.id LIMIT :limit
+"""
+
+
+def seed_users(engine):
+    from sqlalchemy import insert
+    from models import Dorm, User
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(insert(Dorm), [{"id": d, "name": f"Dorm {d}", "location": "Campus"} for d in range(1, DORMS + 1)])
+        connection.execute(insert(User), [
+            {"id": u, "email": f"u{u}@asu.edu", "hashed_password": "x", "first_name": "U", "last_name": "U",
+             "dorm_id": u % DORMS + 1, "is_active": True, "created_at": now}
+            for u in range(1, USERS + 1)
+        ])
+
+
+# Add `count` medicines and `count` requests (the FTS triggers index them as they go in)
+def seed_rows(engine, count, rng):
+    from sqlalchemy import insert
+    from matching import ALIASES
+    from models import Medicine, Request
+
+    names = sorted(set(ALIASES) | set(ALIASES.values())) + EXTRA_NAMES
+    now = datetime.utcnow()
+    for start in range(0, count, 50000):
+        size = min(50000, count - start)
+        with engine.begin() as connection:
+            connection.execute(insert(Medicine), [
+                {"name": f"{rng.choice(names)} {rng.choice(STRENGTHS)}".strip(), "quantity": 5,
+                 "expiration_date": now + timedelta(days=365), "owner_id": rng.randint(1, USERS),
+                 "status": "active", "created_at": now}
+                for _ in range(size)
+            ])
+            requesters = [rng.randint(1, USERS) for _ in range(size)]
+            connection.execute(insert(Request), [
+                {"requester_id": requester, "dorm_id": requester % DORMS + 1, "medicine_name": rng.choice(names),
+                 "quantity_requested": 1, "message": f"need it for {rng.choice(REASONS)}",
+                 "status": rng.choice(["pending", "completed", "expired"]), "is_anonymous": True,
+                 "created_at": now, "expires_at": now + timedelta(days=1)}
+                for requester in requesters
+            ])
+
+
+async def measure(samples):
+    from sqlalchemy import text
+    import search
+    from database import AsyncSessionLocal, async_engine
+
+    results = []
+    async with AsyncSessionLocal() as db:
+        async def timed(call):
+            await call()   # warm the page cache
+            waits = []
+            for _ in range(samples):
+                started = time.perf_counter()
+                hits = await call()
+                waits.append(time.perf_counter() - started)
+            return len(hits), waits
+
+        for function, q in QUERIES:
+            search_ids = getattr(search, function)
+            hits, waits = await timed(lambda: search_ids(db, 5, q, PAGE))
+            results.append((f"{function} {q!r}", hits, waits))
+
+        async def like_scan():
+            params = {"dorm_id": 5, "pattern": "%cetirizine%", "limit": PAGE}
+            return (await db.execute(text(LIKE_MEDICINES), params)).all()
+
+        hits, waits = await timed(like_scan)
+        results.append(("LIKE scan 'cetirizine'", hits, waits))
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,100000,300000", help="comma-separated table sizes")
+    parser.add_argument("--samples", type=int, default=50, help="timed runs per query")
+    args = parser.parse_args()
+
+    use_temp_database()
+    from database import engine
+    from migrations import run_migrations
+
+    run_migrations(engine)
+    seed_users(engine)
+    rng = random.Random(21)
+    seeded = 0
+    for size in sorted(int(n) for n in args.rows.split(",")):
+        seed_rows(engine, size - seeded, rng)
+        seeded = size
+        with engine.connect() as connection:
+            connection.exec_driver_sql("ANALYZE")
+
+        print(f"\n{size} medicines + {size} requests, dorm 5, first page of {PAGE}")
+        for name, hits, waits in asyncio.run(measure(args.samples)):
+            print(f"  {name:<34} {hits:3d} hits   p50 {percentile(waits, 50) * 1000:7.2f} ms   "
+                  f"p95 {percentile(waits, 95) * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+bench_serialization.py
+----------------------
+Building a list response body the old way and through fast_json.py.
+
+- schema: load ORM objects, validate each into the response schema
+          (from_attributes) and render with FastAPI's JSONResponse, as
+          response_model=list[...] did.
+- fast:   select the schema's columns only and serialize the plain rows in
+          one orjson call (fast_json.project / rows_to_json).
+
+Timed from the query to the finished bytes, for medicines (MedicineResponse)
+and requests (RequestResponse) at each size in --rows. The two bodies are
+checked to be identical before timing.
+
+    python benchmarks/bench_serialization.py [--rows 1000,10000] [--repeat 7]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bench_common import use_temp_database
+
+OWNER_ID = 1
+
+
+def seed(engine, count):
+    from sqlalchemy import delete, insert
+    from models import Dorm, Medicine, Request, User
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(delete(Medicine))
+        connection.execute(delete(Request))
+        if connection.execute(User.__table__.select().limit(1)).first() is None:
+            connection.execute(insert(Dorm), [{"id": 1, "name": "Dorm 1", "location": "Campus"}])
+            connection.execute(insert(User), [{"id": OWNER_ID, "email": "bench@asu.edu", "hashed_password": "x",
+                                               "first_name": "B", "last_name": "U", "dorm_id": 1, "is_active": True,
+                                               "created_at": now}])
+        connection.execute(insert(Medicine), [
+            {"name": f"ibuprofen {n}", "quantity": n, "expiration_date": now + timedelta(days=n % 365),
+             "owner_id": OWNER_ID, "status": "active", "created_at": now}
+            for n in range(count)
+        ])
+        connection.execute(insert(Request), [
+            {"requester_id": OWNER_ID, "dorm_id": 1, "medicine_name": f"cetirizine {n}", "quantity_requested": 1,
+             "message": "for allergies" if n % 2 else None, "status": "pending", "is_anonymous": True,
+             "created_at": now - timedelta(seconds=n), "expires_at": now + timedelta(days=1)}
+            for n in range(count)
+        ])
+
+
+async def schema_body(db, schema, model):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from sqlalchemy import select
+
+    objects = (await db.execute(select(model).order_by(model.id))).scalars().all()
+    body = JSONResponse(content=jsonable_encoder([schema.model_validate(obj) for obj in objects])).body
+    db.expunge_all()   # next run loads fresh objects, as a new request would
+    return body
+
+
+async def fast_body(db, schema, model):
+    from sqlalchemy import select
+    from fast_json import project, rows_to_json
+
+    rows = (await db.execute(select(*project(schema, model)).order_by(model.id))).all()
+    return rows_to_json(schema, rows)
+
+
+async def measure(repeat):
+    from database import AsyncSessionLocal, async_engine
+    from models import Medicine, Request
+    from schemas import MedicineResponse, RequestResponse
+
+    results = []
+    async with AsyncSessionLocal() as db:
+        for schema, model in ((MedicineResponse, Medicine), (RequestResponse, Request)):
+            assert await schema_body(db, schema, model) == await fast_body(db, schema, model)
+            timings = {}
+            for name, build in (("schema", schema_body), ("fast", fast_body)):
+                samples = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    await build(db, schema, model)
+                    samples.append(time.perf_counter() - started)
+                timings[name] = statistics.median(samples) * 1000
+            results.append((model.__tablename__, timings))
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,10000", help="comma-separated list sizes")
+    parser.add_argument("--repeat", type=int, default=7, help="timed runs per path (median reported)")
+    args = parser.parse_args()
+
+    use_temp_database()
+    import fast_json
+    from database import engine
+    from migrations import run_migrations
+
+    run_migrations(engine)
+    print(f"serializer: {'orjson' if fast_json.orjson is not None else 'json (orjson not installed)'}")
+    for count in (int(n) for n in args.rows.split(",")):
+        seed(engine, count)
+        for table, timings in asyncio.run(measure(args.repeat)):
+            print(f"{count:>6} {table:<10} schema {timings['schema']:8.1f} ms   fast {timings['fast']:7.1f} ms   "
+                  f"{timings['schema'] / timings['fast']:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+bench_sync_vs_async.py
+----------------------
+Mixed read/write load on the old and the new database stack.
+
+- sync:  `def` endpoints on the threadpool, a plain sync SQLite engine
+         (rollback journal, no pragmas), as before database.py went async.
+- async: `async def` endpoints on async sessions (aiosqlite) with the WAL /
+         synchronous / cache / busy_timeout pragmas from database.py.
+
+Both serve the same two endpoints over the same seeded schema (each stack
+gets its own copy of the file): the dorm feed (newest pending requests of a
+dorm, as GET /requests) and creating a request (as POST /requests). CLIENTS
+concurrent clients send WRITE_RATIO writes and the rest reads for DURATION
+seconds each.
+
+    python benchmarks/bench_sync_vs_async.py [--clients 32] [--duration 5] [--write-ratio 0.2] [--requests 50000]
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import time
+from datetime import datetime, timedelta
+
+from bench_common import percentile, use_temp_database
+
+DORMS = 13
+USERS = 2000
+
+
+def seed(path, request_count):
+    from sqlalchemy import create_engine, insert
+    from migrations import run_migrations
+    from models import Dorm, Request, User
+
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(insert(Dorm), [{"id": d, "name": f"Dorm {d}", "location": "Campus"} for d in range(1, DORMS + 1)])
+        connection.execute(insert(User), [
+            {"id": u, "email": f"u{u}@asu.edu", "hashed_password": "x", "first_name": "U", "last_name": "U",
+             "dorm_id": u % DORMS + 1, "is_active": True, "created_at": now}
+            for u in range(1, USERS + 1)
+        ])
+        connection.execute(insert(Request), [
+            {"requester_id": (n % USERS) + 1, "dorm_id": (n % USERS) % DORMS + 1, "medicine_name": "ibuprofen",
+             "quantity_requested": 1, "message": "", "status": "pending" if n % 4 else "completed",
+             "is_anonymous": True, "created_at": now - timedelta(seconds=n), "expires_at": now + timedelta(days=1)}
+            for n in range(request_count)
+        ])
+    engine.dispose()
+
+
+def feed_query(dorm_id):
+    from sqlalchemy import select
+    from models import Request
+    return (
+        select(Request.id, Request.medicine_name, Request.quantity_requested, Request.status, Request.created_at)
+        .where(Request.dorm_id == dorm_id, Request.status == "pending")
+        .order_by(Request.created_at.desc(), Request.id.desc())
+        .limit(20)
+    )
+
+
+def new_request(dorm_id):
+    from models import Request
+    requester = random.randrange(dorm_id - 1 or DORMS, USERS + 1, DORMS)   # a user in that dorm
+    return Request(requester_id=requester, dorm_id=dorm_id, medicine_name="cetirizine", quantity_requested=1,
+                   message="bench", status="pending", created_at=datetime.utcnow())
+
+
+def sync_app(path):
+    from fastapi import FastAPI
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Session = sessionmaker(bind=engine, autoflush=False)
+    app = FastAPI()
+
+    @app.get("/requests")
+    def feed(dorm_id: int):
+        with Session() as db:
+            return [dict(row._mapping) for row in db.execute(feed_query(dorm_id))]
+
+    @app.post("/requests")
+    def create(dorm_id: int):
+        with Session() as db:
+            db.add(new_request(dorm_id))
+            db.commit()
+        return {"ok": True}
+
+    return app, engine
+
+
+def async_app(path):
+    from fastapi import FastAPI
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from database import set_sqlite_pragmas
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", connect_args={"check_same_thread": False})
+    event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    Session = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    app = FastAPI()
+
+    @app.get("/requests")
+    async def feed(dorm_id: int):
+        async with Session() as db:
+            return [dict(row._mapping) for row in await db.execute(feed_query(dorm_id))]
+
+    @app.post("/requests")
+    async def create(dorm_id: int):
+        async with Session() as db:
+            db.add(new_request(dorm_id))
+            await db.commit()
+        return {"ok": True}
+
+    return app, engine
+
+
+async def load(app, clients, duration, write_ratio):
+    import httpx
+
+    reads, writes, errors = [], [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client):
+        nonlocal errors
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            dorm_id = rng.randint(1, DORMS)
+            write = rng.random() < write_ratio
+            started = time.perf_counter()
+            if write:
+                response = await client.post("/requests", params={"dorm_id": dorm_id})
+            else:
+                response = await client.get("/requests", params={"dorm_id": dorm_id})
+            if response.status_code != 200:
+                errors += 1
+                continue
+            (writes if write else reads).append(time.perf_counter() - started)
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+    return reads, writes, errors
+
+
+def report(name, reads, writes, errors, duration):
+    def ms(samples, pct):
+        return percentile(samples, pct) * 1000
+    print(f"{name:<6} {(len(reads) + len(writes)) / duration:8.0f} req/s   "
+          f"reads p50 {ms(reads, 50):6.1f} p99 {ms(reads, 99):7.1f} ms   "
+          f"writes p50 {ms(writes, 50):6.1f} p99 {ms(writes, 99):7.1f} ms   errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=50000, help="requests seeded before the run")
+    args = parser.parse_args()
+
+    seeded = use_temp_database()
+    seed(seeded, args.requests)
+    print(f"{args.clients} clients, {args.write_ratio:.0%} writes, {args.duration:.0f} s per stack, "
+          f"{args.requests} requests / {USERS} users seeded")
+
+    for name, build in (("sync", sync_app), ("async", async_app)):
+        path = seeded.replace("medshare.db", f"{name}.db")
+        shutil.copyfile(seeded, path)
+        app, engine = build(path)
+
+        async def run():
+            result = await load(app, args.clients, args.duration, args.write_ratio)
+            if name == "async":
+                await engine.dispose()
+            return result
+
+        reads, writes, errors = asyncio.run(run())
+        if name == "sync":
+            engine.dispose()
+        report(name, reads, writes, errors, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+bulk.py
+-------
+Bulk medicine import/export for supply closets and anyone entering more than
+a handful of items at once.
+
+Import (POST /medicines/import):
+- The request body is read as a stream and parsed line by line, either as
+  NDJSON (one JSON object per line) or CSV with a header row
+  (name,quantity,expiration_date). The whole file is never held in memory.
+- Every row is validated with MedicineCreate. Bad rows are reported with
+  their line number and skipped; good rows are inserted IMPORT_BATCH_SIZE at
+  a time with one executemany INSERT and one commit per batch.
+
+Export (GET /medicines/export):
+- Streams the user's inventory as NDJSON or CSV, reading EXPORT_BATCH_SIZE
+  rows at a time in id order (keyset, like pagination.py), so memory use does
+  not grow with the inventory.
+"""
+
+import csv
+import io
+import json
+import os
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from models import Medicine
+from schemas import MedicineCreate, MedicineResponse
+
+# Rows per INSERT/commit when importing, and per SELECT when exporting
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+# Only this many row errors are sent back (the count covers all of them)
+MAX_REPORTED_ERRORS = 100
+
+CSV_FIELDS = ["name", "quantity", "expiration_date"]
+EXPORT_FIELDS = list(MedicineResponse.model_fields)
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Work out the format from ?format= or the Content-Type header (default NDJSON)
+def detect_format(requested, content_type):
+    if requested:
+        return requested
+    if "csv" in (content_type or ""):
+        return "csv"
+    return "ndjson"
+
+# Byte chunks (e.g. request.stream()) -> text lines, without the line ending
+async def iter_lines(chunks):
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8-sig")
+    if pending:
+        yield pending.rstrip(b"\r").decode("utf-8-sig")
+
+# Yields (line number, dict) or (line number, error message); blank lines are skipped
+async def parse_ndjson(lines):
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield number, "Expected a JSON object"
+            continue
+        yield number, row
+
+async def parse_csv(lines):
+    number = 0
+    header = None
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        # One line at a time keeps memory flat; quoted fields can't span lines
+        try:
+            values = next(csv.reader([line]))
+        except csv.Error as e:
+            yield number, f"Invalid CSV: {e}"
+            continue
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            missing = [field for field in CSV_FIELDS if field not in header]
+            if missing:
+                yield number, f"Header is missing column(s): {', '.join(missing)}"
+                return
+            continue
+        if len(values) != len(header):
+            yield number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield number, dict(zip(header, values))
+
+# Spreadsheets usually give a bare date ("2030-01-01"); MedicineCreate wants a datetime
+def normalize_row(row):
+    expiration = row.get("expiration_date")
+    if isinstance(expiration, str) and len(expiration.strip()) == 10:
+        row["expiration_date"] = expiration.strip() + "T00:00:00"
+    return row
+
+def validation_message(error: ValidationError):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+# Stream-parse, validate and insert. `on_insert` is called with each batch of
+# (id, MedicineCreate) after it is committed. Returns the import summary.
+async def import_medicines(db, chunks, file_format, owner_id, on_insert=None):
+    parse = parse_csv if file_format == "csv" else parse_ndjson
+    summary = {"imported": 0, "failed": 0, "errors": []}
+    batch = []
+
+    async def flush():
+        ids = (await db.execute(
+            insert(Medicine).returning(Medicine.id, sort_by_parameter_order=True),
+            [{**medicine.model_dump(), "owner_id": owner_id} for medicine in batch],
+        )).scalars().all()
+        await db.commit()
+        if on_insert is not None:
+            on_insert(list(zip(ids, batch)))
+        summary["imported"] += len(batch)
+        batch.clear()
+
+    async for number, row in parse(iter_lines(chunks)):
+        try:
+            if isinstance(row, str):
+                raise ValueError(row)
+            batch.append(MedicineCreate.model_validate(normalize_row(row)))
+        except (ValidationError, ValueError) as e:
+            summary["failed"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                message = validation_message(e) if isinstance(e, ValidationError) else str(e)
+                summary["errors"].append({"line": number, "error": message})
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    if batch:
+        await flush()
+    return summary
+
+# Yields the owner's medicines as NDJSON or CSV text, one batch at a time.
+# Opens its own session: the response body is sent after the endpoint returns.
+async def export_medicines(session_factory, owner_id, file_format, include_expired=False):
+    if file_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        yield buffer.getvalue()
+
+    last_id = 0
+    async with session_factory() as db:
+        while True:
+            query = select(Medicine).where(Medicine.owner_id == owner_id, Medicine.id > last_id)
+            if not include_expired:
+                query = query.where(Medicine.status == "active")
+            rows = (await db.execute(query.order_by(Medicine.id).limit(EXPORT_BATCH_SIZE))).scalars().all()
+            if not rows:
+                return
+
+            items = [MedicineResponse.model_validate(row) for row in rows]
+            if file_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+                writer.writerows(item.model_dump(mode="json") for item in items)
+                yield buffer.getvalue()
+            else:
+                yield "".join(item.model_dump_json() + "\n" for item in items)
+
+            last_id = rows[-1].id
+            db.expunge_all()   # keep the identity map from growing with the export
+            if len(rows) < EXPORT_BATCH_SIZE:
+                return
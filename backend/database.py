@@ -3,20 +3,33 @@ database.py
 ------------
 This file sets up the database connection for our FastAPI backend.
 
-- Uses SQLite as the database (medshare.db file in the project folder).
-- Creates the SQLAlchemy engine (manages the actual connection).
-- Defines a SessionLocal class (used to create sessions for queries).
+- Uses SQLite as the database by default (medshare.db file in the project folder).
+  Set DATABASE_URL to a postgresql:// URL to use PostgreSQL instead.
+- Creates the SQLAlchemy engines (manage the actual connections):
+  - engine: the classic sync engine (migrations and startup warm-up).
+  - async_engine: used by the API endpoints, so waiting on the database never
+    ties up a threadpool slot (needs aiosqlite for SQLite, asyncpg for PostgreSQL).
+- Tunes SQLite on every new connection: WAL journal so readers and the writer
+  don't block each other, synchronous=NORMAL, a bigger page cache and a busy
+  timeout instead of immediate "database is locked" errors.
+- Gives PostgreSQL a real connection pool (sizes configurable below).
+- Defines a SessionLocal / AsyncSessionLocal class (used to create sessions for queries).
 - Defines a Base class (all our models/tables will inherit from this).
-- Provides a get_db() function that gives each request its own database session
-  and ensures the session is closed after the request finishes.
+- Provides get_db() / get_async_db() functions that give each request its own
+  database session and ensure it is closed after the request finishes.
 
 In short:
 This file is the foundation for working with the database. 
-Other files (models.py, main.py, etc.) will import Base and get_db from here.
+Other files (models.py, main.py, etc.) will import Base and get_async_db from here.
 """
 
+import os
+
 # Import the create_engine function to connect SQLAlchemy to a database
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+
+# Async engine/session for the API endpoints
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 # Import declarative_base to create a base class for our database models (tables)
 from sqlalchemy.ext.declarative import declarative_base
@@ -24,22 +37,87 @@ from sqlalchemy.ext.declarative import declarative_base
 # Import sessionmaker to create database sessions (connections to run queries)
 from sqlalchemy.orm import sessionmaker
 
-# Uses SQLite database and saves the file in the current folder
-SQLALCHEMY_DATABASE_URL = "sqlite:///./medshare.db"
+# Uses SQLite database and saves the file in the current folder (override with DATABASE_URL)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./medshare.db")
+
+# PostgreSQL connection pool settings (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))              # connections kept open
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))        # extra connections under bursts
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))      # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))      # seconds before a connection is replaced
+
+# SQLite page cache per connection, in KiB (negative = KiB in PRAGMA cache_size)
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "65536"))
+
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+# The same database through its async driver
+def async_url(url: str) -> str:
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url   # already names an async driver
+
+# Engine options for the selected database
+def engine_options() -> dict:
+    if IS_SQLITE:
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
 
 # Engine manages the connection to the database
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options())
+
+# Async engine used by the API endpoints
+async_engine = create_async_engine(async_url(SQLALCHEMY_DATABASE_URL), **engine_options())
+
+# Applied to every new SQLite connection, sync or async
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+if IS_SQLITE:
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
 
 # Session is a factory for database sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async sessions keep objects usable after commit (no lazy reload outside the request)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base is a class all of our database models will inherit from
 Base = declarative_base()
 
+# INSERT that skips rows hitting a unique/primary key, for either dialect.
+# The dialect modules are imported on first use (PostgreSQL's is slow to import).
+def insert_ignore(dialect_name, model):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model).on_conflict_do_nothing()
+
 # Dependency for FastAPI: creates and cleans up a database session per request
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async version of get_db() for async endpoints
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
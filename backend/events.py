@@ -0,0 +1,231 @@
+"""
+events.py
+---------
+Live feed of request changes for each dorm, sent as Server-Sent Events by
+GET /requests/events.
+
+Instead of refetching GET /requests, a dashboard keeps one EventSource open
+and gets a small event whenever a request in its dorm is created, changes
+status (accepted/declined/completed) or is expired by the sweeper:
+
+    id: 1042
+    data: {"type": "updated", "request": {...RequestResponse...}}
+
+The feed is read from the database, so it doesn't matter which worker
+handled a write or which one a client is connected to:
+
+- The event id is the request's change version (the `version` column the
+  sync triggers stamp, see sync_versions.py). `type` is "expired" for
+  requests the sweeper expired and "updated" otherwise; `request` is the
+  request as it is now, so a request changed twice between two polls is
+  sent once.
+- Each worker polls every REQUEST_EVENT_POLL seconds (at once after a write
+  of its own, see notify()) for the requests of its subscribed dorms with a
+  version between the last clock it read and the current one
+  (ix_requests_dorm_id_version), and pushes them to its subscribers. Every
+  version at or below the clock has committed, so none is skipped.
+- Browsers send the last id back in the Last-Event-ID header when they
+  reconnect, to any worker, and the requests changed since are replayed with
+  the same query. If that is more than REQUEST_EVENT_REPLAY requests, or the
+  id isn't one this database handed out, the stream starts with
+  "event: reset" instead and the client should refetch GET /requests once.
+- A subscriber that falls REQUEST_EVENT_QUEUE events behind is disconnected;
+  it reconnects and resumes from its last id like any other client.
+"""
+
+import asyncio
+import json
+import os
+from sqlalchemy import select
+from models import Request
+from schemas import RequestResponse
+from sync_versions import read_clock
+
+# Seconds between checks for changes made by other workers
+REQUEST_EVENT_POLL = float(os.getenv("REQUEST_EVENT_POLL", "1"))
+
+# Most changed requests replayed to a reconnecting client before it is told to refetch
+REQUEST_EVENT_REPLAY = int(os.getenv("REQUEST_EVENT_REPLAY", "500"))
+
+# Events a slow subscriber may have waiting before it is disconnected
+REQUEST_EVENT_QUEUE = int(os.getenv("REQUEST_EVENT_QUEUE", "256"))
+
+# Seconds between keep-alive comments on an idle stream
+REQUEST_EVENT_KEEPALIVE = float(os.getenv("REQUEST_EVENT_KEEPALIVE", "15"))
+
+RESET_FRAME = "event: reset\ndata: {}\n\n"
+KEEPALIVE_FRAME = ": keepalive\n\n"
+
+
+# The SSE frame for a request at its current version
+def request_frame(db_request):
+    event_type = "expired" if db_request.status == "expired" else "updated"
+    data = json.dumps({"type": event_type, "request": RequestResponse.model_validate(db_request).model_dump(mode="json")})
+    return f"id: {db_request.version}\ndata: {data}\n\n"
+
+
+class Subscriber:
+    def __init__(self, max_queue, last_id):
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.last_id = last_id   # newest version this client has seen (or been replayed)
+
+    # Non-blocking; returns False if the subscriber is too far behind
+    def push(self, event_id, frame):
+        if self.last_id is not None and event_id <= self.last_id:
+            return True   # already seen, e.g. through a worker whose clock was ahead of ours
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    # Tell the stream to end (the queue is full, so make room for the marker)
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class RequestEventBus:
+    def __init__(self, session_factory, poll_interval=REQUEST_EVENT_POLL, replay_limit=REQUEST_EVENT_REPLAY,
+                 max_queue=REQUEST_EVENT_QUEUE):
+        self.session_factory = session_factory   # e.g. database.AsyncSessionLocal
+        self.poll_interval = poll_interval
+        self.replay_limit = replay_limit
+        self.max_queue = max_queue
+        self.clock = None       # every version up to here has been pushed to the subscribers
+        self.subscribers = {}   # dorm_id -> set of Subscriber
+        self.task = None
+        self._wake = None
+        self._lock = None       # held while polling and while a client subscribes
+
+    # Poll now instead of at the next tick, e.g. right after this worker committed a write
+    def notify(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    # Push every request changed since the last poll to its dorm's subscribers
+    async def poll_once(self):
+        async with self._lock:
+            await self._poll()
+
+    async def _poll(self):
+        if not self.subscribers:
+            self.clock = None   # the next subscriber starts from the clock at that time
+            return
+        async with self.session_factory() as db:
+            clock = await read_clock(db)
+            if clock <= self.clock:
+                return
+            rows = (await db.execute(
+                select(Request)
+                .where(Request.dorm_id.in_(list(self.subscribers)), Request.version > self.clock, Request.version <= clock)
+                .order_by(Request.version)
+            )).scalars().all()
+            frames = [(db_request.dorm_id, db_request.version, request_frame(db_request)) for db_request in rows]
+        self.clock = clock
+
+        for dorm_id, event_id, frame in frames:
+            for subscriber in list(self.subscribers.get(dorm_id, ())):
+                if not subscriber.push(event_id, frame):
+                    self.unsubscribe(dorm_id, subscriber)
+                    subscriber.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Try again next tick; the clock only moves once a poll succeeds
+                print(f"Request event poll failed: {e}")
+
+    def start(self):
+        if self.task is None:
+            self._wake = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        self._wake = None
+        self._lock = None
+
+    # Frames for a dorm's requests changed after `last_id` up to `upto`, or
+    # None if the client should refetch instead
+    async def replay(self, dorm_id, last_id, upto):
+        async with self.session_factory() as db:
+            if last_id > upto:
+                # Seen through a worker that polled more recently than this one
+                # (the poller sends the rest), or not an id this database handed out
+                return [] if last_id <= await read_clock(db) else None
+            rows = (await db.execute(
+                select(Request)
+                .where(Request.dorm_id == dorm_id, Request.version > last_id, Request.version <= upto)
+                .order_by(Request.version)
+                .limit(self.replay_limit + 1)
+            )).scalars().all()
+            if len(rows) > self.replay_limit:
+                return None
+            return [request_frame(db_request) for db_request in rows]
+
+    def subscribe(self, dorm_id, last_id=None):
+        subscriber = Subscriber(self.max_queue, last_id)
+        self.subscribers.setdefault(dorm_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, dorm_id, subscriber):
+        subscribers = self.subscribers.get(dorm_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[dorm_id]
+
+    # The SSE body for one client: missed events (or a reset), then live events.
+    # Subscribing and noting the clock happen between two polls, so the poller
+    # pushes everything after `upto` and the replay covers the rest.
+    async def stream(self, dorm_id, last_id=None, keepalive=REQUEST_EVENT_KEEPALIVE):
+        async with self._lock:
+            if self.clock is None:
+                async with self.session_factory() as db:
+                    self.clock = await read_clock(db)
+            subscriber = self.subscribe(dorm_id, last_id)
+            upto = self.clock
+        try:
+            # Tell EventSource how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+
+            if last_id is not None:
+                missed = await self.replay(dorm_id, last_id, upto)
+                if missed is None:
+                    # Anything skipped as already seen meanwhile is in the refetch
+                    subscriber.last_id = None
+                    yield RESET_FRAME
+                else:
+                    for frame in missed:
+                        yield frame
+
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE_FRAME
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(dorm_id, subscriber)
@@ -0,0 +1,85 @@
+"""
+http_cache.py
+-------------
+Conditional GET support so clients can skip downloading lists that haven't
+changed.
+
+- ETags come from the change versions that database triggers stamp on
+  users, medicines and requests (see migrations.py): a list's ETag is the
+  newest version (or tombstone) in its scope plus the query parameters.
+  Any write, from any endpoint, worker or the expiry sweeper, moves the
+  version, so there is nothing to invalidate by hand.
+- Working out the version is one index lookup (e.g. max(version) on
+  ix_requests_dorm_id_version). On PostgreSQL versions can commit out of
+  order (see sync_versions.py), so the clock is part of the ETag too: a
+  lower version that commits late changes it once the clock passes it.
+  When it matches If-None-Match the endpoint answers 304 without loading
+  or serializing any rows.
+- GET /dorms is served from a pre-serialized body kept in memory; dorms only
+  change at startup seeding, which calls dorms_cache.invalidate().
+"""
+
+import hashlib
+import json
+from fastapi import Response
+from sqlalchemy import func, select
+from models import Dorm, SyncTombstone
+from sync_versions import read_clock
+from schemas import DormResponse
+from fast_json import project, rows_to_json
+
+ETAG_HEADER = "ETag"
+
+# Strong ETag for a list: its scope version plus anything else that shapes the body
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+# True if an If-None-Match header value covers `etag`
+def etag_matches(if_none_match, etag) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return etag in tags or f"W/{etag}" in tags
+
+def not_modified(etag) -> Response:
+    return Response(status_code=304, headers={ETAG_HEADER: etag})
+
+# Newest change version of `model` rows where `scope_column == scope_id`,
+# counting deletions (tombstones) too, and how much of it has surely
+# committed. Index-only lookups, no rows loaded.
+async def scope_version(db, model, scope_column, scope_id) -> tuple:
+    newest_row = select(func.max(model.version)).where(scope_column == scope_id).scalar_subquery()
+    newest_delete = select(func.max(SyncTombstone.version)).where(
+        SyncTombstone.table_name == model.__tablename__,
+        SyncTombstone.scope_id == scope_id,
+    ).scalar_subquery()
+    row = (await db.execute(select(newest_row, newest_delete))).one()
+    newest = max(row[0] or 0, row[1] or 0)
+    if db.bind.dialect.name != "postgresql":
+        return newest, newest   # one writer at a time: versions commit in order
+    return newest, min(newest, await read_clock(db))
+
+
+# The /dorms response body, serialized once
+class DormsCache:
+    def __init__(self):
+        self.body = None
+        self.etag = None
+
+    async def get(self, db):
+        if self.body is None:
+            rows = (await db.execute(select(*project(DormResponse, Dorm)).order_by(Dorm.id))).all()
+            body = rows_to_json(DormResponse, rows)
+            self.body, self.etag = body, f'"{hashlib.sha1(body).hexdigest()[:24]}"'
+        return self.body, self.etag
+
+    def invalidate(self):
+        self.body = None
+        self.etag = None
+
+
+dorms_cache = DormsCache()
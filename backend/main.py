@@ -5,68 +5,116 @@ This is the main entry point for the Pulse API.
 
 Features:
 - User authentication (register/login with JWT)
-- Profile management (view/update medical info)
+- Profile management (view/update medical info, normalized for allergy checks)
 - Dorm management (sample dorms auto-created at startup)
-- Medicine inventory (add/list medicines per user)
+- Medicine inventory (add/list medicines per user, bulk NDJSON/CSV import/export)
 - Requests (create/list requests within a dorm community)
+- Live request feed (Server-Sent Events per dorm, resumable)
+- Delta sync (profile, medicines and dorm requests changed since a token)
+- HTTP caching (ETag / If-None-Match on the read endpoints, cached /dorms body)
+- Search (ranked full-text search over dorm medicines and requests)
+- Expiry sweeper (background task that expires old requests/medicines)
+
+All endpoints are async and use async database sessions (see database.py).
 
 Security:
 - JWT-based auth using HTTPBearer
 - Protected routes require a valid token
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status   # FastAPI core tools
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Response, Header   # FastAPI core tools
+from fastapi import Request as HTTPRequest                      # raw request (streamed uploads); models.Request is a table
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials # for JWT auth via "Bearer <token>"
-from sqlalchemy.orm import Session                            # database session
-from database import get_db, engine, Base, SessionLocal       # our DB setup
-from models import User, Dorm, Medicine, Request              # database models (tables)
-from schemas import UserCreate, UserResponse, MedicineCreate, MedicineResponse, RequestCreate, RequestResponse, DormResponse
-from auth import verify_password, get_password_hash, create_access_token, verify_token  # auth helpers
-from datetime import timedelta
+from sqlalchemy import select, update, and_, or_, case         # build queries for async sessions
+from sqlalchemy.ext.asyncio import AsyncSession               # async database session
+from database import get_async_db, engine, AsyncSessionLocal, insert_ignore # our DB setup
+from models import User, Dorm, Medicine, Request, SyncTombstone  # database models (tables)
+from migrations import run_migrations                         # versioned schema setup
+from matching import matching_engine                          # medicine name resolution for matching
+from schemas import UserCreate, UserResponse, MedicineCreate, MedicineResponse, RequestCreate, RequestResponse, RequestComplete, DormResponse, MatchResponse, SyncResponse, MedicineSearchResult, RequestSearchResult
+from auth import hash_password_async, verify_password_async, create_access_token, verify_token_claims  # auth helpers
+from auth_cache import token_cache, user_cache, cache_user, invalidate_user  # skip repeat JWT/user lookups
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, finish_page  # keyset pagination
+from bulk import MEDIA_TYPES, detect_format, import_medicines, export_medicines  # bulk inventory import/export
+from fast_json import project, rows_to_json, json_response  # column-projected orjson list responses
+from http_cache import ETAG_HEADER, make_etag, etag_matches, not_modified, scope_version, dorms_cache  # conditional GET
+from medical import save_medical_info, avoided_medicines, dorm_stock_query  # normalized conditions/allergies
+from search import search_medicine_ids, search_request_ids     # full-text search (FTS5 / tsvector)
+from sync_versions import read_clock                            # committed-up-to change version
+from events import RequestEventBus                              # live request feed per dorm
+from sweeper import ExpirySweeper                              # background expiry of requests/medicines
+from contextlib import asynccontextmanager
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
 import json
+import os
 from auth import ACCESS_TOKEN_EXPIRE_MINUTES
 from fastapi.middleware.cors import CORSMiddleware
 
 # Database setup
+#
+# Tables, columns and indexes come from the versioned migrations in
+# migrations.py. Run `python migrations.py` once before starting the server
+# (and before forking workers); the lifespan below only re-checks the version.
+# Nothing touches the database at import time.
+
+SAMPLE_DORMS = [
+    {"id": 1, "name": "Sunset Heights", "location": "North Campus"},
+    {"id": 2, "name": "Mountain View", "location": "South Campus"},
+    {"id": 3, "name": "Riverside Commons", "location": "East Campus"},
+    {"id": 4, "name": "Garden Plaza", "location": "West Campus"},
+    {"id": 5, "name": "Skyline Tower", "location": "Central Campus"},
+    {"id": 6, "name": "Valley Ridge", "location": "North Campus"},
+    {"id": 7, "name": "Pine Grove", "location": "South Campus"},
+    {"id": 8, "name": "Oak Manor", "location": "East Campus"},
+    {"id": 9, "name": "Cedar Hall", "location": "West Campus"},
+    {"id": 10, "name": "Maple Court", "location": "Central Campus"},
+    {"id": 11, "name": "Elm Gardens", "location": "North Campus"},
+    {"id": 12, "name": "Birch Commons", "location": "South Campus"},
+    {"id": 13, "name": "Willow House", "location": "East Campus"},
+]
+
+# Create sample dorms. Every worker runs this at startup; existing ids are
+# skipped, so concurrent workers can't insert duplicates or fail on them.
+async def create_sample_dorms():
+    async with AsyncSessionLocal() as db:
+        if await db.scalar(select(Dorm.id).limit(1)) is not None:
+            return
+        await db.execute(insert_ignore(db.bind.dialect.name, Dorm), SAMPLE_DORMS)
+        await db.commit()
+        dorms_cache.invalidate()
+        print("Sample dorms created successfully!")
 
-# Automatically create all database tables defined in models.py
-Base.metadata.create_all(bind=engine)
+# How long a request stays open before the sweeper marks it expired
+REQUEST_TTL_HOURS = float(os.getenv("REQUEST_TTL_HOURS", "24"))
 
-# Create sample dorms
-def create_sample_dorms():
-    db = SessionLocal()
+# Live request feed, read from the database so every worker sees every write.
+# Writes made here wake its poller so this worker's own clients hear at once.
+request_events = RequestEventBus(AsyncSessionLocal)
+
+expiry_sweeper = ExpirySweeper(AsyncSessionLocal, on_requests_expired=lambda rows: request_events.notify())
+
+# Per-worker startup: check the schema, seed, warm the in-memory caches, then
+# run the expiry sweeper and the request feed poller for as long as the app is up
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(run_migrations, engine)   # no-op unless `python migrations.py` was skipped
+    await create_sample_dorms()
+    async with AsyncSessionLocal() as db:
+        await matching_engine.refresh(db)
+        await dorms_cache.get(db)
+    expiry_sweeper.start()
+    request_events.start()
     try:
-        if db.query(Dorm).count() == 0:
-            sample_dorms = [
-                {"id": 1, "name": "Sunset Heights", "location": "North Campus"},
-                {"id": 2, "name": "Mountain View", "location": "South Campus"},
-                {"id": 3, "name": "Riverside Commons", "location": "East Campus"},
-                {"id": 4, "name": "Garden Plaza", "location": "West Campus"},
-                {"id": 5, "name": "Skyline Tower", "location": "Central Campus"},
-                {"id": 6, "name": "Valley Ridge", "location": "North Campus"},
-                {"id": 7, "name": "Pine Grove", "location": "South Campus"},
-                {"id": 8, "name": "Oak Manor", "location": "East Campus"},
-                {"id": 9, "name": "Cedar Hall", "location": "West Campus"},
-                {"id": 10, "name": "Maple Court", "location": "Central Campus"},
-                {"id": 11, "name": "Elm Gardens", "location": "North Campus"},
-                {"id": 12, "name": "Birch Commons", "location": "South Campus"},
-                {"id": 13, "name": "Willow House", "location": "East Campus"},
-            ]
-            for dorm_data in sample_dorms:
-                dorm = Dorm(id=dorm_data["id"], name=dorm_data["name"], location=dorm_data["location"])
-                db.add(dorm)
-            db.commit()
-            print("Sample dorms created successfully!")
-    except Exception as e:
-        print(f"Error creating sample dorms: {e}")
-        db.rollback()
+        yield
     finally:
-        db.close()
-
-create_sample_dorms()
+        await request_events.stop()
+        await expiry_sweeper.stop()
 
 # Initialize FastAPI app
-app = FastAPI(title="Pulse API", version="1.0.0")
+app = FastAPI(title="Pulse API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -74,6 +122,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER],  # let the browser read the pagination cursor and ETag
 )
 
 # Define the security scheme (HTTP Bearer token in headers)
@@ -81,30 +130,52 @@ security = HTTPBearer()
 
 # Helper: Get current user from token
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials              # extract token string
-    email = verify_token(token)                  # decode & verify token
-    user = db.query(User).filter(User.email == email).first()   # look up user in DB
+# Both lookups are cached (see auth_cache.py), so in steady state this does no
+# JWT decode and no database query. The returned user may be a detached copy
+# up to USER_CACHE_TTL old: endpoints that write to the user must load the row
+# and set only the fields they change (never merge() the copy).
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_async_db)):
+    return await user_from_token(credentials.credentials, db)
+
+async def user_from_token(token: str, db: AsyncSession):
+    user_id = token_cache.get(token)
+    if user_id is None:
+        email, expires_at = verify_token_claims(token)   # decode & verify token
+        user = (await db.execute(select(User).where(User.email == email))).scalars().first()   # look up user in DB
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if expires_at is not None:
+            token_cache.set(token, user.id, expires_at)
+        cache_user(user)
+        return user
+
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return User(**cached)
+
+    user = await db.get(User, user_id)
     if user is None:
+        token_cache.pop(token)
         raise HTTPException(status_code=404, detail="User not found")
+    cache_user(user)
     return user
 
 # Authentication Endpoints
 
 # Register a new user
 @app.post("/auth/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Enforce ASU email domain
     if not user.email.endswith("@asu.edu"):
         raise HTTPException(status_code=400, detail="Only @asu.edu emails are allowed")
 
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = (await db.execute(select(User).where(User.email == user.email))).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password_async(user.password)
     db_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -115,21 +186,31 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         allergies=user.allergies
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()   # assigns db_user.id
+    await save_medical_info(db, db_user.id, user.medical_conditions, user.allergies)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
 # Log in existing user (returns JWT token)
 @app.post("/auth/login")
-def login_user(email: str, password: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+async def login_user(email: str, password: str, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     # Verify credentials
-    if not user or not verify_password(password, user.hashed_password):
+    if user:
+        valid, new_hash = await verify_password_async(password, user.hashed_password)
+    if not user or not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
+
+    # Upgrade the stored hash if BCRYPT_ROUNDS changed since it was made
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+        invalidate_user(user.id)
     
     # Create a JWT token that expires after set time
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -140,33 +221,54 @@ def login_user(email: str, password: str, db: Session = Depends(get_db)):
 
 # User Profile Endpoints
 
-# View current user's profile
+# View current user's profile (304 if the ETag the client has is still current)
 @app.get("/profile", response_model=UserResponse)
-def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    version = (await db.execute(select(User.version).where(User.id == current_user.id))).scalar()
+    etag = make_etag("profile", current_user.id, version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+    # The cached user may be older than `version`, so send the row as it is now
+    if version != current_user.version:
+        current_user = await db.get(User, current_user.id)
+        cache_user(current_user)
     return current_user
 
 # Update current user's profile
 @app.put("/profile", response_model=UserResponse)
-def update_profile(
+async def update_profile(
     medical_conditions: str = None,
     allergies: str = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # Load the row: the cached user may be older than it, and only the fields
+    # given here may be written (never the whole snapshot, or its version)
+    db_user = await db.get(User, current_user.id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     if medical_conditions is not None:
-        current_user.medical_conditions = medical_conditions
+        db_user.medical_conditions = medical_conditions
     if allergies is not None:
-        current_user.allergies = allergies
+        db_user.allergies = allergies
+    await save_medical_info(db, db_user.id, medical_conditions, allergies)
     
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    await db.commit()
+    await db.refresh(db_user)
+    invalidate_user(db_user.id)
+    return db_user
 
 # Medicine Inventory Endpoints
 
 # Add medicine to current user's inventory
 @app.post("/medicines", response_model=MedicineResponse)
-def add_medicine(medicine: MedicineCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def add_medicine(medicine: MedicineCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     db_medicine = Medicine(
         name=medicine.name,
         quantity=medicine.quantity,
@@ -174,45 +276,454 @@ def add_medicine(medicine: MedicineCreate, current_user: User = Depends(get_curr
         owner_id=current_user.id
     )
     db.add(db_medicine)
-    db.commit()
-    db.refresh(db_medicine)
+    await db.commit()
+    await db.refresh(db_medicine)
+    matching_engine.add_name(db_medicine.name)
     return db_medicine
 
-# View all medicines owned by current user
+# View medicines owned by current user, one page at a time (oldest first).
+# Medicines the sweeper archived are left out unless include_expired=true.
+# Rows are serialized straight from the projected columns (see fast_json.py).
 @app.get("/medicines", response_model=list[MedicineResponse])
-def get_my_medicines(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(Medicine).filter(Medicine.owner_id == current_user.id).all()
+async def get_my_medicines(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_expired: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    version = await scope_version(db, Medicine, Medicine.owner_id, current_user.id)
+    etag = make_etag("medicines", current_user.id, version, limit, cursor, include_expired)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+
+    query = select(*project(MedicineResponse, Medicine)).where(Medicine.owner_id == current_user.id)
+    if not include_expired:
+        query = query.where(Medicine.status == "active")
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        query = query.where(Medicine.id > last_id)
+    query = query.order_by(Medicine.id).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    rows = finish_page(rows, limit, response, key=lambda m: (m.id,))
+    return json_response(rows_to_json(MedicineResponse, rows), response)
+
+# Bulk-add medicines from an NDJSON or CSV body (see bulk.py). Rows that fail
+# validation are skipped and reported by line number; the rest are inserted.
+@app.post("/medicines/import")
+async def import_my_medicines(
+    request: HTTPRequest,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    def index_batch(rows):
+        for medicine_id, medicine in rows:
+            matching_engine.add_name(medicine.name)
+
+    file_format = detect_format(format, request.headers.get("content-type"))
+    return await import_medicines(db, request.stream(), file_format, current_user.id, on_insert=index_batch)
+
+# Download the current user's inventory as NDJSON (default) or CSV, streamed
+@app.get("/medicines/export")
+async def export_my_medicines(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    include_expired: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    return StreamingResponse(
+        export_medicines(AsyncSessionLocal, current_user.id, format, include_expired),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="medicines.{format}"'},
+    )
+
+# Dorm-mates' stock of one medicine (brand or generic name) that the current
+# user is not allergic to: a single indexed query, soonest-expiring first.
+@app.get("/medicines/available", response_model=list[MatchResponse])
+async def get_available_medicines(
+    name: str = Query(..., min_length=1),
+    quantity: int = Query(1, ge=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    query = dorm_stock_query(current_user.dorm_id, name, min_quantity=quantity, safe_for_user_id=current_user.id)
+    medicines = (await db.execute(query.limit(limit))).scalars().all()
+    return [
+        MatchResponse(
+            medicine_id=medicine.id,
+            provider_id=medicine.owner_id,
+            medicine_name=medicine.name,
+            quantity=medicine.quantity,
+            expiration_date=medicine.expiration_date,
+            score=1.0,
+        )
+        for medicine in medicines
+    ]
 
 # Dorm endpoints
 
-# List all dorms
+# List all dorms (served from a pre-serialized body, see http_cache.py)
 @app.get("/dorms", response_model=list[DormResponse])
-def get_dorms(db: Session = Depends(get_db)):
-    return db.query(Dorm).all()
+async def get_dorms(if_none_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_db)):
+    body, etag = await dorms_cache.get(db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={ETAG_HEADER: etag})
 
 # Request Endpoints
 
 # Create a new medicine request
 @app.post("/requests", response_model=RequestResponse)
-def create_request(request: RequestCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_request(request: RequestCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     db_request = Request(
         requester_id=current_user.id,
+        dorm_id=current_user.dorm_id,
         medicine_name=request.medicine_name,
         quantity_requested=request.quantity_requested,
-        message=request.message
+        message=request.message,
+        expires_at=datetime.utcnow() + timedelta(hours=REQUEST_TTL_HOURS)
     )
     db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
+    await db.commit()
+    await db.refresh(db_request)
+    request_events.notify()
     return db_request
 
-# View all requests in the current user's dorm
+# View requests in the current user's dorm, newest first, one page at a time.
+# By default only pending requests; status=all returns every status
+# (including "expired", which the sweeper sets once expires_at passes).
+# Rows are serialized straight from the projected columns (see fast_json.py).
 @app.get("/requests", response_model=list[RequestResponse])
-def get_requests(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(Request).join(User, Request.requester_id == User.id).filter(User.dorm_id == current_user.dorm_id).all()
+async def get_requests(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    request_status: str = Query("pending", alias="status"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    version = await scope_version(db, Request, Request.dorm_id, current_user.dorm_id)
+    etag = make_etag("requests", current_user.dorm_id, version, limit, cursor, request_status)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+
+    query = select(*project(RequestResponse, Request)).where(Request.dorm_id == current_user.dorm_id)
+    if request_status != "all":
+        query = query.where(Request.status == request_status)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, 2)
+        query = query.where(or_(
+            Request.created_at < last_created_at,
+            and_(Request.created_at == last_created_at, Request.id < last_id),
+        ))
+    query = query.order_by(Request.created_at.desc(), Request.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    rows = finish_page(rows, limit, response, key=lambda r: (r.created_at, r.id))
+    return json_response(rows_to_json(RequestResponse, rows), response)
+
+# Live feed of request changes in the current user's dorm (see events.py).
+# EventSource can't set headers, so the token may also come as ?access_token=.
+# Reconnecting browsers send Last-Event-ID and get the events they missed.
+@app.get("/requests/events")
+async def request_event_stream(
+    request: HTTPRequest,
+    access_token: Optional[str] = None,
+    last_event_id: Optional[int] = None
+):
+    token = access_token
+    header = request.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        token = header[7:]
+    if not token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+
+    # Own session: the stream stays open far longer than any request should hold one
+    async with AsyncSessionLocal() as db:
+        current_user = await user_from_token(token, db)
+
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    try:
+        resume_from = int(resume_from) if resume_from is not None else None
+    except ValueError:
+        resume_from = None
+
+    return StreamingResponse(
+        request_events.stream(current_user.dorm_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Request lifecycle
+#
+#   pending --accept--> accepted --complete--> completed
+#    | | ^                 | |
+#    | | +----decline------+ |            (by the provider: back to pending)
+#    | +------decline--------+---> declined   (by the requester)
+#    +--(sweeper)----------------> expired
+#
+# Every transition is one conditional UPDATE (e.g. "... WHERE status = 'pending'"),
+# so when many dorm-mates accept at once the database picks exactly one winner:
+# only one UPDATE can still see status = 'pending', the rest match zero rows.
+
+# Load a request after a transition, or explain why the transition didn't apply:
+# 404 outside the caller's dorm, 403 if `allowed(request)` says the caller may
+# never make it, 409 if the request has moved on (e.g. someone accepted first).
+async def transition_result(db: AsyncSession, request_id: int, rowcount: int, current_user: User, allowed, forbidden: str):
+    db_request = await db.get(Request, request_id)
+    if db_request is None or db_request.dorm_id != current_user.dorm_id:
+        raise HTTPException(status_code=404, detail="Request not found")
+    if rowcount != 1:
+        if not allowed(db_request):
+            raise HTTPException(status_code=403, detail=forbidden)
+        if db_request.status == "pending" and db_request.expires_at is not None and db_request.expires_at <= datetime.utcnow():
+            raise HTTPException(status_code=409, detail="Request has expired")
+        raise HTTPException(status_code=409, detail=f"Request is {db_request.status}")
+    request_events.notify()
+    return db_request
+
+# Offer to fill a dorm-mate's pending request
+@app.post("/requests/{request_id}/accept", response_model=RequestResponse)
+async def accept_request(request_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        update(Request)
+        .where(
+            Request.id == request_id,
+            Request.status == "pending",
+            Request.dorm_id == current_user.dorm_id,
+            Request.requester_id != current_user.id,
+            or_(Request.expires_at.is_(None), Request.expires_at > datetime.utcnow()),
+        )
+        .values(status="accepted", provider_id=current_user.id)
+    )
+    await db.commit()
+    return await transition_result(
+        db, request_id, result.rowcount, current_user,
+        allowed=lambda r: r.requester_id != current_user.id,
+        forbidden="You can't accept your own request",
+    )
+
+# Requester cancels (pending or accepted), which ends the request. A provider
+# backing out of an accepted request hands it back to the dorm: it is pending
+# again with no provider, so someone else can accept it.
+@app.post("/requests/{request_id}/decline", response_model=RequestResponse)
+async def decline_request(request_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    by_requester = Request.requester_id == current_user.id
+    result = await db.execute(
+        update(Request)
+        .where(
+            Request.id == request_id,
+            Request.status.in_(["pending", "accepted"]),
+            or_(by_requester, Request.provider_id == current_user.id),
+        )
+        .values(
+            status=case((by_requester, "declined"), else_="pending"),
+            provider_id=case((by_requester, Request.provider_id), else_=None),
+        )
+    )
+    await db.commit()
+    return await transition_result(
+        db, request_id, result.rowcount, current_user,
+        allowed=lambda r: current_user.id in (r.requester_id, r.provider_id),
+        forbidden="Only the requester or the provider can decline a request",
+    )
+
+# Same as POST /requests/{id}/decline
+app.add_api_route("/requests/{request_id}", decline_request, methods=["DELETE"], response_model=RequestResponse)
+
+# Provider hands the medicine over. With medicine_id, that item's quantity is
+# reduced in the same transaction, only if it is active, unexpired stock and
+# enough of it is left.
+@app.post("/requests/{request_id}/complete", response_model=RequestResponse)
+async def complete_request(
+    request_id: int,
+    body: Optional[RequestComplete] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    medicine_id = body.medicine_id if body else None
+    db_request = await db.get(Request, request_id)
+    if db_request is None or db_request.dorm_id != current_user.dorm_id:
+        raise HTTPException(status_code=404, detail="Request not found")
+
+    if medicine_id is not None:
+        stock = await db.execute(
+            update(Medicine)
+            .where(
+                Medicine.id == medicine_id,
+                Medicine.owner_id == current_user.id,
+                Medicine.status == "active",
+                Medicine.expiration_date > datetime.utcnow(),
+                Medicine.quantity >= db_request.quantity_requested,
+            )
+            .values(quantity=Medicine.quantity - db_request.quantity_requested)
+        )
+        if stock.rowcount != 1:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Not enough unexpired stock of that medicine in your inventory")
+
+    result = await db.execute(
+        update(Request)
+        .where(Request.id == request_id, Request.status == "accepted", Request.provider_id == current_user.id)
+        .values(status="completed")
+    )
+    if result.rowcount != 1:
+        await db.rollback()   # also undoes the inventory decrement
+    else:
+        await db.commit()
+
+    db.expire_all()   # re-read the request below, not the copy loaded before the UPDATE
+    return await transition_result(
+        db, request_id, result.rowcount, current_user,
+        allowed=lambda r: r.provider_id in (None, current_user.id),   # nobody can complete a pending request
+        forbidden="Only the provider can complete a request",
+    )
+
+# Dorm-mates who can fill one of your requests: same dorm, enough unexpired
+# stock, name matched through aliases/fuzzy lookup, nothing you're allergic to
+# (read from the normalized allergy tables, see medical.py).
+@app.get("/requests/{request_id}/matches", response_model=list[MatchResponse])
+async def get_request_matches(request_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    db_request = await db.get(Request, request_id)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Request not found")
+    if db_request.requester_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the requester can see matches")
+
+    matches = await matching_engine.match(
+        db,
+        dorm_id=db_request.dorm_id,
+        medicine_name=db_request.medicine_name,
+        quantity=db_request.quantity_requested,
+        requester_id=current_user.id,
+        allergies=await avoided_medicines(db, current_user.id),
+    )
+    return [
+        MatchResponse(
+            medicine_id=medicine.id,
+            provider_id=medicine.owner_id,
+            medicine_name=medicine.name,
+            quantity=medicine.quantity,
+            expiration_date=medicine.expiration_date,
+            score=round(score, 3),
+        )
+        for medicine, score in matches
+    ]
+
+# Search
+
+# Load rows for ranked (id, rank) hits, keeping the rank order
+async def load_hits(db: AsyncSession, model, hits):
+    rows = (await db.execute(select(model).where(model.id.in_([id for id, rank in hits])))).scalars().all()
+    by_id = {row.id: row for row in rows}
+    return [(by_id[id], rank) for id, rank in hits if id in by_id]
+
+# Dorm-mates' active medicines matching `q`, best match first, one page at a time
+@app.get("/search/medicines", response_model=list[MedicineSearchResult])
+async def search_medicines(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    after = decode_cursor(cursor, 2) if cursor else None
+    hits = await search_medicine_ids(db, current_user.dorm_id, q, limit + 1, after)
+    hits = finish_page(hits, limit, response, key=lambda hit: (hit[1], hit[0]))
+    return [
+        MedicineSearchResult(**MedicineResponse.model_validate(medicine).model_dump(), score=round(-rank, 6))
+        for medicine, rank in await load_hits(db, Medicine, hits)
+    ]
+
+# Requests in the current user's dorm matching `q` (medicine name or message).
+# Pending only by default; status=all searches every status.
+@app.get("/search/requests", response_model=list[RequestSearchResult])
+async def search_requests(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    request_status: str = Query("pending", alias="status"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    after = decode_cursor(cursor, 2) if cursor else None
+    status_filter = None if request_status == "all" else request_status
+    hits = await search_request_ids(db, current_user.dorm_id, q, limit + 1, status_filter, after)
+    hits = finish_page(hits, limit, response, key=lambda hit: (hit[1], hit[0]))
+    return [
+        RequestSearchResult(**RequestResponse.model_validate(db_request).model_dump(), score=round(-rank, 6))
+        for db_request, rank in await load_hits(db, Request, hits)
+    ]
+
+# Sync
+
+# Everything the app keeps locally, or just what changed since `since`.
+# Every write to users/medicines/requests gets a new version (stamped by
+# triggers, see sync_versions.py). The clock is read first: every version at
+# or below it is already committed, so nothing can slip between two syncs.
+# Rows changed while this runs may come back again next time, which is
+# harmless because clients apply changes by id.
+@app.get("/sync", response_model=SyncResponse)
+async def sync(since: Optional[str] = None, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    clock = await read_clock(db)
+    since_version = decode_cursor(since, 1)[0] if since else None
+    if not isinstance(since_version, int) or since_version > clock:
+        since_version = None   # no token, or one from a different/reset database
+
+    user_query = select(User).where(User.id == current_user.id)
+    medicine_query = select(Medicine).where(Medicine.owner_id == current_user.id)
+    request_query = select(Request).where(Request.dorm_id == current_user.dorm_id)
+
+    if since_version is None:
+        profile = (await db.execute(user_query)).scalars().first()
+        medicines = (await db.execute(medicine_query.where(Medicine.status == "active").order_by(Medicine.id))).scalars().all()
+        requests = (await db.execute(request_query.where(Request.status == "pending").order_by(Request.id))).scalars().all()
+        return SyncResponse(token=encode_cursor(clock), full=True, profile=profile, medicines=medicines, requests=requests)
+
+    profile = (await db.execute(user_query.where(User.version > since_version))).scalars().first()
+    changed_medicines = (await db.execute(medicine_query.where(Medicine.version > since_version).order_by(Medicine.version))).scalars().all()
+    requests = (await db.execute(request_query.where(Request.version > since_version).order_by(Request.version))).scalars().all()
+
+    tombstones = (await db.execute(
+        select(SyncTombstone.table_name, SyncTombstone.row_id).where(
+            SyncTombstone.version > since_version,
+            or_(
+                and_(SyncTombstone.table_name == "medicines", SyncTombstone.scope_id == current_user.id),
+                and_(SyncTombstone.table_name == "requests", SyncTombstone.scope_id == current_user.dorm_id),
+            ),
+        )
+    )).all()
+
+    return SyncResponse(
+        token=encode_cursor(clock),
+        full=False,
+        profile=profile,
+        medicines=[m for m in changed_medicines if m.status == "active"],
+        requests=requests,
+        deleted_medicines=[m.id for m in changed_medicines if m.status != "active"]
+            + [row_id for table_name, row_id in tombstones if table_name == "medicines"],
+        deleted_requests=[row_id for table_name, row_id in tombstones if table_name == "requests"],
+    )
+
+# Maintenance
+
+# Duration and rows affected by the last expiry sweep, plus running totals
+@app.get("/maintenance/expiry")
+async def get_expiry_stats(current_user: User = Depends(get_current_user)):
+    return expiry_sweeper.stats
 
 # RUN APP (when executed directly)
 
 if __name__ == "__main__":
     import uvicorn
+    run_migrations(engine)
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+matching.py
+-----------
+Matches a medicine request to dorm-mates who can actually fill it.
+
+A Request only has a free-text medicine_name ("Advil", "ibuprofin 200mg"),
+so we normalize names to a canonical generic name, resolve typos against the
+names we know, and read the stock from the database:
+
+- Names: lowercase, drop punctuation and dose tokens ("200mg"), then map
+  brand names to generics through ALIASES ("advil" -> "ibuprofen").
+- Fuzzy lookup: a trigram index over every spelling we know (brand names,
+  generics and the canonical names in stock), scored with trigram
+  similarity and mapped back to the canonical name, so typos like
+  "ibuprofin" or "zyrtek" still match.
+- Stock: one query on medicines.canonical_name for the resolved names
+  (ix_medicines_canonical_name_status_expiration_date), filtered to the
+  same dorm, not the requester's own stock, enough quantity, not expired,
+  and not something the requester is allergic to (allergies also expand
+  through ALLERGY_GROUPS, e.g. "nsaids").
+
+Quantities and expiry therefore always come from the database, whichever
+worker changed them. Only the name vocabulary is kept in memory: names this
+worker stores are added at once, and the canonical names in stock are
+re-read every MATCH_NAMES_REFRESH_SECONDS, so a name another worker added is
+matched exactly right away and through typos after the next refresh.
+"""
+
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+# Brand (and common misspelled/alternate) names -> canonical generic name
+ALIASES = {
+    "advil": "ibuprofen",
+    "motrin": "ibuprofen",
+    "nurofen": "ibuprofen",
+    "tylenol": "acetaminophen",
+    "paracetamol": "acetaminophen",
+    "panadol": "acetaminophen",
+    "aleve": "naproxen",
+    "bayer": "aspirin",
+    "zyrtec": "cetirizine",
+    "claritin": "loratadine",
+    "allegra": "fexofenadine",
+    "benadryl": "diphenhydramine",
+    "sudafed": "pseudoephedrine",
+    "mucinex": "guaifenesin",
+    "robitussin": "dextromethorphan",
+    "imodium": "loperamide",
+    "pepto bismol": "bismuth subsalicylate",
+    "tums": "calcium carbonate",
+    "pepcid": "famotidine",
+    "prilosec": "omeprazole",
+    "dramamine": "dimenhydrinate",
+    "neosporin": "neomycin",
+}
+
+# Allergy names that cover a whole class of medicines
+ALLERGY_GROUPS = {
+    "nsaid": {"ibuprofen", "naproxen", "aspirin"},
+    "nsaids": {"ibuprofen", "naproxen", "aspirin"},
+    "penicillin": {"penicillin", "amoxicillin"},
+    "penicillins": {"penicillin", "amoxicillin"},
+    "sulfa": {"sulfamethoxazole"},
+    "antihistamines": {"cetirizine", "loratadine", "fexofenadine", "diphenhydramine"},
+}
+
+# Minimum trigram similarity (0..1) for a fuzzy name match
+FUZZY_THRESHOLD = 0.4
+
+# Maximum candidates returned per request
+MAX_MATCHES = 20
+
+# How often the names in stock are re-read from the database
+MATCH_NAMES_REFRESH_SECONDS = float(os.getenv("MATCH_NAMES_REFRESH_SECONDS", "60"))
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+_DOSE = re.compile(r"\b\d+(\.\d+)?\s*(mg|mcg|g|ml|iu|%)?\b")
+_SPACES = re.compile(r"\s+")
+
+# "Advil 200mg!" -> "advil"
+def normalize_name(name: str) -> str:
+    name = _NON_WORD.sub(" ", (name or "").lower())
+    name = _DOSE.sub(" ", name)
+    return _SPACES.sub(" ", name).strip()
+
+# "Advil 200mg!" -> "ibuprofen"
+def canonical_name(name: str) -> str:
+    name = normalize_name(name)
+    return ALIASES.get(name, name)
+
+def trigrams(name: str) -> set:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# User.allergies / medical_conditions are JSON lists as strings, but accept
+# plain comma-separated text too. Returns the non-empty string items.
+def parse_list(value) -> list:
+    if not value:
+        return []
+    try:
+        items = json.loads(value)
+        if isinstance(items, str):
+            items = [items]
+        elif not isinstance(items, list):
+            items = []
+    except (ValueError, TypeError):
+        items = value.split(",")
+    return [item for item in items if isinstance(item, str) and item.strip()]
+
+# Canonical medicine names an allergy list rules out (groups expanded)
+def parse_allergies(allergies) -> set:
+    names = set()
+    for item in parse_list(allergies):
+        name = canonical_name(item)
+        names.add(name)
+        names |= ALLERGY_GROUPS.get(name, set())
+    return names
+
+
+class MatchingEngine:
+    def __init__(self, refresh_seconds=MATCH_NAMES_REFRESH_SECONDS, clock=time.monotonic):
+        self.spellings = {}        # normalized spelling -> canonical name
+        self.trigram_index = {}    # trigram -> set of spellings
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self.refreshed_at = None
+        for alias, canonical in ALIASES.items():
+            self.add_spelling(alias, canonical)
+            self.add_spelling(canonical, canonical)
+
+    def add_spelling(self, spelling, canonical):
+        if not spelling or spelling in self.spellings:
+            return
+        self.spellings[spelling] = canonical
+        for gram in trigrams(spelling):
+            self.trigram_index.setdefault(gram, set()).add(spelling)
+
+    # Learn the name of a medicine this worker just stored
+    def add_name(self, name):
+        self.add_spelling(normalize_name(name), canonical_name(name))
+
+    # Add every canonical name in stock (a scan of the canonical_name index).
+    # Names are never dropped: one with no stock left just matches no rows.
+    async def refresh(self, db):
+        from sqlalchemy import select
+        from models import Medicine
+        rows = await db.execute(select(Medicine.canonical_name).where(Medicine.status == "active").distinct())
+        for name in rows.scalars():
+            self.add_spelling(name, name)
+        self.refreshed_at = self.clock()
+
+    # Canonical names that look like `name`, with a similarity score, best first
+    def resolve(self, name):
+        spelling = normalize_name(name)
+        canonical = ALIASES.get(spelling, spelling)
+        if not spelling or spelling in self.spellings:
+            return [(canonical, 1.0)]
+
+        query = trigrams(spelling)
+        overlap = {}
+        for gram in query:
+            for candidate in self.trigram_index.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        # The name as typed may still be in stock (added by another worker since the last refresh)
+        scores = {canonical: 1.0}
+        for candidate, shared in overlap.items():
+            score = shared / (len(query) + len(trigrams(candidate)) - shared)
+            target = self.spellings[candidate]
+            if score >= FUZZY_THRESHOLD and score > scores.get(target, 0):
+                scores[target] = score
+        return sorted(scores.items(), key=lambda item: -item[1])
+
+    # Candidate medicines for a request: returns [(Medicine, score)], best first
+    # `allergies` is either the User.allergies text or a ready set of canonical names to avoid
+    async def match(self, db, dorm_id, medicine_name, quantity, requester_id=None, allergies=None, now=None, limit=MAX_MATCHES):
+        from sqlalchemy import case, or_, select
+        from models import Medicine, User
+
+        if self.refreshed_at is None or self.clock() - self.refreshed_at >= self.refresh_seconds:
+            await self.refresh(db)
+        now = now or datetime.utcnow()
+        avoid = allergies if isinstance(allergies, set) else parse_allergies(allergies)
+
+        scores = {canonical: score for canonical, score in self.resolve(medicine_name) if canonical not in avoid}
+        if not scores:
+            return []
+        rank = {canonical: n for n, canonical in enumerate(scores)}
+        query = (
+            select(Medicine)
+            .join(User, User.id == Medicine.owner_id)
+            .where(
+                Medicine.canonical_name.in_(list(scores)),
+                Medicine.status == "active",
+                Medicine.quantity >= quantity,
+                or_(Medicine.expiration_date.is_(None), Medicine.expiration_date > now),
+                User.dorm_id == dorm_id,
+            )
+            # Best name match first, then stock that expires soonest (use it before it goes to waste)
+            .order_by(
+                case(rank, value=Medicine.canonical_name),
+                Medicine.expiration_date.is_(None),
+                Medicine.expiration_date,
+                Medicine.id,
+            )
+            .limit(limit)
+        )
+        if requester_id is not None:
+            query = query.where(Medicine.owner_id != requester_id)
+        medicines = (await db.execute(query)).scalars().all()
+        return [(medicine, scores[medicine.canonical_name]) for medicine in medicines]
+
+
+matching_engine = MatchingEngine()
@@ -0,0 +1,117 @@
+"""
+medical.py
+----------
+Normalized medical info: conditions and allergies as rows instead of JSON.
+
+User.medical_conditions / User.allergies keep the JSON text the client sent
+(UserCreate and PUT /profile are unchanged). Whenever they are written, the
+names are parsed once, canonicalized and stored as links to a shared
+vocabulary:
+
+- conditions / user_conditions: "Asthma " -> "asthma"
+- allergens / user_allergies: "Advil" -> "ibuprofen" (same canonical names
+  as matching.py), "NSAIDs" -> "nsaids"
+- allergen_members: the canonical medicine names each allergen rules out,
+  so "nsaids" covers ibuprofen, naproxen and aspirin (ALLERGY_GROUPS)
+
+Allergy checks are then joins on indexed columns, e.g. "active stock of X in
+my dorm that I'm not allergic to" is one query (dorm_stock_query) instead of
+json.loads() on every candidate user's blob.
+"""
+
+import re
+from sqlalchemy import delete, exists, select
+from database import insert_ignore
+from models import Allergen, AllergenMember, Condition, Medicine, User, UserAllergy, UserCondition
+from matching import ALLERGY_GROUPS, canonical_name, parse_list
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+# "Type 2 Diabetes!" -> "type 2 diabetes" (no alias/dose handling: numbers matter here)
+def condition_name(name: str) -> str:
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", name.lower())).strip()
+
+def condition_names(value) -> set:
+    return {name for name in map(condition_name, parse_list(value)) if name}
+
+def allergy_names(value) -> set:
+    return {name for name in map(canonical_name, parse_list(value)) if name}
+
+# Canonical medicine names an allergen rules out
+def allergen_members(name: str) -> set:
+    return {name} | ALLERGY_GROUPS.get(name, set())
+
+# name -> id for `names` in a vocabulary table, adding the missing ones
+async def _vocabulary_ids(db, model, names):
+    if not names:
+        return {}
+    dialect = db.bind.dialect.name
+    await db.execute(insert_ignore(dialect, model), [{"name": name} for name in sorted(names)])
+    rows = (await db.execute(select(model.id, model.name).where(model.name.in_(names)))).all()
+    ids = {name: id for id, name in rows}
+
+    if model is Allergen:
+        await db.execute(insert_ignore(dialect, AllergenMember), [
+            {"allergen_id": ids[name], "medicine_name": member}
+            for name in names for member in allergen_members(name)
+        ])
+    return ids
+
+async def _replace_links(db, link_model, column, user_id, ids):
+    await db.execute(delete(link_model).where(link_model.user_id == user_id))
+    if ids:
+        await db.execute(insert_ignore(db.bind.dialect.name, link_model), [
+            {"user_id": user_id, column: id} for id in ids
+        ])
+
+# Rewrite a user's normalized conditions/allergies from the JSON text. Pass
+# only what changed (None = leave as is). Runs in the caller's transaction.
+async def save_medical_info(db, user_id, medical_conditions=None, allergies=None):
+    if medical_conditions is not None:
+        ids = await _vocabulary_ids(db, Condition, condition_names(medical_conditions))
+        await _replace_links(db, UserCondition, "condition_id", user_id, ids.values())
+    if allergies is not None:
+        ids = await _vocabulary_ids(db, Allergen, allergy_names(allergies))
+        await _replace_links(db, UserAllergy, "allergen_id", user_id, ids.values())
+
+# True if `user_column`'s user is allergic to the medicine in `medicine_column`
+def allergic_to(user_column, medicine_column):
+    return exists().where(
+        UserAllergy.user_id == user_column,
+        AllergenMember.allergen_id == UserAllergy.allergen_id,
+        AllergenMember.medicine_name == medicine_column,
+    )
+
+# Canonical medicine names a user must avoid (groups already expanded)
+async def avoided_medicines(db, user_id) -> set:
+    rows = await db.execute(
+        select(AllergenMember.medicine_name)
+        .join(UserAllergy, UserAllergy.allergen_id == AllergenMember.allergen_id)
+        .where(UserAllergy.user_id == user_id)
+        .distinct()
+    )
+    return set(rows.scalars().all())
+
+# Active (not archived) stock of a medicine held in a dorm, as one query.
+# - safe_for_user_id: skip it if that user is allergic to it (and skip their own stock)
+# - holder_not_allergic_to: only holders with no allergy covering that medicine
+def dorm_stock_query(dorm_id, medicine_name, min_quantity=1, safe_for_user_id=None, holder_not_allergic_to=None):
+    query = (
+        select(Medicine)
+        .join(User, User.id == Medicine.owner_id)
+        .where(
+            Medicine.canonical_name == canonical_name(medicine_name),
+            Medicine.status == "active",
+            Medicine.quantity >= min_quantity,
+            User.dorm_id == dorm_id,
+        )
+    )
+    if safe_for_user_id is not None:
+        query = query.where(
+            Medicine.owner_id != safe_for_user_id,
+            ~allergic_to(safe_for_user_id, Medicine.canonical_name),
+        )
+    if holder_not_allergic_to is not None:
+        query = query.where(~allergic_to(User.id, canonical_name(holder_not_allergic_to)))
+    return query.order_by(Medicine.expiration_date, Medicine.id)
@@ -0,0 +1,339 @@
+"""
+migrations.py
+-------------
+Versioned schema setup for medshare.db (or the PostgreSQL database).
+
+MIGRATIONS is an ordered list of (version, function). The schema_version
+table records which versions have been applied, and run_migrations() runs
+only the ones that haven't, all in one transaction:
+
+- Version 1 creates the tables (Base.metadata.create_all). The later
+  versions add columns, backfill data, triggers and search tables to
+  databases created by older versions of the app.
+- Each function still checks the schema before changing it, so a database
+  from before schema_version existed (which starts at version 0) is
+  brought up to date safely.
+- To change the schema: edit models.py, then append a new version here
+  (create_tables / create_indexes can be listed again for new tables and
+  indexes; they only create what is missing).
+
+Run it once before starting the server (and before forking workers):
+
+    python migrations.py
+
+The app's lifespan also calls run_migrations(), which only reads the
+version when the schema is current. When it isn't, concurrent runners are
+serialized with a lock (BEGIN IMMEDIATE on SQLite, an advisory lock on
+PostgreSQL) and re-check the version once they hold it.
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, bindparam, func, inspect, select, text, update
+
+# Bookkeeping table; kept out of Base.metadata so create_all() never touches it
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Arbitrary key for pg_advisory_xact_lock
+MIGRATION_LOCK_ID = 7428001
+
+# All tables from models.py that don't exist yet
+def create_tables(connection):
+    from database import Base
+    import models  # registers the tables on Base.metadata
+    Base.metadata.create_all(bind=connection)
+
+# All indexes declared in models.py that don't exist yet (create_all skips
+# tables that already exist, so indexes added later need this)
+def create_indexes(connection):
+    from database import Base
+    import models
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+# Requests carry their requester's dorm so the dorm feed is one index scan
+# instead of a join through users. Adds the column and backfills old rows.
+def add_request_dorm_id(connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("requests")}
+    if "dorm_id" not in columns:
+        connection.execute(text("ALTER TABLE requests ADD COLUMN dorm_id INTEGER REFERENCES dorms(id)"))
+
+    connection.execute(text(
+        "UPDATE requests SET dorm_id = "
+        "(SELECT users.dorm_id FROM users WHERE users.id = requests.requester_id) "
+        "WHERE dorm_id IS NULL"
+    ))
+
+    # Superseded by ix_requests_dorm_id_status_created_at_id
+    connection.execute(text("DROP INDEX IF EXISTS ix_requests_status_created_at_id"))
+
+# Medicines get a status column so reads filter on "active" instead of
+# comparing expiration dates row by row. Existing rows start out active;
+# the expiry sweeper archives the expired ones on its first run.
+def add_medicine_status(connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("medicines")}
+    if "status" not in columns:
+        connection.execute(text("ALTER TABLE medicines ADD COLUMN status VARCHAR DEFAULT 'active'"))
+        connection.execute(text("UPDATE medicines SET status = 'active' WHERE status IS NULL"))
+
+    # Superseded by ix_medicines_owner_id_status_id
+    connection.execute(text("DROP INDEX IF EXISTS ix_medicines_owner_id_id"))
+
+# Tables synced by GET /sync, and the column each one is scoped by
+SYNC_TABLES = {"users": "id", "medicines": "owner_id", "requests": "dorm_id"}
+
+SQLITE_SYNC_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS {table}_sync_insert AFTER INSERT ON {table} BEGIN
+    UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    UPDATE {table} SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_sync_update AFTER UPDATE ON {table} WHEN NEW.version IS OLD.version BEGIN
+    UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    UPDATE {table} SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_sync_delete AFTER DELETE ON {table} BEGIN
+    UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    INSERT INTO sync_tombstones (table_name, row_id, scope_id, version)
+    VALUES ('{table}', OLD.id, OLD.{scope}, (SELECT version FROM sync_clock WHERE id = 1));
+END;
+"""
+
+POSTGRES_SYNC_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION sync_stamp() RETURNS trigger AS $$
+BEGIN
+    UPDATE sync_clock SET version = version + 1 WHERE id = 1 RETURNING version INTO NEW.version;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+DECLARE
+    next_version INTEGER;
+BEGIN
+    UPDATE sync_clock SET version = version + 1 WHERE id = 1 RETURNING version INTO next_version;
+    INSERT INTO sync_tombstones (table_name, row_id, scope_id, version)
+    VALUES (TG_TABLE_NAME, OLD.id, (to_jsonb(OLD) ->> TG_ARGV[0])::integer, next_version);
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+"""
+
+POSTGRES_SYNC_TRIGGERS = """
+DROP TRIGGER IF EXISTS {table}_sync_stamp ON {table};
+CREATE TRIGGER {table}_sync_stamp BEFORE INSERT OR UPDATE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION sync_stamp();
+DROP TRIGGER IF EXISTS {table}_sync_delete ON {table};
+CREATE TRIGGER {table}_sync_delete AFTER DELETE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION sync_tombstone('{scope}');
+"""
+
+# Change versions for GET /sync: a version column on each synced table,
+# stamped by triggers from the single sync_clock row (a sequence on
+# PostgreSQL from version 8, see add_sync_sequence), and tombstones for
+# deleted rows. Triggers (not app code) do the stamping so bulk UPDATEs,
+# the expiry sweeper and manual fixes are all versioned too. Existing rows
+# keep version 0 and only show up in a full sync.
+def add_sync_versions(connection):
+    inspector = inspect(connection)
+    for table in SYNC_TABLES:
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if "version" not in columns:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER DEFAULT 0"))
+            connection.execute(text(f"UPDATE {table} SET version = 0 WHERE version IS NULL"))
+
+    if connection.execute(text("SELECT COUNT(*) FROM sync_clock")).scalar() == 0:
+        connection.execute(text("INSERT INTO sync_clock (id, version) VALUES (1, 0)"))
+
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(POSTGRES_SYNC_FUNCTIONS)
+        for table, scope in SYNC_TABLES.items():
+            connection.exec_driver_sql(POSTGRES_SYNC_TRIGGERS.format(table=table, scope=scope))
+    else:
+        for table, scope in SYNC_TABLES.items():
+            # sqlite3 runs one statement per execute; a trigger body ends with "END;"
+            for statement in SQLITE_SYNC_TRIGGERS.format(table=table, scope=scope).split("END;"):
+                if statement.strip():
+                    connection.exec_driver_sql(statement + "END;")
+
+SQLITE_SEARCH_TABLES = {
+    "medicines_fts": ("medicines", ["name"]),
+    "requests_fts": ("requests", ["medicine_name", "message"]),
+}
+
+# External-content FTS5 index kept in step with its table. The UPDATE trigger
+# only fires for the indexed columns, not for status/version changes.
+SQLITE_SEARCH_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+    INSERT INTO {fts} (rowid, {columns}) VALUES (NEW.id, {new});
+END;
+CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+    INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', OLD.id, {old});
+END;
+CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {columns} ON {table} BEGIN
+    INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', OLD.id, {old});
+    INSERT INTO {fts} (rowid, {columns}) VALUES (NEW.id, {new});
+END;
+"""
+
+POSTGRES_SEARCH_COLUMNS = {
+    "medicines": "to_tsvector('simple', coalesce(name, ''))",
+    "requests": "setweight(to_tsvector('simple', coalesce(medicine_name, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(message, '')), 'B')",
+}
+
+# Full-text search (see search.py). SQLite gets FTS5 tables plus triggers and
+# is backfilled once with 'rebuild'; PostgreSQL gets a generated tsvector
+# column with a GIN index, which it keeps up to date by itself.
+def add_search_index(connection):
+    if connection.dialect.name == "postgresql":
+        for table, expression in POSTGRES_SEARCH_COLUMNS.items():
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({expression}) STORED"
+            )
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)"
+            )
+        return
+
+    existing = set(inspect(connection).get_table_names())
+    for fts, (table, columns) in SQLITE_SEARCH_TABLES.items():
+        if fts not in existing:
+            connection.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(columns)}, "
+                f"content='{table}', content_rowid='id', tokenize='porter unicode61', prefix='2 3')"
+            )
+            connection.exec_driver_sql(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+        triggers = SQLITE_SEARCH_TRIGGERS.format(
+            fts=fts,
+            table=table,
+            columns=", ".join(columns),
+            new=", ".join(f"NEW.{column}" for column in columns),
+            old=", ".join(f"OLD.{column}" for column in columns),
+        )
+        for statement in triggers.split("END;"):
+            if statement.strip():
+                connection.exec_driver_sql(statement + "END;")
+
+# Normalized medical info (see medical.py): fill medicines.canonical_name
+# and parse the conditions/allergies JSON of users that have no rows yet.
+def add_medical_tables(connection):
+    from models import Allergen, AllergenMember, Condition, Medicine, User, UserAllergy, UserCondition
+    from database import insert_ignore
+    from medical import allergen_members, allergy_names, condition_names
+    from matching import canonical_name
+
+    columns = {column["name"] for column in inspect(connection).get_columns("medicines")}
+    if "canonical_name" not in columns:
+        connection.execute(text("ALTER TABLE medicines ADD COLUMN canonical_name VARCHAR"))
+    rows = connection.execute(select(Medicine.id, Medicine.name).where(Medicine.canonical_name.is_(None))).all()
+    if rows:
+        medicines = Medicine.__table__
+        connection.execute(
+            update(medicines).where(medicines.c.id == bindparam("medicine_id")).values(canonical_name=bindparam("canonical")),
+            [{"medicine_id": id, "canonical": canonical_name(name)} for id, name in rows],
+        )
+
+    dialect = connection.dialect.name
+    for value_column, parse, vocabulary, link, link_column in (
+        (User.medical_conditions, condition_names, Condition, UserCondition, "condition_id"),
+        (User.allergies, allergy_names, Allergen, UserAllergy, "allergen_id"),
+    ):
+        pending = connection.execute(
+            select(User.id, value_column).where(
+                value_column.is_not(None),
+                User.id.not_in(select(link.user_id)),
+            )
+        ).all()
+        parsed = {user_id: parse(value) for user_id, value in pending}
+        names = set().union(*parsed.values())
+        if not names:
+            continue
+
+        connection.execute(insert_ignore(dialect, vocabulary), [{"name": name} for name in sorted(names)])
+        ids = dict(connection.execute(select(vocabulary.name, vocabulary.id)).all())
+        if vocabulary is Allergen:
+            connection.execute(insert_ignore(dialect, AllergenMember), [
+                {"allergen_id": ids[name], "medicine_name": member}
+                for name in names for member in allergen_members(name)
+            ])
+        connection.execute(insert_ignore(dialect, link), [
+            {"user_id": user_id, link_column: ids[name]}
+            for user_id, user_names in parsed.items() for name in user_names
+        ])
+
+# PostgreSQL takes sync versions from a sequence instead of the sync_clock
+# row, which every writing transaction had to lock until it committed (see
+# sync_versions.py). The sequence continues from the clock. SQLite keeps the
+# row: it has one writer at a time anyway.
+def add_sync_sequence(connection):
+    if connection.dialect.name != "postgresql":
+        return
+    from sync_versions import POSTGRES_SEQUENCE_FUNCTIONS, SYNC_SEQUENCE
+
+    connection.exec_driver_sql(f"CREATE SEQUENCE IF NOT EXISTS {SYNC_SEQUENCE} AS integer")
+    connection.exec_driver_sql(
+        f"SELECT setval('{SYNC_SEQUENCE}', version + 1, false) FROM sync_clock WHERE id = 1"
+    )
+    connection.exec_driver_sql(POSTGRES_SEQUENCE_FUNCTIONS)
+
+# Applied in order; append new versions at the end and never renumber
+MIGRATIONS = [
+    (1, create_tables),
+    (2, add_request_dorm_id),
+    (3, add_medicine_status),
+    (4, add_sync_versions),
+    (5, add_search_index),
+    (6, add_medical_tables),
+    (7, create_indexes),
+    (8, add_sync_sequence),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(connection) -> int:
+    if not inspect(connection).has_table("schema_version"):
+        return 0
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+# Bring the database up to LATEST_VERSION. Returns the versions applied
+# (empty when it was already current).
+def run_migrations(engine) -> list:
+    with engine.connect() as connection:
+        if current_version(connection) >= LATEST_VERSION:
+            return []
+
+    with engine.begin() as connection:
+        # Only one runner at a time; the others wait here and then find
+        # nothing left to do
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        else:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+        schema_version.create(bind=connection, checkfirst=True)
+        version = current_version(connection)
+
+        applied = []
+        for number, migration in MIGRATIONS:
+            if number <= version:
+                continue
+            migration(connection)
+            connection.execute(schema_version.insert().values(
+                version=number, name=migration.__name__, applied_at=datetime.utcnow(),
+            ))
+            applied.append(number)
+        return applied
+
+
+if __name__ == "__main__":
+    from database import engine
+    applied = run_migrations(engine)
+    if applied:
+        print(f"Applied migrations {applied[0]}..{applied[-1]}; schema is at version {LATEST_VERSION}")
+    else:
+        print(f"Schema is up to date (version {LATEST_VERSION})")
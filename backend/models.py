@@ -8,17 +8,31 @@ Tables:
 - Dorm: represents a dorm building; links to its users.
 - Medicine: medicines owned by users, with quantity and expiration.
 - Request: anonymized medicine requests between users.
+- SyncClock / SyncTombstone: change versions for GET /sync.
+- Condition / Allergen (+ UserCondition / UserAllergy / AllergenMember):
+  normalized medical info, so allergy checks are SQL joins (see medical.py).
 
 Each model includes relationships so we can easily navigate:
 - User <-> Dorm
 - User <-> Medicine
 - User <-> Request (sent/received)
 - Request <-> User (requester/provider)
+
+Indexes are declared next to the columns/tables they serve, matching the
+queries in main.py (dorm lookups, keyset pagination of the list endpoints).
+
+users, medicines and requests carry a `version` column. Database triggers
+(installed by migrations.py) stamp it on every insert/update, from SyncClock
+on SQLite and from a sequence on PostgreSQL (see sync_versions.py),
+so the app never sets it by hand.
 """
 
 # Column types (Integer, String, etc.) define what kind of data each field stores
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
 
+# Index defines composite (multi-column) indexes for the hot list queries
+from sqlalchemy import Index
+
 # relationship() is used to link models together (like foreign keys in SQL)
 from sqlalchemy.orm import relationship
 
@@ -28,6 +42,13 @@ from database import Base
 # datetime is used for timestamps (created_at, expiration, etc.)
 from datetime import datetime
 
+# Medicine names are stored in canonical form too ("Advil 200mg" -> "ibuprofen")
+from matching import canonical_name
+
+# Column default: canonical form of the row's medicine name (works for bulk inserts too)
+def canonical_medicine_name(context):
+    return canonical_name(context.get_current_parameters().get("name"))
+
 # User Table
 
 class User(Base):
@@ -40,11 +61,12 @@ class User(Base):
     hashed_password = Column(String)                           # password (stored as hash, not plain text)
     first_name = Column(String)                                # first name
     last_name = Column(String)                                 # last name
-    dorm_id = Column(Integer, ForeignKey("dorms.id"))          # dorm this user belongs to
-    medical_conditions = Column(Text)                          # stored as JSON string (list of conditions)
-    allergies = Column(Text)                                   # stored as JSON string (list of allergies)
+    dorm_id = Column(Integer, ForeignKey("dorms.id"), index=True)  # dorm this user belongs to
+    medical_conditions = Column(Text)                          # stored as JSON string (list of conditions), as sent by the client
+    allergies = Column(Text)                                   # stored as JSON string (list of allergies), as sent by the client
     is_active = Column(Boolean, default=True)                  # active/inactive flag
     created_at = Column(DateTime, default=datetime.utcnow)     # timestamp when account was created
+    version = Column(Integer, default=0)                       # change version (set by triggers)
 
     # Relationships (links to other tables)
     dorm = relationship("Dorm", back_populates="users")        # User belongs to a Dorm
@@ -73,14 +95,28 @@ class Medicine(Base):
     
     id = Column(Integer, primary_key=True, index=True)         # medicine ID
     name = Column(String, index=True)                          # medicine name (e.g., ibuprofen)
+    canonical_name = Column(String, default=canonical_medicine_name)  # generic name used for matching/allergy checks
     quantity = Column(Integer)                                 # how many pills/items are available
     expiration_date = Column(DateTime)                         # expiration date
     owner_id = Column(Integer, ForeignKey("users.id"))         # links to User who owns it
     created_at = Column(DateTime, default=datetime.utcnow)     # timestamp when added
+    status = Column(String, default="active")                  # active, or archived once expired (set by the expiry sweeper)
+    version = Column(Integer, default=0)                       # change version (set by triggers)
     
     # Relationships
     owner = relationship("User", back_populates="medicines")   # Medicine belongs to a User
 
+    # GET /medicines pages through one owner's active medicines in id order;
+    # the expiry sweeper range-scans active medicines by expiration date;
+    # GET /sync reads one owner's medicines changed after a version;
+    # GET /medicines/available reads one medicine's active stock, soonest-expiring first
+    __table_args__ = (
+        Index("ix_medicines_owner_id_status_id", "owner_id", "status", "id"),
+        Index("ix_medicines_status_expiration_date", "status", "expiration_date"),
+        Index("ix_medicines_owner_id_version", "owner_id", "version"),
+        Index("ix_medicines_canonical_name_status_expiration_date", "canonical_name", "status", "expiration_date"),
+    )
+
 # Request Table
 
 class Request(Base):
@@ -89,15 +125,102 @@ class Request(Base):
     id = Column(Integer, primary_key=True, index=True)         # request ID
     requester_id = Column(Integer, ForeignKey("users.id"))     # user who made the request
     provider_id = Column(Integer, ForeignKey("users.id"), nullable=True) # user who will fulfill it
+    dorm_id = Column(Integer, ForeignKey("dorms.id"))          # requester's dorm, copied at creation so the feed needs no join
     medicine_name = Column(String)                             # requested medicine (string version)
     quantity_requested = Column(Integer)                       # how many units requested
     message = Column(Text)                                     # optional message ("I need it for headache")
-    status = Column(String, default="pending")                 # request status: pending, accepted, declined, completed
+    status = Column(String, default="pending")                 # request status: pending, accepted, declined, completed, expired
     is_anonymous = Column(Boolean, default=True)               # whether requester is anonymous until accepted
     created_at = Column(DateTime, default=datetime.utcnow)     # timestamp when request was created
     expires_at = Column(DateTime)                              # when request should expire
+    version = Column(Integer, default=0)                       # change version (set by triggers)
 
 
     # Relationships
     requester = relationship("User", foreign_keys=[requester_id], back_populates="requests_sent")
-    provider = relationship("User", foreign_keys=[provider_id], back_populates="requests_received")
\ No newline at end of file
+    provider = relationship("User", foreign_keys=[provider_id], back_populates="requests_received")
+
+    # GET /requests pages newest-first through one dorm's pending requests:
+    # a single range scan of (dorm_id, status, created_at, id).
+    # The requester index serves lookups of a user's own requests.
+    # The expiry sweeper range-scans pending requests by expires_at.
+    # GET /sync reads one dorm's requests changed after a version.
+    __table_args__ = (
+        Index("ix_requests_dorm_id_status_created_at_id", "dorm_id", "status", "created_at", "id"),
+        Index("ix_requests_requester_id_status_created_at", "requester_id", "status", "created_at"),
+        Index("ix_requests_status_expires_at", "status", "expires_at"),
+        Index("ix_requests_dorm_id_version", "dorm_id", "version"),
+    )
+
+# Sync Tables
+
+# One row (id = 1) holding the last change version handed out. On SQLite every
+# write to users/medicines/requests bumps it inside the writing transaction,
+# so versions are in commit order. PostgreSQL uses sync_version_seq instead
+# (migration 8), which started from this row's value.
+class SyncClock(Base):
+    __tablename__ = "sync_clock"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# A deleted row, so GET /sync can tell clients to drop it.
+# scope_id is whatever the row was synced by: the user id for users,
+# owner_id for medicines, dorm_id for requests.
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    scope_id = Column(Integer)
+    version = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_sync_tombstones_table_name_scope_id_version", "table_name", "scope_id", "version"),
+    )
+
+# Medical Info Tables
+#
+# medical_conditions / allergies stay on User as the JSON the client sent;
+# medical.py keeps these tables in step with them on register/update.
+
+# Canonical vocabulary of conditions ("asthma", "type 2 diabetes")
+class Condition(Base):
+    __tablename__ = "conditions"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)   # normalized name
+
+# Canonical vocabulary of allergies ("penicillin", "nsaids")
+class Allergen(Base):
+    __tablename__ = "allergens"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)   # canonical name
+
+# Medicines (canonical names) an allergen rules out: itself, plus the whole
+# class for group allergens ("nsaids" -> ibuprofen, naproxen, aspirin)
+class AllergenMember(Base):
+    __tablename__ = "allergen_members"
+
+    allergen_id = Column(Integer, ForeignKey("allergens.id"), primary_key=True)
+    medicine_name = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_allergen_members_medicine_name_allergen_id", "medicine_name", "allergen_id"),
+    )
+
+class UserCondition(Base):
+    __tablename__ = "user_conditions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    condition_id = Column(Integer, ForeignKey("conditions.id"), primary_key=True, index=True)
+
+# (user_id, allergen_id) is the primary key; the allergen index answers
+# "who is allergic to Y"
+class UserAllergy(Base):
+    __tablename__ = "user_allergies"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    allergen_id = Column(Integer, ForeignKey("allergens.id"), primary_key=True, index=True)
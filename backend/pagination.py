@@ -0,0 +1,51 @@
+"""
+pagination.py
+-------------
+Keyset (cursor) pagination helpers for the list endpoints.
+
+Instead of OFFSET (which re-reads every skipped row), each page remembers the
+sort key of its last row and the next page starts right after it, so every
+page is one index range scan no matter how deep the client scrolls.
+
+- The cursor is an opaque URL-safe string; clients just echo it back.
+- List endpoints keep returning a plain JSON list (so existing clients keep
+  working) and put the cursor for the next page in the X-Next-Cursor header.
+  No header means this was the last page.
+"""
+
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response
+
+# Default and maximum page sizes for list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Turn the sort key of the last row on a page into a cursor string.
+# Datetimes are tagged so they come back as datetimes.
+def encode_cursor(*values) -> str:
+    packed = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(packed).encode()).decode().rstrip("=")
+
+# Inverse of encode_cursor(); a tampered or truncated cursor is a 400, not a 500.
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        packed = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in packed]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+# Trim a page fetched with limit + 1 rows and set X-Next-Cursor when more remain.
+# `key` returns the sort-key values of a row.
+def finish_page(rows: list, limit: int, response: Response, key) -> list:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
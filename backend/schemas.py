@@ -7,20 +7,23 @@ and response formatting in FastAPI.
 - User schemas: handle signup, login, and returning user info (without exposing password).
 - Medicine schemas: handle adding medicines and returning inventory info.
 - Request schemas: handle medicine requests and return request status.
+- Match schemas: candidate providers for a request.
 - Dorm schemas: handle dorm creation and listing.
+- Sync schema: changes since a sync token (GET /sync).
+- Search schemas: ranked full-text search hits.
 
 These schemas sit between the database models (models.py) and the API endpoints,
 making sure that data passed in/out of the API is clean, validated, and secure.
 """
 
 # Pydantic is used for data validation and serialization in FastAPI
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 
 # Optional lets fields be None, List can define arrays
 from typing import Optional, List
 
 # datetime type for timestamps (created_at, expiration_date, etc.)
-from datetime import datetime
+from datetime import datetime, timezone
 
 # User Schemas
 
@@ -54,6 +57,15 @@ class MedicineBase(BaseModel):
     quantity: int            # how many units are available
     expiration_date: datetime # expiration date (could later be just a Date)
 
+    # Stored and compared as naive UTC (like datetime.utcnow() everywhere else),
+    # so "2030-01-01T00:00:00Z" or "+02:00" offsets are converted, not dropped
+    @field_validator("expiration_date")
+    @classmethod
+    def naive_utc(cls, value: datetime) -> datetime:
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
 # Schema used when creating a medicine entry
 class MedicineCreate(MedicineBase):
     pass  # no extra fields needed for creation, so we just reuse MedicineBase
@@ -83,13 +95,27 @@ class RequestCreate(RequestBase):
 class RequestResponse(RequestBase):
     id: int               # request ID
     requester_id: int     # who made the request
-    status: str           # status (pending, accepted, declined, completed)
+    provider_id: Optional[int] = None  # who accepted it (None while pending)
+    status: str           # status (pending, accepted, declined, completed, expired)
     is_anonymous: bool    # whether the requester is hidden
     created_at: datetime  # when the request was created
     
     class Config:
         from_attributes = True   # convert from SQLAlchemy model automatically
 
+# Schema used when a provider marks a request completed
+class RequestComplete(BaseModel):
+    medicine_id: Optional[int] = None  # inventory item handed over (its quantity is reduced)
+
+# Schema returned for each dorm-mate who can fill a request
+class MatchResponse(BaseModel):
+    medicine_id: int          # the matching medicine in their inventory
+    provider_id: int          # who owns it
+    medicine_name: str        # name as they entered it
+    quantity: int             # how many units they have
+    expiration_date: datetime # when their stock expires
+    score: float              # name match quality (1.0 = exact or known alias)
+
 # Dorm Schemas
 
 # Shared fields for dorms
@@ -102,4 +128,28 @@ class DormResponse(DormBase):
     id: int               # dorm ID
     
     class Config:
-        from_attributes = True   # convert from SQLAlchemy model automatically
\ No newline at end of file
+        from_attributes = True   # convert from SQLAlchemy model automatically
+
+# Sync Schemas
+
+# Returned by GET /sync. With full=true the lists are a complete snapshot and
+# the client replaces its copy; otherwise they are only what changed since
+# the token it sent. Either way, send `token` back next time.
+class SyncResponse(BaseModel):
+    token: str                                     # pass as ?since= on the next sync
+    full: bool                                     # snapshot (true) or delta (false)
+    profile: Optional[UserResponse] = None         # set when the profile changed
+    medicines: List[MedicineResponse] = []         # added/changed active medicines
+    requests: List[RequestResponse] = []           # added/changed dorm requests (any status)
+    deleted_medicines: List[int] = []              # ids to drop (archived or deleted)
+    deleted_requests: List[int] = []               # ids to drop (deleted)
+
+# Search Schemas
+
+# A dorm-mate's medicine matching a search (GET /search/medicines)
+class MedicineSearchResult(MedicineResponse):
+    score: float          # relevance, higher is better
+
+# A dorm request matching a search (GET /search/requests)
+class RequestSearchResult(RequestResponse):
+    score: float          # relevance, higher is better
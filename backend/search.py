@@ -0,0 +1,136 @@
+"""
+search.py
+---------
+Full-text search over medicine names and request text, scoped to the
+searcher's dorm.
+
+- SQLite: FTS5 external-content tables medicines_fts(name) and
+  requests_fts(medicine_name, message), kept in sync by triggers on the
+  base tables (see migrations.py) and ranked with bm25().
+- PostgreSQL: a generated tsvector column with a GIN index on each table,
+  ranked with ts_rank().
+
+Queries are built from the words the user typed (never passed to MATCH raw):
+every word must match, the last one as a prefix so results show up while
+typing, and brand names also search their generic ("zyrtec" finds
+"cetirizine") through matching.ALIASES.
+
+Results are ordered best first and paged with the same keyset cursors as the
+list endpoints, keyed on (rank, id).
+"""
+
+import re
+from sqlalchemy import text
+from matching import canonical_name
+
+# Words per query that are actually searched
+MAX_SEARCH_TERMS = 8
+
+_WORD = re.compile(r"\w+")
+
+SQLITE_MEDICINES = """
+SELECT id, rank FROM (
+    SELECT m.id AS id, bm25(medicines_fts) AS rank
+    FROM medicines_fts
+    JOIN medicines m ON m.id = medicines_fts.rowid
+    JOIN users u ON u.id = m.owner_id
+    WHERE medicines_fts MATCH :query AND u.dorm_id = :dorm_id AND m.status = 'active'
+) AS hits
+WHERE :last_rank IS NULL OR rank > :last_rank OR (rank = :last_rank AND id > :last_id)
+ORDER BY rank, id
+LIMIT :limit
+"""
+
+# medicine_name counts twice as much as the free-text message
+SQLITE_REQUESTS = """
+SELECT id, rank FROM (
+    SELECT r.id AS id, bm25(requests_fts, 2.0, 1.0) AS rank
+    FROM requests_fts
+    JOIN requests r ON r.id = requests_fts.rowid
+    WHERE requests_fts MATCH :query AND r.dorm_id = :dorm_id AND (:status IS NULL OR r.status = :status)
+) AS hits
+WHERE :last_rank IS NULL OR rank > :last_rank OR (rank = :last_rank AND id > :last_id)
+ORDER BY rank, id
+LIMIT :limit
+"""
+
+# ts_rank is "higher is better"; negate it so both dialects sort ascending
+POSTGRES_MEDICINES = """
+SELECT id, rank FROM (
+    SELECT m.id AS id, -ts_rank(m.search_vector, to_tsquery('simple', :query)) AS rank
+    FROM medicines m
+    JOIN users u ON u.id = m.owner_id
+    WHERE m.search_vector @@ to_tsquery('simple', :query) AND u.dorm_id = :dorm_id AND m.status = 'active'
+) AS hits
+WHERE CAST(:last_rank AS FLOAT) IS NULL OR rank > :last_rank OR (rank = :last_rank AND id > :last_id)
+ORDER BY rank, id
+LIMIT :limit
+"""
+
+POSTGRES_REQUESTS = """
+SELECT id, rank FROM (
+    SELECT r.id AS id, -ts_rank(r.search_vector, to_tsquery('simple', :query)) AS rank
+    FROM requests r
+    WHERE r.search_vector @@ to_tsquery('simple', :query) AND r.dorm_id = :dorm_id
+      AND (CAST(:status AS VARCHAR) IS NULL OR r.status = :status)
+) AS hits
+WHERE CAST(:last_rank AS FLOAT) IS NULL OR rank > :last_rank OR (rank = :last_rank AND id > :last_id)
+ORDER BY rank, id
+LIMIT :limit
+"""
+
+def search_terms(q: str) -> list:
+    return _WORD.findall((q or "").lower())[:MAX_SEARCH_TERMS]
+
+# ["ibu", "200"] -> '"ibu" "200"*' (FTS5: implicit AND, last word as prefix)
+def _fts5_clause(terms):
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+# ["ibu", "200"] -> "ibu & 200:*"
+def _tsquery_clause(terms):
+    return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+
+# The MATCH / to_tsquery argument for what the user typed, or None if it has
+# no searchable words. A known brand name also searches its generic name.
+def build_query(q: str, dialect: str):
+    terms = search_terms(q)
+    if not terms:
+        return None
+    clause = _tsquery_clause if dialect == "postgresql" else _fts5_clause
+    alternatives = [clause(terms)]
+
+    generic = search_terms(canonical_name(q))
+    if generic and generic != terms:
+        alternatives.append(clause(generic))
+
+    joiner = " | " if dialect == "postgresql" else " OR "
+    return joiner.join(f"({alternative})" for alternative in alternatives)
+
+async def _ranked_ids(db, statement, params, limit, after):
+    last_rank, last_id = after if after else (None, None)
+    rows = (await db.execute(text(statement), {
+        **params, "last_rank": last_rank, "last_id": last_id, "limit": limit,
+    })).all()
+    return [(row.id, row.rank) for row in rows]
+
+# [(medicine id, rank)] for active medicines in a dorm, best first.
+# `after` is the (rank, id) of the last hit on the previous page.
+async def search_medicine_ids(db, dorm_id, q, limit, after=None):
+    dialect = db.bind.dialect.name
+    query = build_query(q, dialect)
+    if query is None:
+        return []
+    statement = POSTGRES_MEDICINES if dialect == "postgresql" else SQLITE_MEDICINES
+    return await _ranked_ids(db, statement, {"query": query, "dorm_id": dorm_id}, limit, after)
+
+# [(request id, rank)] for a dorm's requests (optionally one status), best first
+async def search_request_ids(db, dorm_id, q, limit, request_status=None, after=None):
+    dialect = db.bind.dialect.name
+    query = build_query(q, dialect)
+    if query is None:
+        return []
+    statement = POSTGRES_REQUESTS if dialect == "postgresql" else SQLITE_REQUESTS
+    params = {"query": query, "dorm_id": dorm_id, "status": request_status}
+    return await _ranked_ids(db, statement, params, limit, after)
@@ -0,0 +1,135 @@
+"""
+sweeper.py
+----------
+Background task that retires expired rows so read paths don't have to.
+
+Every SWEEP_INTERVAL_SECONDS it:
+- marks pending requests whose expires_at has passed as "expired"
+- marks active medicines whose expiration_date has passed as "archived"
+
+Each pass walks the (status, expires_at) / (status, expiration_date) indexes
+in batches of SWEEP_BATCH_SIZE ids, so one run never holds a long write lock
+and never scans the whole table. GET /requests and GET /medicines then only
+need "status = ..." instead of comparing timestamps row by row.
+
+on_requests_expired, if given, is called with each batch of expired Request
+rows after it is committed (main.py uses it for the live request feed).
+
+The numbers from the last run are kept in ExpirySweeper.stats
+(see GET /maintenance/expiry).
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from sqlalchemy import select, update
+from models import Medicine, Request
+
+# Seconds between sweeps
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SWEEP_INTERVAL_SECONDS", "60"))
+
+# Rows updated per transaction
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "500"))
+
+
+class ExpirySweeper:
+    def __init__(self, session_factory, interval=SWEEP_INTERVAL_SECONDS, batch_size=SWEEP_BATCH_SIZE, on_requests_expired=None):
+        self.session_factory = session_factory   # e.g. database.AsyncSessionLocal
+        self.on_requests_expired = on_requests_expired
+        self.interval = interval
+        self.batch_size = batch_size
+        self.task = None
+        self.stats = {
+            "runs": 0,
+            "last_run_at": None,
+            "last_duration_ms": None,
+            "last_requests_expired": 0,
+            "last_medicines_archived": 0,
+            "total_requests_expired": 0,
+            "total_medicines_archived": 0,
+            "last_error": None,
+        }
+
+    # Flip `from_status` -> `to_status` on rows whose `deadline` column has passed,
+    # one batch of ids per transaction. Returns the ids that were changed.
+    # `on_batch(db, ids)` runs after each commit, in the same session.
+    async def _expire(self, model, deadline, from_status, to_status, now, on_batch=None):
+        changed = []
+        while True:
+            async with self.session_factory() as db:
+                ids = (await db.execute(
+                    select(model.id)
+                    .where(model.status == from_status, deadline <= now)
+                    .order_by(deadline)
+                    .limit(self.batch_size)
+                )).scalars().all()
+                if not ids:
+                    return changed
+
+                # status is re-checked so a row accepted meanwhile is left alone
+                await db.execute(
+                    update(model)
+                    .where(model.id.in_(ids), model.status == from_status)
+                    .values(status=to_status)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if on_batch is not None:
+                    await on_batch(db, ids)
+            changed.extend(ids)
+            if len(ids) < self.batch_size:
+                return changed
+
+    async def _report_expired(self, db, ids):
+        if self.on_requests_expired is None:
+            return
+        rows = (await db.execute(
+            select(Request).where(Request.id.in_(ids), Request.status == "expired")
+        )).scalars().all()
+        self.on_requests_expired(rows)
+
+    # One full pass over requests and medicines
+    async def sweep_once(self):
+        started = time.perf_counter()
+        now = datetime.utcnow()
+
+        expired = await self._expire(Request, Request.expires_at, "pending", "expired", now, self._report_expired)
+        archived = await self._expire(Medicine, Medicine.expiration_date, "active", "archived", now)
+
+        stats = self.stats
+        stats["runs"] += 1
+        stats["last_run_at"] = now
+        stats["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        stats["last_requests_expired"] = len(expired)
+        stats["last_medicines_archived"] = len(archived)
+        stats["total_requests_expired"] += len(expired)
+        stats["total_medicines_archived"] += len(archived)
+        stats["last_error"] = None
+        return stats
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep sweeping; a locked database or similar usually clears up
+                self.stats["last_error"] = repr(e)
+                print(f"Expiry sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
@@ -0,0 +1,81 @@
+"""
+sync_versions.py
+----------------
+Where the change versions behind GET /sync and the list ETags
+(http_cache.py) come from, and how far they can be trusted.
+
+Triggers installed by migrations.py stamp every insert/update of users,
+medicines and requests (and every tombstone) with a new version:
+
+- SQLite: from the single sync_clock row. SQLite has one writer at a time,
+  so versions are handed out in commit order and the row is the clock.
+- PostgreSQL: from the sync_version_seq sequence, so concurrent writers
+  don't queue behind each other on one row. nextval() isn't transactional,
+  though, so a version can commit after a higher one. Each writing
+  transaction therefore holds a shared advisory lock (class SYNC_LOCK_CLASS)
+  keyed by a lower bound of its versions until it ends, and the clock is the
+  last version handed out, capped just below the lowest such lock: every
+  version at or below it has committed or rolled back.
+"""
+
+from sqlalchemy import select, text
+from models import SyncClock
+
+SYNC_SEQUENCE = "sync_version_seq"
+
+# Arbitrary key for the writers' pg_advisory_xact_lock_shared(class, version)
+SYNC_LOCK_CLASS = 7428002
+
+# Last version handed out (a fresh sequence hasn't handed out its start value yet)
+LAST_VERSION_SQL = (
+    f"SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {SYNC_SEQUENCE}"
+)
+
+# Lowest version an open writing transaction may still commit
+OLDEST_WRITER_SQL = """
+SELECT min(objid::bigint) FROM pg_locks
+WHERE locktype = 'advisory' AND classid = :lock_class AND objsubid = 2
+  AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+
+# Installed by migrations.py; replaces the sync_clock versions of these functions
+POSTGRES_SEQUENCE_FUNCTIONS = f"""
+CREATE OR REPLACE FUNCTION sync_next_version() RETURNS integer AS $$
+BEGIN
+    -- First version of this transaction: lock a bound at or below every
+    -- version it will take, taken before nextval() (see sync_versions.py)
+    IF current_setting('sync.writing', true) IS DISTINCT FROM 'on' THEN
+        PERFORM pg_advisory_xact_lock_shared({SYNC_LOCK_CLASS}, (
+            SELECT (CASE WHEN is_called THEN last_value ELSE last_value - 1 END)::integer + 1
+            FROM {SYNC_SEQUENCE}
+        ));
+        PERFORM set_config('sync.writing', 'on', true);
+    END IF;
+    RETURN nextval('{SYNC_SEQUENCE}');
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_stamp() RETURNS trigger AS $$
+BEGIN
+    NEW.version := sync_next_version();
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO sync_tombstones (table_name, row_id, scope_id, version)
+    VALUES (TG_TABLE_NAME, OLD.id, (to_jsonb(OLD) ->> TG_ARGV[0])::integer, sync_next_version());
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+"""
+
+# Newest version at or below which every change has committed. A reader
+# that fetched everything up to it has missed nothing.
+async def read_clock(db) -> int:
+    if db.bind.dialect.name != "postgresql":
+        return (await db.execute(select(SyncClock.version).where(SyncClock.id == 1))).scalar() or 0
+
+    # Sequence first, locks second: a writer whose lock isn't visible yet
+    # takes its versions after `last`
+    last = (await db.execute(text(LAST_VERSION_SQL))).scalar() or 0
+    oldest = (await db.execute(text(OLDEST_WRITER_SQL), {"lock_class": SYNC_LOCK_CLASS})).scalar()
+    return last if oldest is None else min(last, oldest - 1)
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# The API's modules use flat imports (from models import ...), as when run from backend/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# A throwaway database for the whole run (database.py reads this at import)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="pulse-tests-"), "medshare.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+
+@pytest.fixture
+def run_api():
+    """run_api(scenario) runs `await scenario(client)` against the API, with its
+    lifespan (migrations, seeding, sweeper) around it, and returns the result"""
+    import httpx
+    import database
+    import main
+
+    def run(scenario):
+        async def go():
+            try:
+                async with main.app.router.lifespan_context(main.app):
+                    transport = httpx.ASGITransport(app=main.app)
+                    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                        return await scenario(client)
+            finally:
+                # aiosqlite connections belong to this event loop
+                await database.async_engine.dispose()
+        return asyncio.run(go())
+    return run
+
+
+@pytest.fixture
+def signup():
+    """await signup(client, dorm_id=1, **fields) -> (user id, auth headers) for a new user"""
+    async def create(client, dorm_id=1, password="password", **fields):
+        email = f"test-{uuid.uuid4().hex[:12]}@asu.edu"
+        body = {"email": email, "password": password, "first_name": "Test", "last_name": "User", "dorm_id": dorm_id, **fields}
+        response = await client.post("/auth/register", json=body)
+        assert response.status_code == 200, response.text
+        login = await client.post("/auth/login", params={"email": email, "password": password})
+        assert login.status_code == 200, login.text
+        return response.json()["id"], {"Authorization": f"Bearer {login.json()['access_token']}"}
+    return create
@@ -0,0 +1,61 @@
+"""The request feed is read from the database: a client connected to one
+worker hears about writes handled by another, and Last-Event-ID resumes on
+any worker."""
+
+import asyncio
+import json
+
+import database
+from events import RESET_FRAME, RequestEventBus
+
+
+# Next event frame from a feed, skipping the retry hint and keep-alives
+async def next_event(feed):
+    while True:
+        frame = await asyncio.wait_for(feed.__anext__(), 5)
+        if frame.startswith("id: ") or frame.startswith("event: "):
+            return frame
+
+
+def parse(frame):
+    lines = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+    return int(lines["id"]), json.loads(lines["data"])
+
+
+def test_feed_sees_writes_from_other_workers_and_resumes_anywhere(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client, dorm_id=9)
+        _, provider = await signup(client, dorm_id=9)
+
+        # Two more "workers": neither handles the writes below, they share only the database
+        other = RequestEventBus(database.AsyncSessionLocal, poll_interval=0.05)
+        third = RequestEventBus(database.AsyncSessionLocal, poll_interval=0.05)
+        other.start()
+        third.start()
+        try:
+            feed = other.stream(9, keepalive=1)
+            await asyncio.wait_for(feed.__anext__(), 5)   # subscribed
+
+            created = await client.post("/requests", json={"medicine_name": "ibuprofen", "quantity_requested": 1}, headers=requester)
+            request_id = created.json()["id"]
+            first_id, event = parse(await next_event(feed))
+            assert (event["type"], event["request"]["id"], event["request"]["status"]) == ("updated", request_id, "pending")
+
+            # Accepted while the client is away, then it reconnects to another worker
+            await feed.aclose()
+            assert (await client.post(f"/requests/{request_id}/accept", headers=provider)).status_code == 200
+            resumed = third.stream(9, last_id=first_id, keepalive=1)
+            second_id, event = parse(await next_event(resumed))
+            assert second_id > first_id
+            assert (event["request"]["id"], event["request"]["status"]) == (request_id, "accepted")
+            await resumed.aclose()
+
+            # An id this database never handed out (e.g. from before a restore)
+            stale = third.stream(9, last_id=second_id + 10**9, keepalive=1)
+            assert await next_event(stale) == RESET_FRAME
+            await stale.aclose()
+        finally:
+            await other.stop()
+            await third.stop()
+
+    run_api(scenario)
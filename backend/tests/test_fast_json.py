@@ -0,0 +1,86 @@
+"""fast_json.rows_to_json() must produce exactly the bytes the response_model
+path did: ORM objects validated into the schema and rendered by FastAPI's
+JSONResponse. Checked on rows with the awkward values (unicode, escapes,
+NULLs, whole-second and microsecond datetimes), with and without orjson."""
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, text
+
+import database
+import fast_json
+from models import Dorm, Medicine, Request
+from schemas import DormResponse, MedicineResponse, RequestResponse
+
+NAMES = ['Ibuprofène "extra" ✓', "zyrtec\\10mg", "line\nbreak\ttab", "😷 mask", "", "<script>&amp;</script>"]
+TIMES = ["2030-01-01 00:00:00", "2026-10-17 09:05:03.120000", "2026-10-17 23:59:59.999999", "2031-02-28 12:00:00.000001"]
+
+CASES = [
+    (MedicineResponse, Medicine, lambda user_id: Medicine.owner_id == user_id),
+    (RequestResponse, Request, lambda user_id: Request.requester_id == user_id),
+    (DormResponse, Dorm, lambda user_id: Dorm.id > 0),
+]
+
+
+async def seed_edge_cases(connection, user_id):
+    for n, name in enumerate(NAMES):
+        when = TIMES[n % len(TIMES)]
+        await connection.execute(text(
+            "INSERT INTO medicines (name, quantity, expiration_date, owner_id, status, created_at) "
+            "VALUES (:name, :quantity, :when, :owner, 'active', :when)"
+        ), {"name": name, "quantity": n * 1000003, "when": when, "owner": user_id})
+        await connection.execute(text(
+            "INSERT INTO requests (requester_id, dorm_id, provider_id, medicine_name, quantity_requested, message, "
+            "status, is_anonymous, created_at) VALUES (:owner, 1, :provider, :name, :n, :message, 'pending', :anonymous, :when)"
+        ), {
+            "owner": user_id, "provider": user_id if n % 2 else None, "name": name, "n": n,
+            "message": None if n % 3 == 0 else name * 3, "anonymous": n % 2 == 0, "when": when,
+        })
+
+
+async def both_paths(schema, model, where):
+    async with database.AsyncSessionLocal() as db:
+        objects = (await db.execute(select(model).where(where).order_by(model.id))).scalars().all()
+        expected = JSONResponse(content=jsonable_encoder([schema.model_validate(obj) for obj in objects])).body
+        rows = (await db.execute(select(*fast_json.project(schema, model)).where(where).order_by(model.id))).all()
+        return expected, fast_json.rows_to_json(schema, rows)
+
+
+@pytest.mark.parametrize("use_orjson", [True, False], ids=["orjson", "json"])
+def test_rows_to_json_matches_the_schema_path(run_api, signup, monkeypatch, use_orjson):
+    if use_orjson and fast_json.orjson is None:
+        pytest.skip("orjson is not installed")
+    if not use_orjson:
+        monkeypatch.setattr(fast_json, "orjson", None)
+
+    async def scenario(client):
+        user_id, _ = await signup(client)
+        async with database.async_engine.begin() as connection:
+            await seed_edge_cases(connection, user_id)
+
+        for schema, model, where in CASES:
+            expected, fast = await both_paths(schema, model, where(user_id))
+            assert expected.startswith(b"[{"), schema.__name__   # not vacuously equal
+            assert fast == expected, schema.__name__
+
+    run_api(scenario)
+
+
+def test_list_endpoints_serve_the_fast_body(run_api, signup):
+    async def scenario(client):
+        user_id, headers = await signup(client)
+        async with database.async_engine.begin() as connection:
+            await seed_edge_cases(connection, user_id)
+
+        medicines = await client.get("/medicines", params={"limit": 100}, headers=headers)
+        expected, _ = await both_paths(MedicineResponse, Medicine, Medicine.owner_id == user_id)
+        assert medicines.content == expected
+        assert medicines.headers["content-type"] == "application/json"
+        assert medicines.headers["content-length"] == str(len(medicines.content))
+
+        dorms = await client.get("/dorms")
+        expected, _ = await both_paths(DormResponse, Dorm, Dorm.id > 0)
+        assert dorms.content == expected
+
+    run_api(scenario)
@@ -0,0 +1,60 @@
+"""GET /requests/{id}/matches reads stock from the database, so it sees
+writes from every worker, and resolves typos of brand names as well as
+generics."""
+
+from datetime import datetime, timedelta
+
+import database
+from matching import matching_engine
+from models import Medicine
+from sqlalchemy import insert, update
+
+
+async def matches_for(client, headers, medicine_name, quantity=1):
+    request = await client.post("/requests", json={"medicine_name": medicine_name, "quantity_requested": quantity}, headers=headers)
+    assert request.status_code == 200, request.text
+    response = await client.get(f"/requests/{request.json()['id']}/matches", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_misspelled_brand_name_matches(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client, dorm_id=7)
+        _, provider = await signup(client, dorm_id=7)
+        added = await client.post("/medicines", json={"name": "Zyrtec 10mg", "quantity": 3, "expiration_date": "2030-01-01T00:00:00"}, headers=provider)
+        medicine_id = added.json()["id"]
+
+        matches = await matches_for(client, requester, "zyrtek")
+        assert [match["medicine_id"] for match in matches] == [medicine_id]
+        assert 0 < matches[0]["score"] < 1
+
+        assert [match["medicine_id"] for match in await matches_for(client, requester, "Cetirizine")] == [medicine_id]
+
+    run_api(scenario)
+
+
+def test_matches_see_stock_written_by_another_worker(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client, dorm_id=8)
+        provider_id, _ = await signup(client, dorm_id=8)
+
+        # Written straight to the database, as another worker would
+        async with database.async_engine.begin() as connection:
+            result = await connection.execute(insert(Medicine).values(
+                name="Melatonin 3mg", quantity=4, expiration_date=datetime.utcnow() + timedelta(days=90),
+                owner_id=provider_id, status="active",
+            ))
+            medicine_id = result.inserted_primary_key[0]
+
+        assert [match["medicine_id"] for match in await matches_for(client, requester, "melatonin")] == [medicine_id]
+
+        # Typos of the new name resolve once the names in stock are re-read
+        matching_engine.refreshed_at = None
+        assert [match["medicine_id"] for match in await matches_for(client, requester, "melatonn")] == [medicine_id]
+
+        async with database.async_engine.begin() as connection:
+            await connection.execute(update(Medicine).where(Medicine.id == medicine_id).values(quantity=1))
+        assert await matches_for(client, requester, "melatonin", quantity=2) == []
+
+    run_api(scenario)
@@ -0,0 +1,43 @@
+"""Expiration dates with a UTC offset are stored, indexed and matched as
+naive UTC, whether they come through POST /medicines or the bulk import."""
+
+import database
+from sqlalchemy import text
+
+
+def test_imported_offset_dates_can_be_matched(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client)
+        provider_id, provider = await signup(client)
+
+        body = (
+            '{"name": "ibuprofen", "quantity": 5, "expiration_date": "2030-01-01T00:00:00Z"}\n'
+            '{"name": "cetirizine", "quantity": 5, "expiration_date": "2030-01-01T02:00:00+02:00"}\n'
+        )
+        imported = await client.post("/medicines/import", content=body, headers={**provider, "Content-Type": "application/x-ndjson"})
+        assert imported.json()["imported"] == 2, imported.text
+
+        request = await client.post("/requests", json={"medicine_name": "ibuprofen", "quantity_requested": 1}, headers=requester)
+        matches = await client.get(f"/requests/{request.json()['id']}/matches", headers=requester)
+        assert matches.status_code == 200, matches.text
+        assert [match["provider_id"] for match in matches.json()] == [provider_id]
+
+        async with database.async_engine.connect() as connection:
+            stored = (await connection.execute(
+                text("SELECT expiration_date FROM medicines WHERE owner_id = :id ORDER BY id"), {"id": provider_id}
+            )).scalars().all()
+        assert [value[:19] for value in stored] == ["2030-01-01 00:00:00", "2030-01-01 00:00:00"]
+
+    run_api(scenario)
+
+
+def test_added_offset_date_is_converted_to_utc(run_api, signup):
+    async def scenario(client):
+        _, headers = await signup(client)
+        response = await client.post("/medicines", json={
+            "name": "ibuprofen", "quantity": 1, "expiration_date": "2030-06-01T09:30:00-07:00",
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["expiration_date"] == "2030-06-01T16:30:00"
+
+    run_api(scenario)
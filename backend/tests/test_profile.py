@@ -0,0 +1,51 @@
+"""PUT /profile writes only the fields it was given, even when the cached
+user behind the token is older than the row."""
+
+import database
+from sqlalchemy import text
+
+
+def test_update_keeps_fields_changed_behind_the_cache(run_api, signup):
+    async def scenario(client):
+        user_id, headers = await signup(client, allergies='[]')
+        assert (await client.get("/profile", headers=headers)).status_code == 200   # user now cached
+
+        # Another worker (or a login rehash) writes the row; this worker's cache doesn't see it
+        async with database.async_engine.begin() as connection:
+            await connection.execute(
+                text("UPDATE users SET allergies = :allergies WHERE id = :id"),
+                {"allergies": '["penicillin"]', "id": user_id},
+            )
+            version_before = (await connection.execute(text("SELECT version FROM users WHERE id = :id"), {"id": user_id})).scalar()
+
+        response = await client.put("/profile", params={"medical_conditions": '["asthma"]'}, headers=headers)
+        assert response.status_code == 200
+
+        async with database.async_engine.connect() as connection:
+            allergies, conditions, version_after = (await connection.execute(
+                text("SELECT allergies, medical_conditions, version FROM users WHERE id = :id"), {"id": user_id}
+            )).one()
+        assert allergies == '["penicillin"]'
+        assert conditions == '["asthma"]'
+        assert version_after > version_before
+
+    run_api(scenario)
+
+
+def test_login_rehash_drops_cached_user(run_api, signup, monkeypatch):
+    import auth
+    import auth_cache
+
+    async def scenario(client):
+        user_id, headers = await signup(client)
+        await client.get("/profile", headers=headers)
+        assert auth_cache.user_cache.get(user_id) is not None
+
+        # Pretend the stored hash used other rounds, so login saves a new one
+        verify = auth.pwd_context.verify_and_update
+        monkeypatch.setattr(auth.pwd_context, "verify_and_update", lambda password, stored: (verify(password, stored)[0], auth.pwd_context.hash(password)))
+        email = (await client.get("/profile", headers=headers)).json()["email"]
+        assert (await client.post("/auth/login", params={"email": email, "password": "password"})).status_code == 200
+        assert auth_cache.user_cache.get(user_id) is None
+
+    run_api(scenario)
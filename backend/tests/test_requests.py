@@ -0,0 +1,141 @@
+"""Request transitions: 403 for callers who may never make one, 409 when the
+request has moved on, and completion only hands over active stock."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import database
+from sqlalchemy import text
+
+
+async def new_request(client, headers, quantity=1):
+    response = await client.post("/requests", json={"medicine_name": "ibuprofen", "quantity_requested": quantity, "message": "headache"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_accepting_your_own_request_is_forbidden(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client)
+        request_id = await new_request(client, requester)
+
+        response = await client.post(f"/requests/{request_id}/accept", headers=requester)
+        assert response.status_code == 403
+
+    run_api(scenario)
+
+
+def test_only_the_parties_can_decline(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client)
+        _, bystander = await signup(client)
+        request_id = await new_request(client, requester)
+
+        assert (await client.post(f"/requests/{request_id}/decline", headers=bystander)).status_code == 403
+        assert (await client.delete(f"/requests/{request_id}", headers=bystander)).status_code == 403
+
+        response = await client.post(f"/requests/{request_id}/decline", headers=requester)
+        assert response.status_code == 200
+        assert response.json()["status"] == "declined"
+
+    run_api(scenario)
+
+
+def test_provider_backing_out_reopens_the_request(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client)
+        _, first = await signup(client)
+        second_id, second = await signup(client)
+        request_id = await new_request(client, requester)
+
+        assert (await client.post(f"/requests/{request_id}/accept", headers=first)).status_code == 200
+        response = await client.post(f"/requests/{request_id}/decline", headers=first)
+        assert response.status_code == 200
+        assert (response.json()["status"], response.json()["provider_id"]) == ("pending", None)
+        # No longer theirs to decline
+        assert (await client.post(f"/requests/{request_id}/decline", headers=first)).status_code == 403
+
+        accepted = await client.post(f"/requests/{request_id}/accept", headers=second)
+        assert accepted.status_code == 200
+        assert accepted.json()["provider_id"] == second_id
+
+        # The requester declining still ends it, accepted or not
+        response = await client.post(f"/requests/{request_id}/decline", headers=requester)
+        assert (response.json()["status"], response.json()["provider_id"]) == ("declined", second_id)
+
+    run_api(scenario)
+
+
+def test_second_accept_conflicts(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client)
+        first_id, first = await signup(client)
+        _, second = await signup(client)
+        request_id = await new_request(client, requester)
+
+        assert (await client.post(f"/requests/{request_id}/accept", headers=first)).status_code == 200
+        response = await client.post(f"/requests/{request_id}/accept", headers=second)
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Request is accepted"
+
+        # Only the provider can complete, and only once it's accepted
+        assert (await client.post(f"/requests/{request_id}/complete", headers=second)).status_code == 403
+        completed = await client.post(f"/requests/{request_id}/complete", headers=first)
+        assert completed.json()["provider_id"] == first_id
+
+    run_api(scenario)
+
+
+def test_complete_does_not_hand_over_archived_stock(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client)
+        _, provider = await signup(client)
+        request_id = await new_request(client, requester, quantity=2)
+        medicine = await client.post("/medicines", json={
+            "name": "ibuprofen", "quantity": 10,
+            "expiration_date": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+        }, headers=provider)
+        medicine_id = medicine.json()["id"]
+        assert (await client.post(f"/requests/{request_id}/accept", headers=provider)).status_code == 200
+
+        async with database.async_engine.begin() as connection:
+            await connection.execute(text("UPDATE medicines SET status = 'archived' WHERE id = :id"), {"id": medicine_id})
+
+        response = await client.post(f"/requests/{request_id}/complete", json={"medicine_id": medicine_id}, headers=provider)
+        assert response.status_code == 409
+
+        async with database.async_engine.connect() as connection:
+            quantity = (await connection.execute(text("SELECT quantity FROM medicines WHERE id = :id"), {"id": medicine_id})).scalar()
+            status = (await connection.execute(text("SELECT status FROM requests WHERE id = :id"), {"id": request_id})).scalar()
+        assert quantity == 10
+        assert status == "accepted"
+
+    run_api(scenario)
+
+
+async def request_row(request_id):
+    async with database.async_engine.connect() as connection:
+        return (await connection.execute(
+            text("SELECT status, provider_id, version FROM requests WHERE id = :id"), {"id": request_id}
+        )).one()
+
+
+def test_concurrent_accepts_have_exactly_one_winner(run_api, signup):
+    async def scenario(client):
+        _, requester = await signup(client)
+        providers = [await signup(client) for _ in range(20)]
+        request_id = await new_request(client, requester)
+        _, _, version_before = await request_row(request_id)
+
+        responses = await asyncio.gather(*(
+            client.post(f"/requests/{request_id}/accept", headers=headers) for _, headers in providers
+        ))
+        statuses = sorted(response.status_code for response in responses)
+        assert statuses == [200] + [409] * (len(providers) - 1)
+
+        winner = next(response for response in responses if response.status_code == 200).json()["provider_id"]
+        status, provider_id, version = await request_row(request_id)
+        assert (status, provider_id) == ("accepted", winner)
+        assert version == version_before + 1   # written once, by the winner
+
+    run_api(scenario)
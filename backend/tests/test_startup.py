@@ -0,0 +1,71 @@
+"""Importing the app has no side effects, and N workers starting together on a
+fresh database migrate and seed it exactly once, quickly."""
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 6
+
+# One worker: import the app, run its startup, report how long each took
+WORKER = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import database
+
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+    await database.async_engine.dispose()
+
+asyncio.run(boot())
+print(json.dumps({"import_s": imported - started, "startup_s": time.perf_counter() - imported}))
+"""
+
+
+def start_worker(path, code=WORKER):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", BCRYPT_ROUNDS="4")
+    return subprocess.Popen([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+
+def test_import_does_not_touch_the_database(tmp_path):
+    path = tmp_path / "medshare.db"
+    worker = start_worker(path, code="import main")
+    _, err = worker.communicate(timeout=60)
+    assert worker.returncode == 0, err
+    assert not path.exists()
+
+
+def test_concurrent_workers_migrate_and_seed_once(tmp_path):
+    from migrations import LATEST_VERSION, MIGRATIONS
+
+    path = tmp_path / "medshare.db"
+    workers = [start_worker(path) for _ in range(WORKERS)]
+    results = []
+    for worker in workers:
+        out, err = worker.communicate(timeout=120)
+        assert worker.returncode == 0, err
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    connection = sqlite3.connect(path)
+    try:
+        versions = [row[0] for row in connection.execute("SELECT version FROM schema_version ORDER BY version")]
+        dorms = connection.execute("SELECT COUNT(*) FROM dorms").fetchone()[0]
+    finally:
+        connection.close()
+    assert versions == [number for number, _ in MIGRATIONS]
+    assert versions[-1] == LATEST_VERSION
+    assert dorms == 13
+
+    # Startup after the import (migrations, seeding, warm-up) normally takes
+    # well under a second; this bound is generous for a loaded CI box but
+    # catches workers stuck behind the migration lock.
+    # Import time is CPU-bound and shared between the workers here, so it is
+    # left to benchmarks/bench_cold_start.py.
+    assert max(result["startup_s"] for result in results) < 5, results
@@ -0,0 +1,34 @@
+"""GET /sync tokens and list ETags follow the change versions stamped by the
+sync triggers (see sync_versions.py)."""
+
+
+def test_sync_returns_only_changes_since_the_token(run_api, signup):
+    async def scenario(client):
+        _, headers = await signup(client)
+        full = (await client.get("/sync", headers=headers)).json()
+        assert full["full"] is True
+
+        await client.post("/requests", json={"medicine_name": "ibuprofen", "quantity_requested": 1}, headers=headers)
+        changes = (await client.get("/sync", params={"since": full["token"]}, headers=headers)).json()
+        assert changes["full"] is False
+        assert [request["medicine_name"] for request in changes["requests"]] == ["ibuprofen"]
+
+        nothing = (await client.get("/sync", params={"since": changes["token"]}, headers=headers)).json()
+        assert nothing["requests"] == [] and nothing["medicines"] == []
+
+    run_api(scenario)
+
+
+def test_list_etag_changes_with_a_write(run_api, signup):
+    async def scenario(client):
+        _, headers = await signup(client)
+        first = await client.get("/requests", headers=headers)
+        etag = first.headers["ETag"]
+        assert (await client.get("/requests", headers={**headers, "If-None-Match": etag})).status_code == 304
+
+        await client.post("/requests", json={"medicine_name": "ibuprofen", "quantity_requested": 1}, headers=headers)
+        changed = await client.get("/requests", headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+
+    run_api(scenario)
@@ -0,0 +1,139 @@
+"""
+gateway.py
+----------
+Runs the Pulse API, the Chatbot and the MessageBoard as one ASGI app, in one
+process, behind one port:
+
+    /api/...      backend/main.py          (Pulse API)
+    /chatbot/...  Chatbot/Backend/main.py  (Chatbot)
+    /board/...    MessageBoard/main.py     (MessageBoard)
+    /             the frontend (index.html, script.js, style.css)
+
+Instead of three uvicorn processes (start.bat), the three apps share one
+event loop and one lifespan. Because everything is on the same origin, the
+frontend needs no cross-origin calls.
+
+- Each service has its own main.py, so they are loaded with importlib under
+  the unique names pulse_api, chatbot_app and messageboard_app. Their
+  folders go on sys.path so their flat imports (models, llm, rooms, ...)
+  still resolve. No other module names clash.
+- Starlette doesn't run the lifespan of mounted apps, so the gateway's
+  lifespan runs all three in turn (the API's migrations check, seeding and
+  sweeper, the board's pub-sub).
+- The Chatbot and MessageBoard endpoints depend on a current_user() hook
+  that returns None when they run alone. Here it is overridden with the
+  Pulse API's JWT check: a Bearer header for the chatbot, and
+  ?access_token=... for the board's WebSocket.
+- Paths that were relative to each service's folder (the SQLite file, the
+  board's history) default to those folders, so the gateway uses the same
+  data as the separate processes.
+
+It can run as several uvicorn workers:
+
+- the API's live request feed (backend/events.py) and matching
+  (backend/matching.py) read from the database, so every worker sees every
+  write;
+- the MessageBoard's rooms are shared through MESSAGEBOARD_PUBSUB (see
+  MessageBoard/pubsub.py), which start_gateway.sh sets when WORKERS > 1;
+- chatbot sessions (Chatbot/Backend/sessions.py) and its reply cache stay
+  in each worker: a follow-up that reaches another worker doesn't know the
+  session_id, and the reply starts over with session_reset=true.
+
+Run it with start_gateway.sh, or:
+
+    python backend/migrations.py
+    MESSAGEBOARD_PUBSUB=unix:/tmp/pulse-board.sock uvicorn gateway:app --port 8000 --workers 4
+"""
+
+import importlib.util
+import os
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+CHATBOT_DIR = os.path.join(ROOT, "Chatbot", "Backend")
+MESSAGEBOARD_DIR = os.path.join(ROOT, "MessageBoard")
+
+# Same files the services use when started from their own folders
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(BACKEND_DIR, "medshare.db"))
+os.environ.setdefault("MESSAGEBOARD_HISTORY_DIR", os.path.join(MESSAGEBOARD_DIR, "history"))
+
+for directory in (BACKEND_DIR, CHATBOT_DIR, MESSAGEBOARD_DIR):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketException, status
+from fastapi.responses import FileResponse, RedirectResponse
+
+# Import a service's main.py under its own module name
+def load_service(name, directory):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(directory, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+pulse_api = load_service("pulse_api", BACKEND_DIR)
+chatbot_app = load_service("chatbot_app", CHATBOT_DIR)
+messageboard_app = load_service("messageboard_app", MESSAGEBOARD_DIR)
+
+# Path prefix -> mounted app
+SERVICES = {
+    "/api": pulse_api.app,
+    "/chatbot": chatbot_app.app,
+    "/board": messageboard_app.app,
+}
+
+# Frontend files served at the root (never the whole folder: it holds the database)
+FRONTEND_FILES = {"index.html", "script.js", "style.css"}
+
+# Shared auth
+
+# Browsers can't set headers on a WebSocket, so the token comes in the query
+# string, like the API's request feed (GET /requests/events)
+async def websocket_user(websocket: WebSocket, access_token: Optional[str] = None):
+    if not access_token:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+    async with pulse_api.AsyncSessionLocal() as db:
+        try:
+            return await pulse_api.user_from_token(access_token, db)
+        except HTTPException as e:
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+
+chatbot_app.app.dependency_overrides[chatbot_app.current_user] = pulse_api.get_current_user
+messageboard_app.app.dependency_overrides[messageboard_app.current_user] = websocket_user
+
+# One lifespan for everything: each service starts in order and stops in reverse
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncExitStack() as stack:
+        for service in SERVICES.values():
+            await stack.enter_async_context(service.router.lifespan_context(service))
+        yield
+
+app = FastAPI(title="Pulse", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+for prefix, service in SERVICES.items():
+    app.mount(prefix, service)
+
+@app.get("/", include_in_schema=False)
+async def frontend_index():
+    return FileResponse(os.path.join(ROOT, "index.html"))
+
+@app.get("/{filename}", include_in_schema=False)
+async def frontend_file(filename: str, request: Request):
+    # "/board" -> "/board/" (a mount only matches paths below its prefix)
+    if "/" + filename in SERVICES:
+        query = f"?{request.url.query}" if request.url.query else ""
+        return RedirectResponse(url=f"/{filename}/{query}")
+    if filename not in FRONTEND_FILES:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return FileResponse(os.path.join(ROOT, filename))
+
+
+if __name__ == "__main__":
+    import uvicorn
+    pulse_api.run_migrations(pulse_api.engine)
+    uvicorn.run(app, host="0.0.0.0", port=8000)
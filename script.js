@@ -1,3 +1,10 @@
+// Where the services live. Served by gateway.py they share this page's origin
+// under path prefixes; with start.bat (frontend on :8080) each has its own port.
+const SERVED_BY_GATEWAY = window.location.protocol.startsWith('http') && window.location.port !== '8080';
+const API_BASE = SERVED_BY_GATEWAY ? '/api' : 'http://localhost:8000';
+const CHATBOT_BASE = SERVED_BY_GATEWAY ? '/chatbot' : 'http://127.0.0.1:8002';
+const MESSAGEBOARD_URL = SERVED_BY_GATEWAY ? '/board/' : 'http://localhost:8006/';
+
 // Global state management
 let currentPage = 'homepage';
 let inventory = [];
@@ -18,6 +25,8 @@ const medicines = [
 // Request data - will be loaded from backend
 let receivedRequests = [];
 let myRequests = [];
+// Dorm-mates' requests this user passed on (hidden from the received list)
+const dismissedRequests = new Set(JSON.parse(localStorage.getItem('dismissedRequests') || '[]'));
 
 
 // Pre-existing pending request entry
@@ -149,7 +158,10 @@ function showPage(pageId) {
     if (pageId === 'medical-inventory') {
         initializeInventory();
     } else if (pageId === 'request-page') {
-        loadRequests().then(() => renderRequests());
+        loadRequests().then(() => {
+            renderRequests();
+            startRequestFeed();
+        });
     }
 }
 
@@ -860,7 +872,7 @@ async function loadRequests() {
             return;
         }
 
-        const response = await fetch('http://localhost:8000/requests', {
+        const response = await fetch(`${API_BASE}/requests`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
@@ -870,7 +882,7 @@ async function loadRequests() {
             const requests = await response.json();
             // For now, show all requests as received requests
             // In a real app, you'd filter by user and dorm
-            receivedRequests = requests;
+            receivedRequests = requests.filter(req => !dismissedRequests.has(String(req.id)));
         } else {
             console.error('Failed to load requests');
         }
@@ -879,6 +891,42 @@ async function loadRequests() {
     }
 }
 
+// Live request feed: the backend pushes created/updated/expired requests for
+// our dorm, so the list stays fresh without refetching it. EventSource
+// reconnects on its own and resumes from the last event id it saw.
+let requestFeed = null;
+
+function startRequestFeed() {
+    const token = localStorage.getItem('auth_token');
+    if (!token || requestFeed) return;
+
+    requestFeed = new EventSource(`${API_BASE}/requests/events?access_token=${encodeURIComponent(token)}`);
+
+    requestFeed.onmessage = (event) => {
+        const { type, request } = JSON.parse(event.data);
+        const index = receivedRequests.findIndex(req => req.id === request.id);
+        if (index !== -1) receivedRequests.splice(index, 1);
+        // The list only shows open requests
+        if (type !== 'expired' && request.status === 'pending') {
+            receivedRequests.unshift(request);
+        }
+        if (currentPage === 'request-page') renderRequests();
+    };
+
+    // Events were missed and can't be replayed: refetch the list once
+    requestFeed.addEventListener('reset', async () => {
+        await loadRequests();
+        if (currentPage === 'request-page') renderRequests();
+    });
+}
+
+function stopRequestFeed() {
+    if (requestFeed) {
+        requestFeed.close();
+        requestFeed = null;
+    }
+}
+
 // Request Page functionality
 function renderRequests() {
     const receivedDiv = document.getElementById('received-requests');
@@ -936,8 +984,37 @@ function renderRequests() {
     checkEmptyStates();
 }
 
-function acceptRequest(id){
-    showToast('Accept button clicked - placeholder functionality');
+async function acceptRequest(id){
+    try {
+        const token = localStorage.getItem('auth_token');
+        if (!token) {
+            showToast('Please login first');
+            return;
+        }
+
+        const response = await fetch(`${API_BASE}/requests/${id}/accept`, {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+
+        if (response.ok) {
+            showToast('Request accepted');
+        } else if (response.status === 403) {
+            showToast("You can't accept your own request");
+        } else if (response.status === 409) {
+            showToast('This request was already accepted or has expired');
+        } else {
+            showToast('Failed to accept request');
+        }
+        // Reload requests from backend
+        await loadRequests();
+        renderRequests();
+    } catch (error) {
+        console.error('Error accepting request:', error);
+        showToast('Error accepting request');
+    }
 }
 
 async function declineRequest(id){
@@ -948,8 +1025,12 @@ async function declineRequest(id){
             return;
         }
 
-        const response = await fetch(`http://localhost:8000/requests/${id}`, {
-            method: 'DELETE',
+        // Declining changes the request only for its requester (cancel) or the
+        // provider who accepted it (back out, which reopens it for the dorm).
+        // Anyone else is just passing on a dorm-mate's request, so it is hidden
+        // from their own list instead.
+        const response = await fetch(`${API_BASE}/requests/${id}/decline`, {
+            method: 'POST',
             headers: {
                 'Authorization': `Bearer ${token}`
             }
@@ -957,12 +1038,17 @@ async function declineRequest(id){
 
         if (response.ok) {
             showToast('Request declined');
-            // Reload requests from backend
-            await loadRequests();
-            renderRequests();
+        } else if (response.status === 403) {
+            dismissedRequests.add(String(id));
+            localStorage.setItem('dismissedRequests', JSON.stringify([...dismissedRequests]));
+            showToast('Request hidden');
         } else {
             showToast('Failed to decline request');
+            return;
         }
+        // Reload requests from backend
+        await loadRequests();
+        renderRequests();
     } catch (error) {
         console.error('Error declining request:', error);
         showToast('Error declining request');
@@ -1007,6 +1093,10 @@ function closeChatbot() {
 }
 
 // Chatbot message functions
+
+// Server-side conversation the bot remembers; issued with the first reply
+let chatSessionId = null;
+
 function appendMessage(text, sender) {
     const chatbox = document.getElementById('chatbox');
     const msgDiv = document.createElement('div');
@@ -1027,6 +1117,46 @@ function appendMessage(text, sender) {
     msgDiv.appendChild(textBubble);
     chatbox.appendChild(msgDiv);
     chatbox.scrollTop = chatbox.scrollHeight;
+    return textBubble;
+}
+
+// Reads the Server-Sent Events from /chat/stream and adds each chunk to the bubble as it arrives
+async function streamReply(response, textBubble) {
+    const chatbox = document.getElementById('chatbox');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+
+            if (event === 'error') throw new Error(JSON.parse(data).detail);
+            if (event === 'done') {
+                const result = JSON.parse(data);
+                // The server no longer had our conversation (restart, expiry or another worker)
+                if (result.session_reset) appendMessage("(Our earlier conversation was lost, so this answer doesn't take it into account.)", 'bot');
+                chatSessionId = result.session_id;
+            }
+            if (event === 'message') {
+                textBubble.textContent += JSON.parse(data).delta;
+                chatbox.scrollTop = chatbox.scrollHeight;
+            }
+        }
+    }
 }
 
 async function sendMessage() {
@@ -1040,20 +1170,33 @@ async function sendMessage() {
     inputMessage.value = '';
     sendBtn.disabled = true;
 
+    let textBubble = null;
     try {
-        const response = await fetch('http://127.0.0.1:8002/chat', {
+        // The gateway only answers signed-in users
+        const token = localStorage.getItem('auth_token');
+        const headers = { 'Content-Type': 'application/json' };
+        if (token) headers['Authorization'] = `Bearer ${token}`;
+
+        const response = await fetch(`${CHATBOT_BASE}/chat/stream`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ message }),
+            headers,
+            body: JSON.stringify({ message, session_id: chatSessionId }),
         });
 
         if (!response.ok) throw new Error("Network response was not ok");
 
-        const data = await response.json();
-        appendMessage(data.reply, 'bot');
+        // Start with an empty bubble and fill it in as chunks arrive
+        textBubble = appendMessage('', 'bot');
+        await streamReply(response, textBubble);
 
     } catch (error) {
-        appendMessage('Error: Could not reach the server.', 'bot');
+        if (textBubble && textBubble.textContent) {
+            textBubble.textContent += ' (reply interrupted)';
+        } else if (textBubble) {
+            textBubble.textContent = 'Error: Could not reach the server.';
+        } else {
+            appendMessage('Error: Could not reach the server.', 'bot');
+        }
     } finally {
         sendBtn.disabled = false;
         inputMessage.focus();
@@ -1069,8 +1212,11 @@ function acceptMeeting(requestId) {
         requestElement.remove();
     }
     
-    // Open MessageBoard chat interface
-    const meetingLink = `http://localhost:8006/`;
+    // Open MessageBoard chat interface (the gateway's board needs the sign-in token)
+    const token = localStorage.getItem('auth_token');
+    const meetingLink = SERVED_BY_GATEWAY && token
+        ? `${MESSAGEBOARD_URL}?access_token=${encodeURIComponent(token)}`
+        : MESSAGEBOARD_URL;
     window.open(meetingLink, '_blank');
     
     showToast('Meeting link opened! You can now chat anonymously with the requester.');
@@ -1089,6 +1235,7 @@ function declineMeeting(requestId) {
 // Logout functionality
 function logout() {
     localStorage.removeItem('auth_token');
+    stopRequestFeed();
     userState = 'guest';
     currentPage = 'homepage';
     updateNavigation();
@@ -0,0 +1,38 @@
+#!/usr/bin/env sh
+# Pulse on Linux/macOS: API, Chatbot, MessageBoard and the frontend in one
+# process behind one port (see gateway.py). start.bat still runs them as
+# separate servers on Windows.
+#
+#   ./start_gateway.sh                 http://localhost:8000
+#   PORT=9000 WORKERS=4 ./start_gateway.sh
+#
+# With more than one worker, board messages are relayed between the workers
+# through a broker on a Unix socket (MESSAGEBOARD_PUBSUB, see
+# MessageBoard/pubsub.py) unless MESSAGEBOARD_PUBSUB is already set.
+# Chatbot sessions stay per worker (see gateway.py).
+set -e
+
+cd "$(dirname "$0")"
+
+HOST="${HOST:-0.0.0.0}"
+PORT="${PORT:-8000}"
+WORKERS="${WORKERS:-1}"
+PYTHON="${PYTHON:-python3}"
+
+# Same defaults as gateway.py, exported so the migration step uses them too
+export DATABASE_URL="${DATABASE_URL:-sqlite:///$(pwd)/backend/medshare.db}"
+export MESSAGEBOARD_HISTORY_DIR="${MESSAGEBOARD_HISTORY_DIR:-$(pwd)/MessageBoard/history}"
+
+# The first worker to start hosts the broker (see MessageBoard/pubsub.py)
+if [ "$WORKERS" != "1" ] && [ -z "$MESSAGEBOARD_PUBSUB" ]; then
+    export MESSAGEBOARD_PUBSUB="unix:${TMPDIR:-/tmp}/pulse-board-$PORT.sock"
+fi
+
+# Schema setup runs once here, before uvicorn forks the workers
+"$PYTHON" backend/migrations.py
+
+echo "Pulse:        http://localhost:$PORT"
+echo "API docs:     http://localhost:$PORT/api/docs"
+echo "MessageBoard: http://localhost:$PORT/board/"
+
+exec "$PYTHON" -m uvicorn gateway:app --host "$HOST" --port "$PORT" --workers "$WORKERS"